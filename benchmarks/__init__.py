@@ -0,0 +1,8 @@
+"""
+Offline microbenchmarks for the data_processing engines.
+
+Run from the project root (the same directory the app is started from):
+
+    python -m benchmarks                  # compare the working tree with HEAD
+    python -m benchmarks --against main   # compare the working tree with main
+"""
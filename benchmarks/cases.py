@@ -0,0 +1,97 @@
+"""
+Benchmark cases: one per engine entry point.
+
+Each case turns a report size into a list of ready-to-await calls, one per
+(sex, age) profile; the runner cycles through them so every timed run uses a
+different but deterministic input.
+"""
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Tuple
+
+from bson import ObjectId
+
+from data_processing.biomarkers_range import centum_predefined_ranges, section_to_biomarkers
+from data_processing.calculate_age import calculate_biological_age
+from data_processing.report_compare import compare_by_bands
+from data_processing.report_genration import classify_by_section, classify_report
+from services.health_assessment_service import map_biomarkers_with_ranges
+
+from benchmarks.synthetic import profiles, synthetic_buckets, synthetic_lab_results, synthetic_questionnaire
+
+
+REPORT_SIZES = (10, 100, 1000, 10000)
+
+Call = Callable[[], Awaitable[Any]]
+
+
+class Case(NamedTuple):
+    name: str
+    sizes: Tuple[int, ...]
+    prepare: Callable[[int], List[Call]]
+
+
+class _QuestionnaireCollection:
+    """In-memory stand-in for db.health_assessment_responses (find_one only)."""
+
+    def __init__(self, answers: Dict[str, str]):
+        self._doc = {"step_2_answers": answers}
+
+    async def find_one(self, query, projection=None):
+        return self._doc
+
+
+def _classify_report(size: int) -> List[Call]:
+    calls = []
+    for sex, age in profiles():
+        lab_results = synthetic_lab_results(size, sex, age)
+        calls.append(lambda lab_results=lab_results, sex=sex, age=age:
+                     classify_report(centum_predefined_ranges, lab_results, sex=sex, age=age))
+    return calls
+
+
+def _classify_by_section(size: int) -> List[Call]:
+    calls = []
+    for sex, age in profiles():
+        buckets = synthetic_buckets(size, sex, age)
+        calls.append(lambda buckets=buckets:
+                     classify_by_section(section_to_biomarkers, buckets, include_invalid=False, include_missing=False))
+    return calls
+
+
+def _compare_by_bands(size: int) -> List[Call]:
+    calls = []
+    for sex, age in profiles():
+        old, new = synthetic_buckets(size, sex, age, seed=1), synthetic_buckets(size, sex, age, seed=2)
+        calls.append(lambda old=old, new=new, sex=sex:
+                     compare_by_bands(section_to_biomarkers, old, new, "2024-01-15", "2025-01-15", sex=sex))
+    return calls
+
+
+def _map_biomarkers_with_ranges(size: int) -> List[Call]:
+    calls = []
+    for sex, age in profiles():
+        buckets = synthetic_buckets(size, sex, age)
+        gender = "male" if sex == "M" else "female"
+        calls.append(lambda data=buckets["good"], gender=gender: map_biomarkers_with_ranges(data, gender))
+        calls.append(lambda data=buckets["invalid_biomarkers"], gender=gender:
+                     map_biomarkers_with_ranges(data, gender, invalid=True))
+    return calls
+
+
+def _calculate_biological_age(size: int) -> List[Call]:
+    # Questionnaire-driven, so there is no report size; `size` is ignored.
+    calls = []
+    for seed, (_, age) in enumerate(profiles()):
+        db = SimpleNamespace(health_assessment_responses=_QuestionnaireCollection(synthetic_questionnaire(seed)))
+        user_id = str(ObjectId())
+        calls.append(lambda db=db, user_id=user_id, age=age: calculate_biological_age(db, user_id, age))
+    return calls
+
+
+CASES = (
+    Case("classify_report", REPORT_SIZES, _classify_report),
+    Case("classify_by_section", REPORT_SIZES, _classify_by_section),
+    Case("compare_by_bands", REPORT_SIZES, _compare_by_bands),
+    Case("map_biomarkers_with_ranges", REPORT_SIZES, _map_biomarkers_with_ranges),
+    Case("calculate_biological_age", (0,), _calculate_biological_age),
+)
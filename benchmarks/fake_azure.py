@@ -0,0 +1,321 @@
+"""
+Offline stand-ins for the Azure services the report pipeline calls, for load
+testing without network access.
+
+One aiohttp server answers, on the same port:
+
+- Grok chat completions (`ChatCompletionsClient`): POST /chat/completions,
+  plain or streamed. The reply is schema-correct canned JSON for the call it
+  recognises in the prompt (biomarker mapping, clinical summary, fan-out
+  section/overview, grok summary, partial re-ask) and plain text otherwise
+  (comparison summary, warm-up).
+- Document Intelligence (`DocumentIntelligenceClient.begin_analyze_document`
+  and its poller): POST .../documentModels/{model}:analyze answers 202 with an
+  Operation-Location that reports "running" until the sampled latency has
+  passed, then an analyzeResult whose fields have the custom model's shape
+  (biomarker -> [{Result, Units}], "report date"). The lab values come from
+  benchmarks.synthetic.
+- Blob Storage uploads (create container, Put Blob, Put Block / Put Block List),
+  so uploads complete too. BLOB_STORAGE_BACKEND=local skips Blob Storage instead.
+
+Latency is sampled per request from a distribution spec ("fixed:200",
+"uniform:100,500", "lognormal:800,0.6" = median ms and sigma, "exp:300" =
+mean ms). A share of requests can fail with 500 or be throttled with 429 and
+Retry-After.
+
+Run it and point the app at it:
+
+    python -m benchmarks.fake_azure --port 8090 --llm-latency lognormal:1500,0.5 --llm-throttle-rate 0.05
+    FAKE_AZURE_ENDPOINT=http://127.0.0.1:8090 uvicorn main:app
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, NamedTuple, Optional
+
+from aiohttp import web
+
+from data_processing.biomarkers_range import section_to_biomarkers
+
+from benchmarks.synthetic import synthetic_lab_results
+
+
+API_VERSION = "2024-11-30"
+
+
+class Latency(NamedTuple):
+    kind: str
+    a: float
+    b: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        kind, _, args = spec.partition(":")
+        values = [float(v) for v in args.split(",") if v] or [0.0]
+        if kind not in ("fixed", "uniform", "lognormal", "exp"):
+            raise ValueError(f"unknown latency distribution {kind!r}")
+        return cls(kind, *values[:2])
+
+    def sample(self, rng: random.Random) -> float:
+        """Seconds."""
+        if self.kind == "uniform":
+            ms = rng.uniform(self.a, self.b)
+        elif self.kind == "lognormal":
+            ms = rng.lognormvariate(math.log(max(self.a, 1e-3)), self.b)
+        elif self.kind == "exp":
+            ms = rng.expovariate(1.0 / self.a) if self.a > 0 else 0.0
+        else:
+            ms = self.a
+        return max(0.0, ms) / 1000.0
+
+
+class ServiceBehaviour(NamedTuple):
+    latency: Latency = Latency("fixed", 0.0)
+    error_rate: float = 0.0         # share of requests answered 500
+    throttle_rate: float = 0.0      # share of requests answered 429
+    retry_after_ms: int = 1000
+
+
+class FakeAzureConfig(NamedTuple):
+    llm: ServiceBehaviour = ServiceBehaviour()
+    ocr: ServiceBehaviour = ServiceBehaviour()
+    ocr_biomarkers: int = 40
+    stream_chunk_delay_ms: float = 20.0
+    seed: int = 0
+
+
+# ── canned LLM payloads ──────────────────────────────────────────────
+def _category(kind: str) -> Dict[str, Any]:
+    return {
+        "do": [f"Keep a regular {kind} routine", f"Track your {kind} for four weeks"],
+        "dont": [f"Make abrupt {kind} changes"],
+        "summary": f"Small, steady {kind} changes suited to your results.",
+        "why_this_matters_for_you": f"Your {kind} habits affect the markers flagged in this report.",
+    }
+
+
+ACTION_PLAN = {
+    "diet": {**_category("diet"), "recommended_foods": ["Oily fish twice a week"], "foods_to_limit": ["Processed meats"]},
+    "exercise": {**_category("exercise"), "recommended_exercises": ["Brisk walking 30 min, 5 days a week"], "activities_to_limit": ["Long sitting"]},
+    "sleep": {**_category("sleep"), "recommended_sleep": ["7-8 h per night"], "sleep_hygiene_tips": ["No screens an hour before bed"]},
+    "supplement": {**_category("supplement"), "recommended_supplements": ["Vitamin D3 as advised"], "supplements_to_limit": ["High-dose multivitamins"]},
+}
+SECTION = {"findings": "Most markers in this section are within range; a few are at the edge of normal.",
+           "interpretation": "No urgent concern here; recheck at your next test."}
+OVERVIEW = {"action_plan": ACTION_PLAN, "summary": "Your results are broadly in range with a few markers to watch.",
+            "critical_concerns": [], "message": ""}
+COMPARISON_TEXT = ("Compared with your previous report, most markers are stable. A few moved toward the optimal range "
+                   "and none moved into the critical range. Keep to your current plan and retest in three months.")
+
+
+def _sections_in(prompt: str):
+    return [s for s in section_to_biomarkers if f'"{s}"' in prompt]
+
+
+def _fill(skeleton: Any, template: Any) -> Any:
+    """Fill the nulls of a re-ask skeleton from the canned payload."""
+    if isinstance(skeleton, dict):
+        template = template if isinstance(template, dict) else {}
+        return {k: _fill(v, template.get(k, SECTION if k not in ACTION_PLAN else None)) for k, v in skeleton.items()}
+    return template if template is not None else "n/a"
+
+
+def llm_reply(prompt: str) -> str:
+    """The canned reply for a prompt, chosen by what the prompt asks for."""
+    if "Your JSON is missing these fields" in prompt:
+        skeleton = json.loads(prompt[prompt.rindex("commentary: ") + len("commentary: "):])
+        return json.dumps(_fill(skeleton, {**OVERVIEW, "section_summary": {}}))
+    if "mapping names of biomarkers" in prompt:
+        match = re.search(r"The blood report biomarker names are: (\[.*?\])\n", prompt)
+        names = json.loads(match.group(1)) if match else []
+        return json.dumps({name: None for name in names})
+    if "Summarise one section of a blood report" in prompt:
+        return json.dumps(SECTION)
+    if "keys action_plan, summary, critical_concerns and message" in prompt:
+        return json.dumps(OVERVIEW)
+    if "Blood Report classify data" in prompt:
+        return json.dumps({**OVERVIEW, "section_summary": {s: SECTION for s in _sections_in(prompt)}})
+    if "good, normal, critical and action_plan" in prompt:
+        return json.dumps({"good": {}, "normal": {}, "critical": {}, "invalid_biomarkers": {}, **OVERVIEW})
+    if prompt.strip() == "ping":
+        return "pong"
+    return COMPARISON_TEXT
+
+
+# ── Document Intelligence payloads ───────────────────────────────────
+def _string_field(value: str) -> Dict[str, Any]:
+    return {"type": "string", "valueString": value, "content": value, "confidence": 0.99}
+
+
+def analyze_result(model_id: str, n_biomarkers: int, seed: int) -> Dict[str, Any]:
+    lab = synthetic_lab_results(n_biomarkers, "M" if seed % 2 else "F", 45, seed=seed)
+    fields = {
+        name: {"type": "array", "valueArray": [{"type": "object", "valueObject": {
+            "Result": _string_field(str(entry["result"])),
+            "Units": _string_field(str(entry["units"])),
+        }}]}
+        for name, entry in lab.items()
+    }
+    fields["report date"] = _string_field(datetime.now(timezone.utc).strftime("%Y-%m-%d"))
+    return {
+        "apiVersion": API_VERSION, "modelId": model_id, "stringIndexType": "textElements",
+        "content": "", "pages": [],
+        "documents": [{"docType": model_id, "fields": fields, "confidence": 0.99, "spans": []}],
+    }
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+# ── server ───────────────────────────────────────────────────────────
+class FakeAzure:
+    def __init__(self, config: FakeAzureConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.operations: Dict[str, Dict[str, Any]] = {}
+        self.counts: Dict[str, int] = {}
+
+    def _count(self, name: str):
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def _injected_failure(self, behaviour: ServiceBehaviour, service: str) -> Optional[web.Response]:
+        roll = self.rng.random()
+        if roll < behaviour.throttle_rate:
+            self._count(f"{service}_429")
+            return web.json_response(
+                {"error": {"code": "429", "message": "Rate limit exceeded (fake)."}}, status=429,
+                headers={"Retry-After": str(math.ceil(behaviour.retry_after_ms / 1000)), "retry-after-ms": str(behaviour.retry_after_ms)},
+            )
+        if roll < behaviour.throttle_rate + behaviour.error_rate:
+            self._count(f"{service}_500")
+            return web.json_response({"error": {"code": "InternalServerError", "message": "Injected failure (fake)."}}, status=500)
+        return None
+
+    async def chat_completions(self, request: web.Request) -> web.StreamResponse:
+        behaviour = self.config.llm
+        body = await request.json()
+        failure = self._injected_failure(behaviour, "llm")
+        if failure is not None:
+            return failure
+        self._count("llm")
+        prompt = (body.get("messages") or [{}])[-1].get("content", "")
+        reply = llm_reply(prompt if isinstance(prompt, str) else json.dumps(prompt))
+        usage = {"prompt_tokens": len(json.dumps(body)) // 4, "completion_tokens": len(reply) // 4}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        head = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "created": int(time.time()), "model": body.get("model", "fake")}
+
+        if not body.get("stream"):
+            await asyncio.sleep(behaviour.latency.sample(self.rng))
+            return web.json_response({**head, "usage": usage, "choices": [
+                {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": reply}}]})
+
+        # Streamed: the sampled latency is time to first token.
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await asyncio.sleep(behaviour.latency.sample(self.rng))
+        for word in re.findall(r"\S+\s*", reply):
+            chunk = {**head, "choices": [{"index": 0, "delta": {"role": "assistant", "content": word}, "finish_reason": None}]}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            await asyncio.sleep(self.config.stream_chunk_delay_ms / 1000.0)
+        done = {**head, "usage": usage, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        await response.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode())
+        await response.write_eof()
+        return response
+
+    async def analyze(self, request: web.Request) -> web.Response:
+        await request.read()
+        failure = self._injected_failure(self.config.ocr, "ocr")
+        if failure is not None:
+            return failure
+        self._count("ocr")
+        model_id = request.match_info["model_id"]
+        result_id = uuid.uuid4().hex
+        self.operations[result_id] = {
+            "model_id": model_id, "created": _now(), "seed": self.rng.randrange(1 << 30),
+            "ready_at": time.monotonic() + self.config.ocr.latency.sample(self.rng),
+        }
+        location = f"{request.scheme}://{request.host}/documentintelligence/documentModels/{model_id}/analyzeResults/{result_id}?api-version={API_VERSION}"
+        return web.Response(status=202, headers={"Operation-Location": location, "retry-after-ms": "50"})
+
+    async def analyze_result(self, request: web.Request) -> web.Response:
+        op = self.operations.get(request.match_info["result_id"])
+        if op is None:
+            return web.json_response({"error": {"code": "NotFound", "message": "Unknown analyze result."}}, status=404)
+        remaining = op["ready_at"] - time.monotonic()
+        if remaining > 0:
+            return web.json_response(
+                {"status": "running", "createdDateTime": op["created"], "lastUpdatedDateTime": _now()},
+                headers={"retry-after-ms": str(max(50, int(remaining * 1000)))},
+            )
+        self.operations.pop(request.match_info["result_id"], None)
+        return web.json_response({
+            "status": "succeeded", "createdDateTime": op["created"], "lastUpdatedDateTime": _now(),
+            "analyzeResult": analyze_result(op["model_id"], self.config.ocr_biomarkers, op["seed"]),
+        })
+
+    async def put_blob(self, request: web.Request) -> web.Response:
+        await request.read()
+        self._count("blob")
+        return web.Response(status=201, headers={
+            "ETag": f'"0x{uuid.uuid4().hex[:16].upper()}"',
+            "Last-Modified": datetime.now(timezone.utc).strftime("%a, %d %b %Y %H:%M:%S GMT"),
+            "x-ms-request-server-encrypted": "true",
+        })
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response({"counts": self.counts, "pending_operations": len(self.operations)})
+
+
+def create_app(config: FakeAzureConfig = FakeAzureConfig()) -> web.Application:
+    fake = FakeAzure(config)
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app["fake_azure"] = fake
+    app.router.add_post("/chat/completions", fake.chat_completions)
+    app.router.add_post("/documentintelligence/documentModels/{model_id:[^/:]+}:analyze", fake.analyze)
+    app.router.add_get("/documentintelligence/documentModels/{model_id}/analyzeResults/{result_id}", fake.analyze_result)
+    app.router.add_get("/_fake/stats", fake.stats)
+    # Blob Storage with a path-style account URL: /{account}/{container}[/{blob}]
+    app.router.add_put("/{account}/{container}", fake.put_blob)
+    app.router.add_put("/{account}/{container}/{blob:.+}", fake.put_blob)
+    return app
+
+
+def _behaviour(args: argparse.Namespace, service: str) -> ServiceBehaviour:
+    return ServiceBehaviour(
+        latency=Latency.parse(getattr(args, f"{service}_latency")),
+        error_rate=getattr(args, f"{service}_error_rate"),
+        throttle_rate=getattr(args, f"{service}_throttle_rate"),
+        retry_after_ms=args.retry_after_ms,
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline Grok / Document Intelligence / Blob stand-in for load tests.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    for service, latency in (("llm", "lognormal:1500,0.5"), ("ocr", "lognormal:3000,0.4")):
+        parser.add_argument(f"--{service}-latency", default=latency, help="fixed:MS | uniform:LO,HI | lognormal:MEDIAN,SIGMA | exp:MEAN")
+        parser.add_argument(f"--{service}-error-rate", type=float, default=0.0)
+        parser.add_argument(f"--{service}-throttle-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after-ms", type=int, default=1000)
+    parser.add_argument("--ocr-biomarkers", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    config = FakeAzureConfig(
+        llm=_behaviour(args, "llm"), ocr=_behaviour(args, "ocr"),
+        ocr_biomarkers=args.ocr_biomarkers, seed=args.seed,
+    )
+    web.run_app(create_app(config), host=args.host, port=args.port)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,263 @@
+"""
+Benchmark runner: timing, allocation tracking and regression check.
+
+Absolute timings only mean something on the machine they were taken on, so a
+run is always a comparison made on one machine in one go: the cases are run
+against the code at a git ref (default HEAD, i.e. the uncommitted changes are
+measured) and against the working tree, alternating between the two for
+--rounds rounds, each in a fresh process. The best figure of each side is
+compared, so a background hiccup during one round does not count as a
+regression.
+
+    python -m benchmarks                      # working tree vs HEAD
+    python -m benchmarks --against main       # working tree vs main
+    python -m benchmarks --record out.json    # only measure this tree
+"""
+import argparse
+import asyncio
+import gc
+import json
+import math
+import platform
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from benchmarks.cases import CASES, Call, Case
+
+
+PACKAGE_DIR = Path(__file__).parent
+PROJECT_ROOT = PACKAGE_DIR.parent
+MIN_TIME = 0.5          # seconds of timed calls per case/size
+MIN_SAMPLES = 20
+MAX_SAMPLES = 20000
+MIN_SAMPLE_MS = 0.2     # faster calls are timed in batches; p50/p99 are then per-call batch means
+ALLOC_SAMPLES = 10      # calls measured under tracemalloc per case/size
+ALLOC_SLACK_KIB = 4.0   # absolute slack so tiny cases don't flap on allocator noise
+P99_SLACK_MS = 0.25     # absolute slack so sub-0.1 ms cases don't flap on scheduler/GC noise
+ROUNDS = 3              # alternating runs per side
+
+# Default regression thresholds (fractions of the figures measured at the ref)
+OPS_TOLERANCE = 0.25
+P99_TOLERANCE = 1.00    # tails include GC pauses
+ALLOC_TOLERANCE = 0.10
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+async def _measure(calls: List[Call], min_time: float) -> Dict[str, float]:
+    # Warm-up: one pass over every input fills the canonicalization caches and
+    # tells how many calls make up one timing sample (see MIN_SAMPLE_MS).
+    t0 = time.perf_counter_ns()
+    for call in calls:
+        await call()
+    warm_ms = (time.perf_counter_ns() - t0) / 1e6 / len(calls)
+    inner = max(1, math.ceil(MIN_SAMPLE_MS / warm_ms)) if warm_ms else 1
+
+    # Fixtures are moved out of the collector's reach so GC pauses reflect the
+    # engines' own garbage, not the size of the benchmark inputs.
+    gc.collect()
+    gc.freeze()
+    try:
+        durations = []
+        started = time.perf_counter()
+        i = 0
+        while len(durations) < MAX_SAMPLES and (len(durations) < MIN_SAMPLES or time.perf_counter() - started < min_time):
+            t0 = time.perf_counter_ns()
+            for _ in range(inner):
+                await calls[i % len(calls)]()
+                i += 1
+            durations.append((time.perf_counter_ns() - t0) / 1e6 / inner)
+    finally:
+        gc.unfreeze()
+    total_ms = sum(durations) * inner
+
+    peaks, retained = [], []
+    tracemalloc.start()
+    try:
+        for call in calls[:ALLOC_SAMPLES]:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            result = await call()
+            after, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(after - before)
+            del result
+    finally:
+        tracemalloc.stop()
+
+    durations.sort()
+    return {
+        "ops": i,
+        "ops_per_sec": round(i / (total_ms / 1000.0), 1) if total_ms else math.inf,
+        "p50_ms": round(_percentile(durations, 50), 4),
+        "p99_ms": round(_percentile(durations, 99), 4),
+        "alloc_peak_kib": round(max(peaks) / 1024.0, 1),
+        "alloc_result_kib": round(max(retained) / 1024.0, 1),
+    }
+
+
+def _key(case: Case, size: int) -> str:
+    return f"{case.name}[n={size}]" if size else case.name
+
+
+async def run_cases(name_filter: Optional[str], sizes: Optional[List[int]], min_time: float) -> Dict[str, Dict[str, float]]:
+    """Run the selected cases in this process."""
+    results = {}
+    for case in CASES:
+        if name_filter and name_filter not in case.name:
+            continue
+        for size in case.sizes:
+            if sizes and size and size not in sizes:
+                continue
+            key = _key(case, size)
+            results[key] = await _measure(case.prepare(size), min_time)
+    return results
+
+
+def _print_results(results: Dict[str, Dict[str, float]]):
+    for key, r in results.items():
+        print(
+            f"{key:<40} {r['ops_per_sec']:>12,.1f} ops/s  p50 {r['p50_ms']:>9.3f} ms  "
+            f"p99 {r['p99_ms']:>9.3f} ms  peak {r['alloc_peak_kib']:>9.1f} KiB",
+            flush=True,
+        )
+
+
+def _export_tree(ref: str, dest: Path):
+    """Write the tree of git `ref` to `dest`, with this benchmarks package in it, so both sides run the same cases."""
+    archive = subprocess.run(["git", "archive", "--format=tar", ref], cwd=PROJECT_ROOT, capture_output=True, check=True)
+    with tempfile.TemporaryFile() as tar_file:
+        tar_file.write(archive.stdout)
+        tar_file.seek(0)
+        with tarfile.open(fileobj=tar_file) as tar:
+            tar.extractall(dest, filter="data")
+    for path in PACKAGE_DIR.glob("*.py"):
+        (dest / "benchmarks").mkdir(exist_ok=True)
+        (dest / "benchmarks" / path.name).write_bytes(path.read_bytes())
+
+
+def _record_in(tree: Path, forwarded: List[str], output: Path) -> Dict[str, Dict[str, float]]:
+    """Measure the code in `tree` in a fresh process (from the current directory, so local.env is found)."""
+    # `tree` goes ahead of the current directory, which is the project root when run from there.
+    bootstrap = "import sys; sys.path.insert(0, sys.argv.pop(1)); from benchmarks.runner import main; sys.exit(main())"
+    subprocess.run([sys.executable, "-c", bootstrap, str(tree), "--record", str(output), *forwarded], check=True)
+    return json.loads(output.read_text())["results"]
+
+
+def _best(runs: List[Dict[str, Dict[str, float]]]) -> Dict[str, Dict[str, float]]:
+    """Best figure of each metric over the rounds, per case/size."""
+    best = {}
+    for key in runs[0]:
+        rounds = [run[key] for run in runs if key in run]
+        best[key] = {
+            "ops_per_sec": max(r["ops_per_sec"] for r in rounds),
+            "p50_ms": min(r["p50_ms"] for r in rounds),
+            "p99_ms": min(r["p99_ms"] for r in rounds),
+            "alloc_peak_kib": min(r["alloc_peak_kib"] for r in rounds),
+            "alloc_result_kib": min(r["alloc_result_kib"] for r in rounds),
+        }
+    return best
+
+
+def compare(results: Dict[str, Dict[str, float]], base: Dict[str, Dict[str, float]],
+            ops_tolerance: float, p99_tolerance: float, alloc_tolerance: float) -> List[str]:
+    """Return one message per regression of `results` against `base`, measured on the same machine."""
+    regressions = []
+    for key, r in results.items():
+        b = base.get(key)
+        if b is None:
+            continue
+        expected_ops = b["ops_per_sec"] * (1 - ops_tolerance)
+        if r["ops_per_sec"] < expected_ops:
+            regressions.append(f"{key}: {r['ops_per_sec']:,.1f} ops/s < {expected_ops:,.1f} allowed ({b['ops_per_sec']:,.1f} at base)")
+        allowed_p99 = b["p99_ms"] * (1 + p99_tolerance) + P99_SLACK_MS
+        if r["p99_ms"] > allowed_p99:
+            regressions.append(f"{key}: p99 {r['p99_ms']:.3f} ms > {allowed_p99:.3f} ms allowed")
+        allowed_kib = b["alloc_peak_kib"] * (1 + alloc_tolerance) + ALLOC_SLACK_KIB
+        if r["alloc_peak_kib"] > allowed_kib:
+            regressions.append(f"{key}: peak {r['alloc_peak_kib']:.1f} KiB > {allowed_kib:.1f} KiB allowed")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--filter", help="only run cases whose name contains this string")
+    parser.add_argument("--sizes", type=int, nargs="+", help=f"report sizes to run (default: {' '.join(map(str, CASES[0].sizes))})")
+    parser.add_argument("--min-time", type=float, default=MIN_TIME, help="seconds of timed calls per case/size")
+    parser.add_argument("--against", default="HEAD", help="git ref to compare the working tree with (default: HEAD)")
+    parser.add_argument("--rounds", type=int, default=ROUNDS, help="alternating runs of each side; the best figures are compared")
+    parser.add_argument("--record", type=Path, help="only measure this tree and write the results to this JSON file")
+    parser.add_argument("--output", type=Path, help="also write both sides' figures to this JSON file")
+    parser.add_argument("--ops-tolerance", type=float, default=OPS_TOLERANCE)
+    parser.add_argument("--p99-tolerance", type=float, default=P99_TOLERANCE)
+    parser.add_argument("--alloc-tolerance", type=float, default=ALLOC_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    if args.record:
+        results = asyncio.run(run_cases(args.filter, args.sizes, args.min_time))
+        args.record.write_text(json.dumps({"python": platform.python_version(), "results": results}, indent=2) + "\n")
+        return 0
+
+    forwarded = ["--min-time", str(args.min_time)]
+    if args.filter:
+        forwarded += ["--filter", args.filter]
+    if args.sizes:
+        forwarded += ["--sizes", *map(str, args.sizes)]
+
+    print(f"{platform.python_implementation()} {platform.python_version()} on {platform.machine()}")
+    print(f"working tree vs {args.against}, {args.rounds} round(s)", flush=True)
+    base_runs, head_runs = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        base_tree = Path(tmp, "base")
+        try:
+            _export_tree(args.against, base_tree)
+        except subprocess.CalledProcessError as e:
+            print(f"could not export {args.against}: {e.stderr.decode().strip()}", file=sys.stderr)
+            return 2
+        try:
+            for i in range(args.rounds):
+                base_runs.append(_record_in(base_tree, forwarded, Path(tmp, f"base-{i}.json")))
+                head_runs.append(_record_in(PROJECT_ROOT, forwarded, Path(tmp, f"head-{i}.json")))
+        except subprocess.CalledProcessError:
+            print("a benchmark run failed; see its output above", file=sys.stderr)
+            return 2
+
+    base, results = _best(base_runs), _best(head_runs)
+    print(f"\n{args.against}:")
+    _print_results(base)
+    print("\nworking tree:")
+    _print_results(results)
+
+    if args.output:
+        args.output.write_text(json.dumps({
+            "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "against": args.against,
+            "rounds": args.rounds,
+            "base": base,
+            "results": results,
+        }, indent=2) + "\n")
+
+    regressions = compare(results, base, args.ops_tolerance, args.p99_tolerance, args.alloc_tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) against {args.against}:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"\nno regressions against {args.against}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
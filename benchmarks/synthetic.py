@@ -0,0 +1,140 @@
+"""
+Deterministic synthetic inputs for the benchmarks.
+
+Reports are generated from the compiled range index, so every catalog marker,
+both sexes and every age band of the range table are exercised. Reports larger
+than the catalog are padded with markers the catalog does not know (as OCR
+output often contains), which take the unknown-marker path.
+"""
+import math
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+from data_processing.biomarkers_range import centum_predefined_ranges
+from data_processing.report_genration import (
+    ANALYTE_CONVERSIONS, GENERIC_CONVERSIONS, RANGE_INDEX, CompiledBands, _resolve_bands,
+)
+from data_processing.calculate_age import FIELD_WEIGHTS
+
+
+SEXES = ("M", "F")
+CATALOG = tuple(centum_predefined_ranges.keys())
+NON_NUMERIC_RESULTS = ("pending", "see note", "<0.1", "")
+
+
+def representative_ages() -> Tuple[int, ...]:
+    """One age inside every distinct age band of the range table, plus the defaults."""
+    ages = {25, 45, 70}
+    for marker in RANGE_INDEX.values():
+        for _, age_bands in marker.by_sex.values():
+            for band in age_bands:
+                lo = 0 if math.isinf(band.lo) else int(band.lo)
+                hi = 100 if math.isinf(band.hi) else int(band.hi)
+                ages.add(max(18, (lo + hi) // 2))
+    return tuple(sorted(ages))
+
+
+def profiles() -> List[Tuple[str, int]]:
+    """(sex, age) pairs covering both sexes and all age bands."""
+    return [(sex, age) for age in representative_ages() for sex in SEXES]
+
+
+def _raw_name(key: str, rng: random.Random) -> str:
+    """An OCR-style spelling of a catalog key that canonicalizes back to it."""
+    words = key.split("_")
+    style = rng.randrange(3)
+    if style == 0:
+        return " ".join(words).upper()
+    if style == 1:
+        return " ".join(w.capitalize() for w in words)
+    return key
+
+
+def _alternate_unit(key: str, exp_unit: str, rng: random.Random) -> Optional[Tuple[str, float]]:
+    """A unit the engine can convert to `exp_unit`, with the factor to get there."""
+    table = ANALYTE_CONVERSIONS.get(key, GENERIC_CONVERSIONS)
+    options = sorted((src, conv.factor) for (src, dst), conv in table.items() if dst == exp_unit and conv.factor)
+    return rng.choice(options) if options else None
+
+
+def _numeric_value(bands: CompiledBands, rng: random.Random) -> float:
+    """A value on a band edge, between two edges or outside all of them."""
+    edges = bands.edges
+    if not edges:
+        return round(rng.uniform(0, 100), 2)
+    i = rng.randrange(len(edges))
+    pick = rng.randrange(4)
+    if pick == 0:
+        return edges[i]
+    if pick == 1 and i + 1 < len(edges):
+        return (edges[i] + edges[i + 1]) / 2.0
+    if pick == 2:
+        return edges[0] - abs(edges[0]) * 0.1 - 0.5
+    return edges[-1] * 1.1 + 0.5
+
+
+def _entry(key: str, sex: str, age: int, rng: random.Random) -> Dict[str, str]:
+    bands = _resolve_bands(RANGE_INDEX[key], sex, age)
+    if bands.categorical is not None:
+        options = [opt for _, _, opts in bands.categorical for opt in opts]
+        return {"result": rng.choice(options).title(), "units": bands.expected_unit}
+    if rng.random() < 0.03:
+        return {"result": rng.choice(NON_NUMERIC_RESULTS), "units": bands.expected_unit}
+
+    value, unit = _numeric_value(bands, rng), bands.expected_unit
+    if rng.random() < 0.25:
+        alternate = _alternate_unit(key, bands.exp_unit, rng)
+        if alternate:
+            unit, factor = alternate
+            value = value / factor
+    return {"result": f"{value:.6g}", "units": unit}
+
+
+def synthetic_lab_results(n_biomarkers: int, sex: str, age: int, seed: int = 0) -> Dict[str, Dict[str, str]]:
+    """
+    OCR-shaped lab results ({raw name: {"result", "units"}}) with `n_biomarkers`
+    entries: catalog markers first (in shuffled order), then unknown markers.
+    """
+    rng = random.Random(f"{seed}:{n_biomarkers}:{sex}:{age}")
+    keys = list(CATALOG)
+    rng.shuffle(keys)
+    out: Dict[str, Dict[str, str]] = {}
+    for key in keys[:n_biomarkers]:
+        out[_raw_name(key, rng)] = _entry(key, sex, age, rng)
+    for i in range(n_biomarkers - len(out)):
+        out[f"Extended Panel Marker {i:05d}"] = {"result": f"{rng.uniform(0, 500):.3g}", "units": "mg/dL"}
+    return out
+
+
+def synthetic_buckets(n_biomarkers: int, sex: str, age: int, seed: int = 0) -> Dict[str, Dict[str, Any]]:
+    """
+    A stored-report shaped classification ({"good", "normal", "critical",
+    "invalid_biomarkers"}) with `n_biomarkers` entries. Catalog markers come
+    first; the rest use names outside the catalog so the section and category
+    lookups see misses as well as hits.
+    """
+    rng = random.Random(f"buckets:{seed}:{n_biomarkers}:{sex}:{age}")
+    keys = list(CATALOG)
+    rng.shuffle(keys)
+    keys = keys[:n_biomarkers] + [f"extended_panel_marker_{i:05d}" for i in range(max(0, n_biomarkers - len(CATALOG)))]
+    out: Dict[str, Dict[str, Any]] = {"good": {}, "normal": {}, "critical": {}, "invalid_biomarkers": {}}
+    for key in keys:
+        bucket = rng.choice(("good", "normal", "critical", "good", "normal", "invalid_biomarkers"))
+        value = round(rng.uniform(0, 300), 2)
+        if bucket == "invalid_biomarkers":
+            out[bucket][key] = {"reason": "unit_mismatch", "value": value, "unit": "mg/dL", "expected_unit": "mmol/L"}
+        else:
+            out[bucket][key] = {"value": value, "unit": "mg/dL", "expected_unit": "mg/dL"}
+    return out
+
+
+def synthetic_questionnaire(seed: int = 0) -> Dict[str, str]:
+    """step_2_answers with an A/B/C/D answer for every weighted field (some left blank)."""
+    rng = random.Random(f"questionnaire:{seed}")
+    answers = {}
+    for field in FIELD_WEIGHTS:
+        if rng.random() < 0.1:
+            continue
+        answers[field] = f"{rng.choice('ABCD')}: answer"
+    return answers
+
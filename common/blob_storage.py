@@ -0,0 +1,166 @@
+"""
+Storage of uploaded files, behind one interface with two backends.
+
+    async with blob_storage() as storage:
+        url = await storage.upload(blob_name, f, "application/pdf", length=size)
+
+- AzureBlobStorage (BLOB_STORAGE_BACKEND="azure") uses the async SDK on one
+  pooled client per process, opened in the app lifespan, which also checks
+  the container once. Blobs up to BLOB_SINGLE_PUT_BYTES go in a single
+  request; larger ones as BLOB_BLOCK_BYTES blocks, BLOB_UPLOAD_CONCURRENCY at
+  a time.
+- LocalBlobStorage (BLOB_STORAGE_BACKEND="local") writes under
+  BLOB_LOCAL_ROOT/<container>/, for tests and benchmarks without Azure.
+
+Outside the app (scripts, jobs run standalone) each use opens its own
+storage and checks the container then.
+"""
+import asyncio
+import shutil
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Optional
+
+from azure.core.exceptions import ResourceExistsError
+from azure.storage.blob import BlobSasPermissions, ContentSettings, generate_blob_sas
+from azure.storage.blob.aio import BlobServiceClient
+
+from common.config import settings, logger
+
+
+class BlobStorage(ABC):
+    """Where uploaded files are kept. Blob names are relative paths such as "<user_id>/<file>"."""
+
+    @abstractmethod
+    async def ensure_container(self):
+        """Create the container if it does not exist."""
+
+    @abstractmethod
+    async def upload(self, blob_name: str, data: BinaryIO, content_type: str, length: Optional[int] = None) -> str:
+        """Store `data` under `blob_name`, replacing any existing blob; returns its URL."""
+
+    @abstractmethod
+    def read_url(self, blob_name: str, expiry_minutes: int) -> str:
+        """A URL the client can read the blob from for `expiry_minutes`."""
+
+    async def close(self):
+        pass
+
+
+class AzureBlobStorage(BlobStorage):
+    def __init__(self, account_url: str, account_name: str, account_key: str, container_name: str):
+        if not account_url or not account_key:
+            raise ValueError("Azure Storage account URL or key not set.")
+        self._account_name = account_name
+        self._account_key = account_key
+        self._service = BlobServiceClient(
+            account_url=account_url, credential=account_key,
+            max_single_put_size=settings.BLOB_SINGLE_PUT_BYTES, max_block_size=settings.BLOB_BLOCK_BYTES,
+        )
+        self._container = self._service.get_container_client(container_name)
+
+    async def ensure_container(self):
+        try:
+            await self._container.create_container()
+        except ResourceExistsError:
+            pass
+
+    async def upload(self, blob_name: str, data: BinaryIO, content_type: str, length: Optional[int] = None) -> str:
+        blob_client = self._container.get_blob_client(blob_name)
+        await blob_client.upload_blob(
+            data, length=length, overwrite=True,
+            content_settings=ContentSettings(content_type=content_type),
+            max_concurrency=settings.BLOB_UPLOAD_CONCURRENCY,
+        )
+        return blob_client.url
+
+    def read_url(self, blob_name: str, expiry_minutes: int) -> str:
+        sas_token = generate_blob_sas(
+            account_name=self._account_name,
+            container_name=self._container.container_name,
+            blob_name=blob_name,
+            account_key=self._account_key,
+            permission=BlobSasPermissions(read=True),
+            expiry=datetime.now(timezone.utc) + timedelta(minutes=expiry_minutes),
+        )
+        return f"{self._container.get_blob_client(blob_name).url}?{sas_token}"
+
+    async def close(self):
+        await self._service.close()
+
+
+class LocalBlobStorage(BlobStorage):
+    def __init__(self, root: str, container_name: str):
+        self._root = Path(root, container_name).resolve()
+
+    def _path(self, blob_name: str) -> Path:
+        path = (self._root / blob_name).resolve()
+        if self._root not in path.parents:
+            raise ValueError(f"Invalid blob name: {blob_name}")
+        return path
+
+    async def ensure_container(self):
+        self._root.mkdir(parents=True, exist_ok=True)
+
+    async def upload(self, blob_name: str, data: BinaryIO, content_type: str, length: Optional[int] = None) -> str:
+        path = self._path(blob_name)
+
+        def write():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "wb") as out:
+                shutil.copyfileobj(data, out, settings.BLOB_BLOCK_BYTES)
+
+        await asyncio.to_thread(write)
+        return path.as_uri()
+
+    def read_url(self, blob_name: str, expiry_minutes: int) -> str:
+        return self._path(blob_name).as_uri()
+
+
+def _new_storage() -> BlobStorage:
+    if settings.BLOB_STORAGE_BACKEND == "local":
+        return LocalBlobStorage(settings.BLOB_LOCAL_ROOT, settings.AZURE_STORAGE_CONTAINER_NAME)
+    return AzureBlobStorage(
+        settings.AZURE_STORAGE_ACCOUNT_URL, settings.AZURE_STORAGE_ACCOUNT_NAME,
+        settings.AZURE_STORAGE_ACCOUNT_KEY, settings.AZURE_STORAGE_CONTAINER_NAME,
+    )
+
+
+_shared_storage: Optional[BlobStorage] = None
+
+
+async def open_blob_storage() -> BlobStorage:
+    """Open the shared storage and check its container. Call from the lifespan."""
+    global _shared_storage
+    storage = _new_storage()
+    try:
+        await storage.ensure_container()
+    except Exception as e:
+        logger.error(f"Could not ensure the blob container, uploads may fail: {e}")
+    _shared_storage = storage
+    logger.info(f"Blob storage opened ({settings.BLOB_STORAGE_BACKEND}).")
+    return storage
+
+
+async def close_blob_storage():
+    global _shared_storage
+    storage, _shared_storage = _shared_storage, None
+    if storage is not None:
+        await storage.close()
+        logger.info("Blob storage closed.")
+
+
+@asynccontextmanager
+async def blob_storage() -> AsyncIterator[BlobStorage]:
+    """The shared storage if the app opened one, otherwise a storage for this use only."""
+    if _shared_storage is not None:
+        yield _shared_storage
+        return
+    storage = _new_storage()
+    try:
+        await storage.ensure_container()
+        yield storage
+    finally:
+        await storage.close()
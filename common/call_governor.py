@@ -0,0 +1,317 @@
+"""
+Outbound-call governor for the Grok deployment and Document Intelligence.
+
+Every call to either service goes through its governor:
+
+    resp = await LLM_GOVERNOR.call(lambda: client.complete(...))
+
+A call waits for a free in-flight slot, a token from the rate bucket and the
+end of any throttling pause before it is sent. A 429 (or a transient 408/5xx
+or connection error) is retried with exponential backoff and jitter; when the
+service sends Retry-After, that delay is used instead and the whole governor
+pauses for it, so the other callers back off too rather than walking into the
+same 429. The Azure clients are built with their own retries off so this is
+the only retry layer.
+
+Optionally (OUTBOUND_LEASE_ENABLED) the governors coordinate across worker
+processes through Mongo: a call also holds one of a fixed number of lease
+documents per governor, and throttling pauses are shared. Leases expire after
+OUTBOUND_LEASE_TTL_SECONDS, so a crashed worker cannot hold them for good.
+Rate buckets stay per process.
+
+Queue depth, in-flight calls, wait times, retries and throttles are kept per
+governor (outbound_call_info).
+"""
+import asyncio
+import random
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone, timedelta
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+from azure.core.exceptions import HttpResponseError, ServiceRequestError, ServiceResponseError
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+from common.config import settings, logger
+
+
+LEASE_COLLECTION = "outbound_call_leases"
+LEASE_POLL_SECONDS = 0.25
+RETRYABLE_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+
+T = TypeVar("T")
+
+_lease_collection: Optional[AsyncIOMotorCollection] = None
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """The delay the service asked for in retry-after-ms / Retry-After, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    for header in ("retry-after-ms", "x-ms-retry-after-ms"):
+        value = headers.get(header)
+        if value:
+            try:
+                return max(0.0, float(value) / 1000.0)
+            except ValueError:
+                pass
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, HttpResponseError):
+        return error.status_code in RETRYABLE_STATUS
+    return isinstance(error, (ServiceRequestError, ServiceResponseError, asyncio.TimeoutError))
+
+
+class _TokenBucket:
+    """`rate` tokens per second, at most `burst` saved up. rate <= 0 disables it."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def take(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class CallGovernor:
+    """Rate limit, concurrency cap and shared backoff for one outbound service."""
+
+    def __init__(self, name: str, rate_per_second: float, burst: int, max_in_flight: int, global_max_in_flight: int):
+        self.name = name
+        self.max_in_flight = max(1, max_in_flight)
+        self.global_max_in_flight = max(1, global_max_in_flight)
+        self._bucket = _TokenBucket(rate_per_second, burst)
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._paused_until = 0.0        # time.monotonic()
+        self._stats = {
+            "queued": 0, "max_queued": 0, "in_flight": 0,
+            "calls": 0, "failures": 0, "retries": 0, "throttled": 0,
+            "wait_ms": 0.0, "max_wait_ms": 0.0,
+        }
+
+    # ── pausing ──────────────────────────────────────────────────────
+    async def _pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        if _lease_collection is not None:
+            until = datetime.now(timezone.utc) + timedelta(seconds=seconds)
+            try:
+                await _lease_collection.update_one({"_id": f"{self.name}:pause"}, {"$max": {"until": until}}, upsert=True)
+            except Exception as e:
+                logger.warning(f"Could not share the {self.name} throttling pause: {e}")
+
+    async def _wait_for_pause(self):
+        if _lease_collection is not None:
+            try:
+                doc = await _lease_collection.find_one({"_id": f"{self.name}:pause"})
+                if doc and doc.get("until"):
+                    until = doc["until"].replace(tzinfo=timezone.utc) if doc["until"].tzinfo is None else doc["until"]
+                    remaining = (until - datetime.now(timezone.utc)).total_seconds()
+                    if remaining > 0:
+                        self._paused_until = max(self._paused_until, time.monotonic() + remaining)
+            except Exception as e:
+                logger.warning(f"Could not read the {self.name} throttling pause: {e}")
+        remaining = self._paused_until - time.monotonic()
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+
+    # ── cross-process leases ─────────────────────────────────────────
+    def _lease_ids(self) -> List[str]:
+        return [f"{self.name}:{i}" for i in range(self.global_max_in_flight)]
+
+    async def _ensure_leases(self, collection: AsyncIOMotorCollection):
+        for lease_id in self._lease_ids():
+            await collection.update_one(
+                {"_id": lease_id},
+                {"$setOnInsert": {"holder": None, "expires_at": datetime.fromtimestamp(0, timezone.utc)}},
+                upsert=True
+            )
+
+    async def _acquire_lease(self) -> Optional[Dict[str, str]]:
+        collection = _lease_collection
+        if collection is None:
+            return None
+        holder = uuid.uuid4().hex
+        while True:
+            now = datetime.now(timezone.utc)
+            try:
+                doc = await collection.find_one_and_update(
+                    {"_id": {"$in": self._lease_ids()}, "$or": [{"holder": None}, {"expires_at": {"$lt": now}}]},
+                    {"$set": {"holder": holder, "expires_at": now + timedelta(seconds=settings.OUTBOUND_LEASE_TTL_SECONDS)}},
+                    projection={"_id": 1}
+                )
+            except Exception as e:
+                # Mongo trouble must not stop the call; it is still governed per process.
+                logger.warning(f"Could not take a {self.name} lease, sending without one: {e}")
+                return None
+            if doc is not None:
+                return {"_id": doc["_id"], "holder": holder}
+            await asyncio.sleep(LEASE_POLL_SECONDS * (0.5 + random.random()))
+
+    async def _release_lease(self, lease: Optional[Dict[str, str]]):
+        if lease is None or _lease_collection is None:
+            return
+        try:
+            await _lease_collection.update_one(lease, {"$set": {"holder": None}})
+        except Exception as e:
+            # The lease expires on its own.
+            logger.warning(f"Could not release {self.name} lease {lease['_id']}: {e}")
+
+    # ── slots ────────────────────────────────────────────────────────
+    async def _acquire(self) -> Optional[Dict[str, str]]:
+        stats = self._stats
+        stats["queued"] += 1
+        stats["max_queued"] = max(stats["max_queued"], stats["queued"])
+        started = time.perf_counter()
+        try:
+            await self._slots.acquire()
+            try:
+                await self._wait_for_pause()
+                await self._bucket.take()
+                lease = await self._acquire_lease()
+            except BaseException:
+                self._slots.release()
+                raise
+        finally:
+            stats["queued"] -= 1
+            waited = (time.perf_counter() - started) * 1000.0
+            stats["wait_ms"] += waited
+            stats["max_wait_ms"] = max(stats["max_wait_ms"], waited)
+        stats["in_flight"] += 1
+        return lease
+
+    async def _release(self, lease: Optional[Dict[str, str]]):
+        self._stats["in_flight"] -= 1
+        self._slots.release()
+        await self._release_lease(lease)
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        if attempt >= settings.OUTBOUND_MAX_RETRIES or not _is_retryable(error):
+            return None
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            return min(retry_after, settings.OUTBOUND_BACKOFF_MAX_SECONDS)
+        backoff = min(settings.OUTBOUND_BACKOFF_MAX_SECONDS, settings.OUTBOUND_BACKOFF_BASE_SECONDS * (2 ** attempt))
+        return backoff * (0.5 + random.random() / 2)
+
+    @asynccontextmanager
+    async def hold(self, send: Callable[[], Awaitable[T]]) -> AsyncIterator[T]:
+        """
+        Send a call under the governor (retrying as above) and keep its slot
+        until the block exits, e.g. while a streamed response is read.
+        """
+        attempt = 0
+        while True:
+            lease = await self._acquire()
+            try:
+                result = await send()
+            except Exception as e:
+                await self._release(lease)
+                delay = self._retry_delay(e, attempt)
+                throttled = isinstance(e, HttpResponseError) and e.status_code == 429
+                if throttled:
+                    self._stats["throttled"] += 1
+                if delay is None:
+                    self._stats["failures"] += 1
+                    raise
+                self._stats["retries"] += 1
+                attempt += 1
+                logger.warning(f"{self.name} call failed ({e.__class__.__name__}), retry {attempt} in {delay:.1f}s")
+                if throttled:
+                    await self._pause(delay)    # the next _acquire waits it out, with everyone else
+                else:
+                    await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # Cancelled (e.g. by a wait_for timeout): free the slot, no retry.
+                await self._release(lease)
+                raise
+            self._stats["calls"] += 1
+            try:
+                yield result
+            finally:
+                await self._release(lease)
+            return
+
+    async def call(self, send: Callable[[], Awaitable[T]]) -> T:
+        """Send a call under the governor and return its result."""
+        async with self.hold(send) as result:
+            return result
+
+    def info(self) -> Dict[str, Any]:
+        stats = self._stats
+        waits = stats["calls"] + stats["failures"] + stats["retries"]
+        return {
+            **stats,
+            "wait_ms": round(stats["wait_ms"], 1),
+            "max_wait_ms": round(stats["max_wait_ms"], 1),
+            "avg_wait_ms": round(stats["wait_ms"] / waits, 1) if waits else 0.0,
+            "paused_for_s": round(max(0.0, self._paused_until - time.monotonic()), 1),
+            "max_in_flight": self.max_in_flight,
+            "rate_per_second": self._bucket.rate,
+        }
+
+
+LLM_GOVERNOR = CallGovernor(
+    "llm", settings.LLM_RATE_PER_SECOND, settings.LLM_RATE_BURST,
+    settings.LLM_MAX_IN_FLIGHT, settings.LLM_GLOBAL_MAX_IN_FLIGHT,
+)
+OCR_GOVERNOR = CallGovernor(
+    "ocr", settings.OCR_RATE_PER_SECOND, settings.OCR_RATE_BURST,
+    settings.OCR_MAX_IN_FLIGHT, settings.OCR_GLOBAL_MAX_IN_FLIGHT,
+)
+GOVERNORS = (LLM_GOVERNOR, OCR_GOVERNOR)
+
+
+async def install_call_leases(collection: AsyncIOMotorCollection):
+    """Coordinate the governors across processes through `collection`. Call from the lifespan."""
+    global _lease_collection
+    try:
+        for governor in GOVERNORS:
+            await governor._ensure_leases(collection)
+    except Exception as e:
+        logger.warning(f"Outbound call leases unavailable, governing per process only: {e}")
+        return
+    _lease_collection = collection
+    logger.info("Outbound call leases installed.")
+
+
+def uninstall_call_leases():
+    global _lease_collection
+    _lease_collection = None
+
+
+def outbound_call_info() -> Dict[str, Any]:
+    """Queue depth, wait times and retry counters per governor."""
+    return {
+        "shared_leases": _lease_collection is not None,
+        "governors": {governor.name: governor.info() for governor in GOVERNORS},
+    }
@@ -172,12 +172,76 @@ class Settings(BaseSettings):
     AZURE_STORAGE_ACCOUNT_NAME: str
     AZURE_STORAGE_CONTAINER_NAME: str
     FERNET_KEY: str
+    # Send names the local biomarker resolver finds ambiguous to the LLM
+    BIOMARKER_NAME_LLM_FALLBACK: bool = True
+    # Pooled LLM client opened in the app lifespan
+    LLM_POOL_MAX_CONNECTIONS: int = 20
+    LLM_POOL_KEEPALIVE_SECONDS: float = 60.0
+    LLM_WARMUP: bool = False
+    LLM_WARMUP_TIMEOUT_SECONDS: float = 10.0
+    # Content-addressed cache of clinical and comparison summaries
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_LRU_SIZE: int = 256
+    LLM_CACHE_TTL_HOURS: int = 24 * 30
+    # Clinical summary as concurrent per-section calls plus one action plan call
+    CLINICAL_SUMMARY_FANOUT: bool = False
+    CLINICAL_SUMMARY_FANOUT_CONCURRENCY: int = 4
+    CLINICAL_SUMMARY_CALL_TIMEOUT_SECONDS: float = 90.0
+    # Rule-based summary when the LLM one misses its deadline or fails; upgraded later
+    CLINICAL_SUMMARY_FALLBACK: bool = True
+    CLINICAL_SUMMARY_DEADLINE_SECONDS: float = 60.0
+    # Compare a report that becomes ready with the user's previous one ahead of the request
+    PRECOMPUTE_PREVIOUS_COMPARISON: bool = True
+    # Structured LLM output: "json_schema", "json_object" or "" (prompt only); partial re-asks per reply
+    LLM_RESPONSE_FORMAT: str = "json_object"
+    LLM_JSON_REASK_ATTEMPTS: int = 1
+    # Outbound-call governor: per-process rate and in-flight limits, shared retry/backoff
+    LLM_RATE_PER_SECOND: float = 5.0
+    LLM_RATE_BURST: int = 10
+    LLM_MAX_IN_FLIGHT: int = 8
+    OCR_RATE_PER_SECOND: float = 5.0
+    OCR_RATE_BURST: int = 5
+    OCR_MAX_IN_FLIGHT: int = 10
+    # Documents of one upload analysed at the same time
+    OCR_BATCH_CONCURRENCY: int = 5
+    # Reuse the blob and lab results of a file the same user already uploaded (SHA-256 of the content)
+    UPLOAD_DEDUP_ENABLED: bool = True
+    # Uploaded files: "azure", or "local" (files under BLOB_LOCAL_ROOT, for tests and benchmarks)
+    BLOB_STORAGE_BACKEND: str = "azure"
+    BLOB_LOCAL_ROOT: str = "blob_storage"
+    # Azure uploads: one request up to BLOB_SINGLE_PUT_BYTES, larger blobs in blocks uploaded concurrently
+    BLOB_SINGLE_PUT_BYTES: int = 4 * 1024 * 1024
+    BLOB_BLOCK_BYTES: int = 1024 * 1024
+    BLOB_UPLOAD_CONCURRENCY: int = 4
+    # Status stream of the asynchronous upload: fallback re-read interval and maximum duration
+    DOCUMENT_STATUS_POLL_SECONDS: float = 2.0
+    DOCUMENT_STATUS_STREAM_TIMEOUT_SECONDS: float = 600.0
+    # Asynchronous upload: a pending document not claimed for this long is re-queued, or failed if its local copy is gone
+    DOCUMENT_PENDING_STALE_SECONDS: float = 600.0
+    # How often each worker looks for such documents
+    DOCUMENT_RECOVERY_INTERVAL_SECONDS: float = 120.0
+    OUTBOUND_MAX_RETRIES: int = 4
+    OUTBOUND_BACKOFF_BASE_SECONDS: float = 1.0
+    OUTBOUND_BACKOFF_MAX_SECONDS: float = 30.0
+    # Cross-process coordination of the governors through Mongo leases
+    OUTBOUND_LEASE_ENABLED: bool = False
+    OUTBOUND_LEASE_TTL_SECONDS: float = 300.0
+    LLM_GLOBAL_MAX_IN_FLIGHT: int = 16
+    OCR_GLOBAL_MAX_IN_FLIGHT: int = 8
+    # Load testing: send Grok, Document Intelligence and Blob Storage calls to benchmarks/fake_azure.py
+    FAKE_AZURE_ENDPOINT: Optional[str] = None
     class Config:
         env_file = "local.env"
         env_file_encoding = "utf-8"
 
 settings = Settings()
 
+if settings.FAKE_AZURE_ENDPOINT:
+    _fake = settings.FAKE_AZURE_ENDPOINT.rstrip("/")
+    settings.AZURE_GROK_ENDPOINT = _fake
+    settings.AZURE_AI_DOCUMENT_INTELLIGENCE_ENDPOINT = _fake
+    settings.AZURE_STORAGE_ACCOUNT_URL = f"{_fake}/{settings.AZURE_STORAGE_ACCOUNT_NAME}"
+
 
 logging.basicConfig(
     filename="logs/app.log",
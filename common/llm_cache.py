@@ -0,0 +1,153 @@
+"""
+Content-addressed cache of LLM responses.
+
+A response is keyed by a SHA-256 of the call kind, its prompt version, the
+model and the canonical JSON of the prompt inputs, so an admin retry or a
+reclassification that leaves the inputs unchanged reuses the earlier answer
+instead of calling the model again. Bumping a prompt version changes every
+key of that kind; the old entries are never read again and expire.
+
+Lookups go through an in-process LRU first, then the `llm_response_cache`
+collection (TTL index on `expires_at`), which the app lifespan installs.
+Without it (scripts, standalone jobs) only the LRU is used. Failed calls
+(None) are not cached, and cache errors never fail the call.
+"""
+import hashlib
+import json
+from collections import OrderedDict
+from datetime import datetime, timezone, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+from common.config import settings, logger
+
+
+CACHE_COLLECTION = "llm_response_cache"
+
+_collection: Optional[AsyncIOMotorCollection] = None
+_lru: "OrderedDict[str, str]" = OrderedDict()      # key -> JSON-encoded response
+_stats: Dict[str, Dict[str, int]] = {}
+
+
+def cache_key(kind: str, prompt_version: str, inputs: Any) -> str:
+    """Canonical hash of everything that determines the response."""
+    blob = json.dumps(
+        {"kind": kind, "prompt_version": prompt_version, "model": settings.AZURE_GROK_DEPLOYMENT, "inputs": inputs},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _count(kind: str, event: str):
+    counters = _stats.setdefault(kind, {"lru_hits": 0, "store_hits": 0, "misses": 0, "errors": 0})
+    counters[event] += 1
+
+
+def _remember(key: str, encoded: str):
+    _lru[key] = encoded
+    _lru.move_to_end(key)
+    while len(_lru) > settings.LLM_CACHE_LRU_SIZE:
+        _lru.popitem(last=False)
+
+
+async def install_llm_cache(collection: AsyncIOMotorCollection):
+    """Use `collection` as the shared cache store. Call from the lifespan."""
+    global _collection
+    try:
+        await collection.create_index("expires_at", expireAfterSeconds=0)
+    except Exception as e:
+        logger.warning(f"Could not ensure the TTL index on {CACHE_COLLECTION}: {e}")
+    _collection = collection
+
+
+def uninstall_llm_cache():
+    global _collection
+    _collection = None
+
+
+async def get_cached_llm_response(kind: str, prompt_version: str, inputs: Any) -> Optional[Any]:
+    """The cached response for (kind, prompt_version, inputs) as a fresh copy, or None (counted as a miss)."""
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+
+    key = cache_key(kind, prompt_version, inputs)
+    encoded = _lru.get(key)
+    if encoded is not None:
+        _lru.move_to_end(key)
+        _count(kind, "lru_hits")
+        return json.loads(encoded)
+
+    if _collection is not None:
+        try:
+            doc = await _collection.find_one({"_id": key}, {"response": 1})
+            if doc is not None:
+                _count(kind, "store_hits")
+                encoded = json.dumps(doc["response"])
+                _remember(key, encoded)
+                return json.loads(encoded)
+        except Exception as e:
+            _count(kind, "errors")
+            logger.warning(f"LLM cache lookup failed for {kind}: {e}")
+
+    _count(kind, "misses")
+    return None
+
+
+async def store_llm_response(kind: str, prompt_version: str, inputs: Any, response: Any):
+    """Cache a JSON-serializable response for (kind, prompt_version, inputs)."""
+    if not settings.LLM_CACHE_ENABLED or response is None:
+        return
+
+    key = cache_key(kind, prompt_version, inputs)
+    _remember(key, json.dumps(response))
+    if _collection is not None:
+        now = datetime.now(timezone.utc)
+        try:
+            await _collection.update_one(
+                {"_id": key},
+                {"$set": {
+                    "kind": kind,
+                    "prompt_version": prompt_version,
+                    "model": settings.AZURE_GROK_DEPLOYMENT,
+                    "response": response,
+                    "created_at": now,
+                    "expires_at": now + timedelta(hours=settings.LLM_CACHE_TTL_HOURS),
+                }},
+                upsert=True
+            )
+        except Exception as e:
+            _count(kind, "errors")
+            logger.warning(f"LLM cache store failed for {kind}: {e}")
+
+
+async def cached_llm_response(
+    kind: str, prompt_version: str, inputs: Any, produce: Callable[[], Awaitable[Optional[Any]]]
+) -> Optional[Any]:
+    """
+    Return the cached response for (kind, prompt_version, inputs), or call
+    `produce` and cache its JSON-serializable result. Every hit returns a
+    fresh copy.
+    """
+    cached = await get_cached_llm_response(kind, prompt_version, inputs)
+    if cached is not None:
+        return cached
+    response = await produce()
+    await store_llm_response(kind, prompt_version, inputs, response)
+    return response
+
+
+def llm_cache_info() -> Dict[str, Any]:
+    """Hit/miss counters per call kind and the LRU occupancy."""
+    kinds = {}
+    for kind, counters in _stats.items():
+        lookups = counters["lru_hits"] + counters["store_hits"] + counters["misses"]
+        hits = counters["lru_hits"] + counters["store_hits"]
+        kinds[kind] = {**counters, "hit_rate": round(hits / lookups, 4) if lookups else 0.0}
+    return {
+        "enabled": settings.LLM_CACHE_ENABLED,
+        "shared_store": _collection is not None,
+        "lru_size": len(_lru),
+        "lru_maxsize": settings.LLM_CACHE_LRU_SIZE,
+        "kinds": kinds,
+    }
@@ -0,0 +1,162 @@
+"""
+Shared ChatCompletionsClient for the Grok deployment.
+
+The client is opened once in the app lifespan on a pooled aiohttp session
+(keep-alive, bounded connections), so LLM calls reuse warm TLS connections
+instead of setting one up per call. Every call is sent under LLM_GOVERNOR
+(common.call_governor), which owns rate limiting and retries, so the client's
+own retry policy is off. LLM call sites go through
+
+    resp = await complete_chat("clinical_summary", messages)
+
+which also records prompt/completion token counts and latency per call kind
+(llm_usage_info). Outside the app (scripts, background jobs run standalone)
+no shared client is installed and llm_client() falls back to a short-lived
+client per call.
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import aiohttp
+from azure.ai.inference.aio import ChatCompletionsClient
+from azure.ai.inference.models import ChatCompletions, ChatRequestMessage, CompletionsUsage, UserMessage
+from azure.core.credentials import AzureKeyCredential
+from azure.core.pipeline.transport import AioHttpTransport
+
+from common.call_governor import LLM_GOVERNOR
+from common.config import settings, logger
+
+
+CREDENTIAL_SCOPES = ["https://cognitiveservices.azure.com/.default"]
+
+_shared_client: Optional[ChatCompletionsClient] = None
+_usage: Dict[str, Dict[str, float]] = {}
+
+
+def _new_client(transport: Optional[AioHttpTransport] = None) -> ChatCompletionsClient:
+    kwargs = {"transport": transport} if transport is not None else {}
+    return ChatCompletionsClient(
+        settings.AZURE_GROK_ENDPOINT, AzureKeyCredential(settings.AZURE_GROK_API_KEY),
+        credential_scopes=CREDENTIAL_SCOPES, retry_total=0, **kwargs
+    )
+
+
+async def _warm_up(client: ChatCompletionsClient):
+    """One-token request so the first real call finds an open, authenticated connection."""
+    try:
+        await asyncio.wait_for(
+            client.complete(messages=[UserMessage(content="ping")], model=settings.AZURE_GROK_DEPLOYMENT, max_tokens=1),
+            timeout=settings.LLM_WARMUP_TIMEOUT_SECONDS,
+        )
+        logger.info("LLM client warmed up.")
+    except Exception as e:
+        # Not fatal: the pool still works, the first call just pays the connection setup.
+        logger.warning(f"LLM client warm-up failed: {e}")
+
+
+async def open_llm_client() -> ChatCompletionsClient:
+    """Open the pooled client and install it as the shared one. Call from the lifespan."""
+    global _shared_client
+    connector = aiohttp.TCPConnector(
+        limit=settings.LLM_POOL_MAX_CONNECTIONS,
+        keepalive_timeout=settings.LLM_POOL_KEEPALIVE_SECONDS,
+    )
+    # Same session options azure-core uses for the sessions it creates itself.
+    session = aiohttp.ClientSession(connector=connector, cookie_jar=aiohttp.DummyCookieJar(), auto_decompress=False, trust_env=True)
+    client = _new_client(AioHttpTransport(session=session, session_owner=True))
+    await client.__aenter__()
+    if settings.LLM_WARMUP:
+        await _warm_up(client)
+    _shared_client = client
+    logger.info(f"LLM client pool opened (max {settings.LLM_POOL_MAX_CONNECTIONS} connections).")
+    return client
+
+
+async def close_llm_client():
+    """Close the shared client and its connection pool."""
+    global _shared_client
+    client, _shared_client = _shared_client, None
+    if client is not None:
+        await client.close()
+        logger.info("LLM client pool closed.")
+
+
+@asynccontextmanager
+async def llm_client() -> AsyncIterator[ChatCompletionsClient]:
+    """The shared client if the app opened one, otherwise a client for this call only."""
+    if _shared_client is not None:
+        yield _shared_client
+        return
+    async with _new_client() as client:
+        yield client
+
+
+def _record_usage(kind: str, usage: Optional[CompletionsUsage], elapsed: float, failed: bool = False):
+    counters = _usage.setdefault(kind, {"calls": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0, "latency_ms": 0.0})
+    counters["latency_ms"] += elapsed * 1000.0
+    if failed:
+        counters["errors"] += 1
+        return
+    prompt_tokens = usage.prompt_tokens if usage else 0
+    completion_tokens = usage.completion_tokens if usage else 0
+    counters["calls"] += 1
+    counters["prompt_tokens"] += prompt_tokens
+    counters["completion_tokens"] += completion_tokens
+    logger.info(f"LLM {kind}: {prompt_tokens} prompt + {completion_tokens} completion tokens in {elapsed * 1000.0:.0f} ms")
+
+
+async def complete_chat(kind: str, messages: List[ChatRequestMessage], **kwargs: Any) -> ChatCompletions:
+    """Run one chat completion on the Grok deployment and record its token usage under `kind`."""
+    started = time.perf_counter()
+    resp = None
+    try:
+        async with llm_client() as client:
+            resp = await LLM_GOVERNOR.call(
+                lambda: client.complete(messages=messages, model=settings.AZURE_GROK_DEPLOYMENT, **kwargs)
+            )
+        return resp
+    finally:
+        _record_usage(kind, resp.usage if resp else None, time.perf_counter() - started, failed=resp is None)
+
+
+async def stream_chat(kind: str, messages: List[ChatRequestMessage], **kwargs: Any) -> AsyncIterator[str]:
+    """
+    Stream one chat completion, yielding content deltas as they arrive. Token
+    usage is recorded under `kind` if the deployment reports it on the stream
+    (zero otherwise).
+    """
+    started = time.perf_counter()
+    usage = None
+    failed = True
+    try:
+        async with llm_client() as client:
+            # The governor slot is held until the stream has been read.
+            async with LLM_GOVERNOR.hold(
+                lambda: client.complete(messages=messages, model=settings.AZURE_GROK_DEPLOYMENT, stream=True, **kwargs)
+            ) as updates:
+                async with updates:
+                    async for update in updates:
+                        usage = update.usage or usage
+                        for choice in update.choices:
+                            if choice.delta and choice.delta.content:
+                                yield choice.delta.content
+        failed = False
+    finally:
+        _record_usage(kind, usage, time.perf_counter() - started, failed=failed)
+
+
+def llm_usage_info() -> Dict[str, Dict[str, float]]:
+    """Token and latency totals per call kind (since process start), with per-call averages."""
+    out = {}
+    for kind, c in _usage.items():
+        calls = c["calls"]
+        out[kind] = {
+            **c,
+            "latency_ms": round(c["latency_ms"], 1),
+            "avg_prompt_tokens": round(c["prompt_tokens"] / calls, 1) if calls else 0.0,
+            "avg_completion_tokens": round(c["completion_tokens"] / calls, 1) if calls else 0.0,
+            "avg_latency_ms": round(c["latency_ms"] / (calls + c["errors"]), 1) if calls + c["errors"] else 0.0,
+        }
+    return out
@@ -0,0 +1,197 @@
+"""
+Structured JSON from the LLM, validated and repaired instead of rerun.
+
+    summary = await complete_json("clinical_summary", messages, ClinicalSummary)
+
+- The request asks for JSON output (LLM_RESPONSE_FORMAT: "json_schema" sends
+  the pydantic schema, "json_object" plain JSON mode, "" nothing). A
+  deployment that rejects the parameter (a 400 naming response_format) is
+  asked again without it, and it is not sent again for the rest of the process.
+- The reply is parsed tolerantly: code fences and prose around the JSON are
+  dropped, trailing commas removed, Python-style literals and quotes
+  accepted, and output cut off mid-object is closed.
+- The result is validated against the schema. Fields that are missing or
+  invalid are asked for again, only those (up to LLM_JSON_REASK_ATTEMPTS),
+  and merged in, rather than failing the whole report. A bad list item is
+  asked for with its whole list. The merged value is validated again.
+
+Anything still unusable raises LLMOutputError.
+"""
+import ast
+import json
+import re
+from itertools import takewhile
+from typing import Any, Dict, List, Optional, Tuple, Type, TypeVar
+
+from azure.ai.inference.models import AssistantMessage, ChatRequestMessage, JsonSchemaFormat, UserMessage
+from azure.core.exceptions import HttpResponseError
+from pydantic import BaseModel, ValidationError
+
+from common.config import settings, logger
+from common.llm_client import complete_chat
+
+
+M = TypeVar("M", bound=BaseModel)
+
+_FENCE = re.compile(r"```(?:json|JSON)?\s*(.*?)```", re.S)
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+_CLOSERS = {"{": "}", "[": "]"}
+
+_response_format_supported = True
+
+
+class LLMOutputError(ValueError):
+    """The LLM reply could not be turned into the expected JSON."""
+
+
+def _json_span(text: str) -> str:
+    """From the first { or [ to its matching bracket, or to the end if the reply was cut off."""
+    start = next((i for i, ch in enumerate(text) if ch in _CLOSERS), None)
+    if start is None:
+        raise LLMOutputError("no JSON object in the reply")
+    stack, quote, escaped = [], None, False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if quote:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == quote:
+                quote = None
+        elif ch in "\"'":
+            # Apostrophes inside bare words (don't) are not quotes.
+            if ch == '"' or not text[i - 1].isalnum():
+                quote = ch
+        elif ch in _CLOSERS:
+            stack.append(_CLOSERS[ch])
+        elif stack and ch == stack[-1]:
+            stack.pop()
+            if not stack:
+                return text[start:i + 1]
+    # Truncated: close the open string and brackets.
+    tail = text[start:].rstrip().rstrip(",")
+    return tail + (quote or "") + "".join(reversed(stack))
+
+
+def _python_literal(text: str) -> Any:
+    swapped = re.sub(r"\btrue\b", "True", re.sub(r"\bfalse\b", "False", re.sub(r"\bnull\b", "None", text)))
+    return ast.literal_eval(swapped)
+
+
+def parse_llm_json(text: Optional[str]) -> Any:
+    """Best-effort JSON value out of an LLM reply."""
+    if not text or not text.strip():
+        raise LLMOutputError("empty reply")
+    fenced = _FENCE.search(text)
+    candidate = _json_span(fenced.group(1) if fenced else text)
+    for attempt in (
+        lambda s: json.loads(s),
+        lambda s: json.loads(_TRAILING_COMMA.sub(r"\1", s)),
+        lambda s: _python_literal(_TRAILING_COMMA.sub(r"\1", s)),
+    ):
+        try:
+            return attempt(candidate)
+        except (ValueError, SyntaxError, MemoryError, RecursionError):
+            continue
+    raise LLMOutputError("reply is not valid JSON")
+
+
+def _error_paths(error: ValidationError) -> List[Tuple]:
+    """
+    Paths of the fields to ask for again. A path stops at the first list
+    index: a bad item is asked for with its whole list, which the reply then
+    replaces. A whole root value that failed cannot be patched.
+    """
+    paths: List[Tuple] = []
+    for e in error.errors():
+        loc = tuple(takewhile(lambda part: isinstance(part, str), e["loc"]))
+        if not loc:
+            return []
+        if any(loc[:len(p)] == p for p in paths):
+            continue
+        paths = [p for p in paths if p[:len(loc)] != loc] + [loc]
+    return paths
+
+
+def _skeleton(paths: List[Tuple]) -> Dict[str, Any]:
+    """{"a": {"b": null}} for the path ("a", "b"): the shape of the reply asked for."""
+    out: Dict[str, Any] = {}
+    for path in paths:
+        node = out
+        for key in path[:-1]:
+            if not isinstance(node.get(key), dict):
+                node[key] = {}
+            node = node[key]
+        node[path[-1]] = None
+    return out
+
+
+def _merge(base: Any, patch: Any) -> Any:
+    if isinstance(base, dict) and isinstance(patch, dict):
+        merged = dict(base)
+        for key, value in patch.items():
+            merged[key] = _merge(base.get(key), value) if key in base else value
+        return merged
+    return patch
+
+
+def _response_format(schema: Optional[Type[BaseModel]]) -> Any:
+    """The response_format to send; a partial re-ask (schema None) gets plain JSON mode."""
+    mode = settings.LLM_RESPONSE_FORMAT
+    if not _response_format_supported or not mode:
+        return None
+    if mode == "json_schema" and schema is not None:
+        return JsonSchemaFormat(name=schema.__name__, schema=schema.model_json_schema())
+    return "json_object"
+
+
+def _rejects_response_format(error: HttpResponseError) -> bool:
+    """A 400 about the response_format parameter, not a content filter or context length error."""
+    if error.status_code != 400:
+        return False
+    detail = getattr(error, "error", None)
+    text = " ".join(str(x) for x in (getattr(detail, "code", None), getattr(detail, "message", None), error.message) if x)
+    return "response_format" in text
+
+
+async def _complete_text(kind: str, messages: List[ChatRequestMessage], schema: Optional[Type[BaseModel]], **kwargs: Any) -> str:
+    global _response_format_supported
+    response_format = _response_format(schema)
+    if response_format is not None:
+        try:
+            resp = await complete_chat(kind, messages, response_format=response_format, **kwargs)
+            return resp.choices[0].message.content
+        except HttpResponseError as e:
+            if not _rejects_response_format(e):
+                raise
+            _response_format_supported = False
+            logger.warning(f"LLM deployment rejected response_format, continuing without it: {e}")
+    resp = await complete_chat(kind, messages, **kwargs)
+    return resp.choices[0].message.content
+
+
+async def complete_json(kind: str, messages: List[ChatRequestMessage], schema: Type[M], **kwargs: Any) -> Dict[str, Any]:
+    """Run a chat completion whose reply must match `schema`; returns the validated value as plain JSON."""
+    raw = await _complete_text(kind, messages, schema, **kwargs)
+    value = parse_llm_json(raw)
+
+    for attempt in range(settings.LLM_JSON_REASK_ATTEMPTS + 1):
+        try:
+            return schema.model_validate(value).model_dump(mode="json")
+        except ValidationError as e:
+            paths = _error_paths(e)
+            if not paths or attempt == settings.LLM_JSON_REASK_ATTEMPTS or not isinstance(value, dict):
+                raise LLMOutputError(f"reply does not match {schema.__name__}: {e.error_count()} errors") from e
+            fields = ", ".join(".".join(p) for p in paths)
+            logger.warning(f"LLM {kind} reply is missing or has invalid fields ({fields}); asking for those only")
+            reask = messages + [
+                AssistantMessage(content=raw),
+                UserMessage(content=(
+                    f"Your JSON is missing these fields or has invalid values for them: {fields}. "
+                    f"Reply with only this JSON object, every null filled in, no extra commentary: "
+                    f"{json.dumps(_skeleton(paths), ensure_ascii=False)}"
+                )),
+            ]
+            raw = await _complete_text(f"{kind}_reask", reask, None, **kwargs)
+            value = _merge(value, parse_llm_json(raw))
@@ -0,0 +1,15 @@
+import json
+from typing import Dict, Optional
+
+
+STREAM_RETRY_MS = 3000      # reconnect delay suggested to EventSource clients
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def sse_event(event: str, data: Dict, event_id: Optional[int] = None) -> str:
+    """One Server-Sent Events message."""
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
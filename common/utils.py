@@ -1,38 +1,7 @@
-
-from azure.storage.blob import BlobServiceClient, ContentSettings
-from fastapi import UploadFile
-from common.config import settings
-
-
 def normalize_email(email: str) -> str:
     return email.strip().lower()
 
 
-async def upload_to_azure_blob(file: UploadFile, container_name: str, blob_name: str) -> str:
-    account_url = settings.AZURE_STORAGE_ACCOUNT_URL
-    account_key = settings.AZURE_STORAGE_ACCOUNT_KEY
-
-    if not account_url or not account_key:
-        raise ValueError("Azure Storage account URL or key not set.")
-
-    blob_service_client = BlobServiceClient(account_url=account_url, credential=account_key)
-    container_client = blob_service_client.get_container_client(container_name)
-
-    try:
-        container_client.create_container()
-    except Exception:
-        pass  # assume exists
-
-    blob_client = container_client.get_blob_client(blob_name)
-
-    content_settings = ContentSettings(content_type=file.content_type)
-
-    file.file.seek(0)
-    blob_client.upload_blob(file.file, overwrite=True, content_settings=content_settings)
-
-    return blob_client.url
-
-
 # async def upload_to_azure_blob(file: UploadFile, container_name: str, blob_name: str, encryption_key: bytes) -> str:
 #     account_url = settings.AZURE_STORAGE_ACCOUNT_URL
 #     account_key = settings.AZURE_STORAGE_ACCOUNT_KEY
@@ -0,0 +1,106 @@
+"""
+Compact band vector stored alongside each report.
+
+The verbose `*_biomarkers` dicts carry names, units, ranges and descriptions
+for display. Dashboards, comparisons and trend queries only need each marker's
+band and value, so every user_reports document also stores
+
+    band_vector = {
+        "layout": BAND_LAYOUT.version,
+        "bands":  one byte per layout position (BAND_CODES, 0 = not measured),
+        "values": little-endian float64 per layout position, NaN if not numeric,
+    }
+
+The layout is the catalog order of `biomarker_with_description`, identified by
+a hash of the ordered keys. A vector is only decoded against the layout it was
+written with; when the catalog changes, older vectors decode to None (callers
+fall back to the verbose dicts) until the backfill re-encodes them.
+Markers outside the catalog never reach the stored buckets, so every bucketed
+marker has a position.
+"""
+import hashlib
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Mapping, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from data_processing.biomarkers_range import biomarker_with_description
+
+
+BAND_CODES = MappingProxyType({"good": 1, "normal": 2, "critical": 3, "invalid": 4})
+BAND_NAMES = (None, "good", "normal", "critical", "invalid")    # code -> band
+BAND_FIELDS = MappingProxyType({f"{band}_biomarkers": code for band, code in BAND_CODES.items()})
+VALUE_DTYPE = np.dtype("<f8")
+
+
+class BandLayout(NamedTuple):
+    version: str
+    biomarkers: Tuple[str, ...]           # position -> biomarker
+    positions: Mapping[str, int]          # biomarker -> position
+
+
+def build_band_layout(biomarkers: Iterable[str]) -> BandLayout:
+    """Fix the position of every biomarker; the version changes with the ordering."""
+    ordered = tuple(biomarkers)
+    version = hashlib.sha256("\n".join(ordered).encode("utf-8")).hexdigest()[:12]
+    return BandLayout(version, ordered, MappingProxyType({b: i for i, b in enumerate(ordered)}))
+
+
+BAND_LAYOUT = build_band_layout(biomarker_with_description)
+
+
+def _value(entry: Any) -> float:
+    # Same reading as the comparison engine: the "value" of a bucket entry, or the entry itself.
+    raw = entry.get("value") if isinstance(entry, dict) else entry
+    try:
+        return float(raw)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def encode_band_vector(report: Dict[str, Any], layout: BandLayout = BAND_LAYOUT) -> Dict[str, Any]:
+    """
+    Encode the `*_biomarkers` buckets of a report (or build_biomarker_fields
+    output) into a band_vector sub-document.
+    """
+    bands = bytearray(len(layout.biomarkers))
+    values = np.full(len(layout.biomarkers), np.nan, dtype=VALUE_DTYPE)
+    for field, code in BAND_FIELDS.items():
+        for biomarker, entry in (report.get(field) or {}).items():
+            pos = layout.positions.get(biomarker)
+            if pos is None:
+                continue
+            bands[pos] = code
+            values[pos] = _value(entry)
+    return {"layout": layout.version, "bands": bytes(bands), "values": values.tobytes()}
+
+
+def decode_band_arrays(vector: Optional[Dict[str, Any]], layout: BandLayout = BAND_LAYOUT) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    (band codes, values) arrays aligned with `layout.biomarkers`, or None if the
+    vector is missing or was written with another layout.
+    """
+    if not vector or vector.get("layout") != layout.version:
+        return None
+    codes = np.frombuffer(vector["bands"], dtype=np.uint8)
+    values = np.frombuffer(vector["values"], dtype=VALUE_DTYPE)
+    if len(codes) != len(layout.biomarkers) or len(values) != len(codes):
+        return None
+    return codes, values
+
+
+def decode_band_vector(vector: Optional[Dict[str, Any]], layout: BandLayout = BAND_LAYOUT) -> Optional[Dict[str, Dict[str, Dict[str, Any]]]]:
+    """
+    Decode a band_vector back into bucket form,
+    {"good": {biomarker: {"value": float | None}}, "normal": ..., "critical": ..., "invalid": ...},
+    which compare_by_bands accepts directly. None if the vector can't be decoded.
+    """
+    arrays = decode_band_arrays(vector, layout)
+    if arrays is None:
+        return None
+    codes, values = arrays
+    buckets: Dict[str, Dict[str, Dict[str, Any]]] = {band: {} for band in BAND_CODES}
+    for pos in np.flatnonzero(codes):
+        value = float(values[pos])
+        buckets[BAND_NAMES[codes[pos]]][layout.biomarkers[pos]] = {"value": None if np.isnan(value) else value}
+    return buckets
@@ -0,0 +1,208 @@
+"""
+Local, deterministic biomarker-name resolver.
+
+Maps lab-report names such as "FASTING GLUCOSE", "Glucose, fasting" or
+"Haemoglobin A1c" to catalog keys without an LLM round trip. The index is
+built once at import from the catalog keys, their display names and
+`biomarker_name_aliases`:
+
+- exact:  token-set match (word order and punctuation independent) -> 1.0
+- fuzzy:  character-trigram and token overlap against every indexed name,
+          scored with inverted indexes so only names sharing a gram are
+          touched. Confidence is lowered when a different marker scores
+          almost as well. A name never fuzzy-matches one that differs in a
+          qualifier ("ratio", "urine", "free"; "a/b" counts as a ratio) or
+          carries a number the other lacks, so "Cholesterol/HDL ratio" is
+          not a candidate for HDL cholesterol nor "Vitamin D 1,25" for
+          25-OH vitamin D.
+
+Only exact matches are resolved locally. Fuzzy matches at LLM_MIN_CONFIDENCE
+and above go to the LLM with their candidates; anything lower is not a
+catalog marker.
+"""
+import re
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+from data_processing.biomarkers_range import (
+    biomarker_name_aliases, biomarker_with_description, centum_predefined_ranges,
+)
+
+
+LLM_MIN_CONFIDENCE = 0.45     # below this the name is treated as not in the catalog
+AMBIGUITY_MARGIN = 0.08       # runner-up (another marker) closer than this lowers confidence
+GRAM_WEIGHT = 0.75            # trigram dice vs token jaccard in the fuzzy score
+MAX_CANDIDATES = 5
+RESOLVE_CACHE_SIZE = 4096
+
+# Words that carry no identity in lab-report names ("Iron (serum)" == "Iron")
+STOP_TOKENS = frozenset({"serum", "plasma", "blood", "whole", "level", "levels", "test", "result", "the", "of", "s"})
+# Words that make a different test of the same analyte ("Urine creatinine" != "Creatinine")
+QUALIFIER_TOKENS = frozenset({"ratio", "urine", "urinary", "free"})
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_RATIO_RE = re.compile(r"[a-z0-9]\s*[/:]\s*[a-z0-9]")
+
+
+class Resolution(NamedTuple):
+    key: Optional[str]                 # best catalog key (None if nothing is close)
+    confidence: float                  # 0..1
+    method: str                        # "exact" | "fuzzy" | "none"
+    candidates: Tuple[str, ...]        # best keys first, for the LLM fallback
+
+
+class NameIndex(NamedTuple):
+    exact: Mapping[FrozenSet[str], str]              # token set -> key (unambiguous names only)
+    surface_keys: Tuple[str, ...]                    # indexed name id -> key
+    surface_grams: Tuple[int, ...]                   # indexed name id -> trigram count
+    surface_tokens: Tuple[int, ...]                  # indexed name id -> token count
+    surface_qualifiers: Tuple[FrozenSet[str], ...]   # indexed name id -> qualifier tokens
+    surface_numbers: Tuple[FrozenSet[str], ...]      # indexed name id -> numeric tokens
+    gram_postings: Mapping[str, Tuple[int, ...]]     # trigram -> indexed name ids
+    token_postings: Mapping[str, Tuple[int, ...]]    # token -> indexed name ids
+
+
+def name_tokens(name: str) -> FrozenSet[str]:
+    """
+    Lowercased alphanumeric tokens of a name, accents folded, stop words
+    dropped; "a/b" and "a:b" add "ratio".
+    """
+    folded = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode("ascii").lower()
+    tokens = frozenset(_TOKEN_RE.findall(folded))
+    if _RATIO_RE.search(folded):
+        tokens |= {"ratio"}
+    return (tokens - STOP_TOKENS) or tokens
+
+
+def _numbers(tokens: FrozenSet[str]) -> FrozenSet[str]:
+    return frozenset(t for t in tokens if t.isdigit())
+
+
+def _grams(tokens: Iterable[str]) -> FrozenSet[str]:
+    grams = set()
+    for tok in tokens:
+        padded = f"#{tok}#"
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+def _catalog_names(catalog: Iterable[str], aliases: Mapping[str, str]) -> List[Tuple[str, str]]:
+    """(name, key) pairs to index: keys, display names and aliases."""
+    names = []
+    for key in catalog:
+        names.append((key, key))
+        ref = biomarker_with_description.get(key, {})
+        for spec in (ref, ref.get("M"), ref.get("F")):
+            if isinstance(spec, dict) and spec.get("name"):
+                names.append((spec["name"], key))
+    names.extend((alias, key) for alias, key in aliases.items() if key in catalog)
+    return names
+
+
+def build_name_index(catalog: Iterable[str], aliases: Mapping[str, str]) -> NameIndex:
+    """Compile the exact and fuzzy lookup tables for a catalog."""
+    catalog = frozenset(catalog)
+    exact: Dict[FrozenSet[str], set] = {}
+    surfaces: Dict[FrozenSet[str], str] = {}
+    for name, key in _catalog_names(sorted(catalog), aliases):
+        tokens = name_tokens(name)
+        if not tokens:
+            continue
+        exact.setdefault(tokens, set()).add(key)
+        surfaces.setdefault(tokens, key)
+
+    surface_keys, surface_grams, surface_tokens, surface_qualifiers, surface_numbers = [], [], [], [], []
+    gram_postings: Dict[str, List[int]] = {}
+    token_postings: Dict[str, List[int]] = {}
+    for sid, (tokens, key) in enumerate(sorted(surfaces.items(), key=lambda t: (t[1], sorted(t[0])))):
+        grams = _grams(tokens)
+        surface_keys.append(key)
+        surface_grams.append(len(grams))
+        surface_tokens.append(len(tokens))
+        surface_qualifiers.append(tokens & QUALIFIER_TOKENS)
+        surface_numbers.append(_numbers(tokens))
+        for g in grams:
+            gram_postings.setdefault(g, []).append(sid)
+        for t in tokens:
+            token_postings.setdefault(t, []).append(sid)
+
+    return NameIndex(
+        exact=MappingProxyType({tokens: next(iter(keys)) for tokens, keys in exact.items() if len(keys) == 1}),
+        surface_keys=tuple(surface_keys),
+        surface_grams=tuple(surface_grams),
+        surface_tokens=tuple(surface_tokens),
+        surface_qualifiers=tuple(surface_qualifiers),
+        surface_numbers=tuple(surface_numbers),
+        gram_postings=MappingProxyType({g: tuple(ids) for g, ids in gram_postings.items()}),
+        token_postings=MappingProxyType({t: tuple(ids) for t, ids in token_postings.items()}),
+    )
+
+
+def resolve_with_index(index: NameIndex, name: str) -> Resolution:
+    """Resolve one lab-report name against `index`."""
+    tokens = name_tokens(name)
+    if not tokens:
+        return Resolution(None, 0.0, "none", ())
+    key = index.exact.get(tokens)
+    if key is not None:
+        return Resolution(key, 1.0, "exact", (key,))
+
+    grams = _grams(tokens)
+    qualifiers, numbers = tokens & QUALIFIER_TOKENS, _numbers(tokens)
+    shared_grams = Counter(sid for g in grams for sid in index.gram_postings.get(g, ()))
+    shared_tokens = Counter(sid for t in tokens for sid in index.token_postings.get(t, ()))
+
+    best: Dict[str, float] = {}
+    for sid, shared in shared_grams.items():
+        if index.surface_qualifiers[sid] != qualifiers or not numbers <= index.surface_numbers[sid]:
+            continue
+        dice = 2.0 * shared / (len(grams) + index.surface_grams[sid])
+        common = shared_tokens.get(sid, 0)
+        jaccard = common / (len(tokens) + index.surface_tokens[sid] - common)
+        score = GRAM_WEIGHT * dice + (1.0 - GRAM_WEIGHT) * jaccard
+        k = index.surface_keys[sid]
+        if score > best.get(k, 0.0):
+            best[k] = score
+    if not best:
+        return Resolution(None, 0.0, "none", ())
+
+    ranked = sorted(best.items(), key=lambda kv: (-kv[1], kv[0]))
+    top_key, top = ranked[0]
+    runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+    confidence = max(0.0, top - max(0.0, AMBIGUITY_MARGIN - (top - runner_up)))
+    return Resolution(top_key, round(confidence, 4), "fuzzy", tuple(k for k, _ in ranked[:MAX_CANDIDATES]))
+
+
+NAME_INDEX = build_name_index(centum_predefined_ranges.keys(), biomarker_name_aliases)
+
+
+@lru_cache(maxsize=RESOLVE_CACHE_SIZE)
+def resolve_name(name: str) -> Resolution:
+    """Resolve a lab-report name against the catalog (memoized)."""
+    return resolve_with_index(NAME_INDEX, name)
+
+
+def resolve_lab_results(
+    lab_results: Dict[str, Dict[str, Any]],
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Tuple[Dict[str, Any], Resolution]]]:
+    """
+    Split lab results into entries resolved to catalog keys and leftovers.
+
+    Returns (resolved, leftovers):
+    - resolved:  {catalog key: entry} for exact matches; if two names match the
+                 same key the first one is resolved.
+    - leftovers: {original name: (entry, Resolution)} for everything else,
+                 including the later names of such a pair.
+    """
+    resolved: Dict[str, Dict[str, Any]] = {}
+    leftovers: Dict[str, Tuple[Dict[str, Any], Resolution]] = {}
+    for raw_name, entry in lab_results.items():
+        res = resolve_name(raw_name)
+        if res.method != "exact" or res.key in resolved:
+            leftovers[raw_name] = (entry, res)
+            continue
+        resolved[res.key] = entry
+    return resolved, leftovers
@@ -4875,4 +4875,192 @@ section_to_biomarkers={
      'omega_3_index',
   'omega_6_omega_3_ratio',
   ]
-}
\ No newline at end of file
+}
+
+# Alternative lab-report spellings -> biomarker key, for the local name resolver
+# (data_processing/biomarker_resolver.py). Catalog keys and display names are
+# indexed automatically; list only names that neither of those covers.
+biomarker_name_aliases = {
+  # metabolic
+  "glucose": "fasting_glucose",
+  "fasting blood glucose": "fasting_glucose",
+  "fasting plasma glucose": "fasting_glucose",
+  "fasting blood sugar": "fasting_glucose",
+  "fbg": "fasting_glucose",
+  "fbs": "fasting_glucose",
+  "fpg": "fasting_glucose",
+  "hemoglobin a1c": "hba1c",
+  "haemoglobin a1c": "hba1c",
+  "hb a1c": "hba1c",
+  "a1c": "hba1c",
+  "glycated hemoglobin": "hba1c",
+  "glycated haemoglobin": "hba1c",
+  "glycosylated hemoglobin": "hba1c",
+  "insulin": "insulin_fasting",
+  "homa": "homa_ir",
+  "2 hour glucose": "ogtt_2hr_glucose",
+  "glucose tolerance test 2 hour": "ogtt_2hr_glucose",
+  # lipids and cardiovascular
+  "cholesterol": "total_cholesterol",
+  "ldl": "ldl_cholesterol_direct",
+  "ldl cholesterol": "ldl_cholesterol_direct",
+  "direct ldl": "ldl_cholesterol_direct",
+  "low density lipoprotein cholesterol": "ldl_cholesterol_direct",
+  "hdl": "hdl_cholesterol",
+  "hdl c": "hdl_cholesterol",
+  "high density lipoprotein cholesterol": "hdl_cholesterol",
+  "triglyceride": "triglycerides",
+  "trig": "triglycerides",
+  "tg": "triglycerides",
+  "non hdl": "non_hdl_cholesterol",
+  "apolipoprotein b": "apob",
+  "apo b": "apob",
+  "apolipoprotein a1": "apoa1",
+  "apo a1": "apoa1",
+  "lipoprotein a": "lpa",
+  "lp a": "lpa",
+  "hscrp": "hs_crp",
+  "high sensitivity crp": "hs_crp",
+  "high sensitivity c reactive protein": "hs_crp",
+  "n terminal pro b type natriuretic peptide": "nt_probnp",
+  "hs troponin i": "troponin_i",
+  "high sensitivity troponin i": "troponin_i",
+  "lipoprotein associated phospholipase a2": "lp_pla2",
+  "ldl p": "ldl_particle_number",
+  "ldl particle count": "ldl_particle_number",
+  "ldl pattern": "ldl_size_pattern",
+  "ldl size": "ldl_size_pattern",
+  # liver and kidney
+  "aspartate aminotransferase": "ast",
+  "aspartate transaminase": "ast",
+  "sgot": "ast",
+  "alanine aminotransferase": "alt",
+  "alanine transaminase": "alt",
+  "sgpt": "alt",
+  "gamma gt": "ggt",
+  "gamma glutamyl transferase": "ggt",
+  "gamma glutamyltransferase": "ggt",
+  "alkaline phosphatase": "alp",
+  "alk phos": "alp",
+  "bilirubin": "bilirubin_total",
+  "gfr": "egfr",
+  "estimated gfr": "egfr",
+  "estimated glomerular filtration rate": "egfr",
+  "urea": "bun_urea",
+  "bun": "bun_urea",
+  "blood urea nitrogen": "bun_urea",
+  "urea nitrogen": "bun_urea",
+  "urate": "uric_acid",
+  # thyroid, adrenal and sex hormones
+  "thyroid stimulating hormone": "tsh",
+  "thyrotropin": "tsh",
+  "ft4": "free_t4",
+  "free thyroxine": "free_t4",
+  "ft3": "free_t3",
+  "free triiodothyronine": "free_t3",
+  "rt3": "reverse_t3",
+  "reverse triiodothyronine": "reverse_t3",
+  "tpo": "tpoab",
+  "anti tpo": "tpoab",
+  "thyroid peroxidase antibodies": "tpoab",
+  "thyroid peroxidase antibody": "tpoab",
+  "tgab": "thyroglobulin_ab",
+  "anti tg": "thyroglobulin_ab",
+  "thyroglobulin antibodies": "thyroglobulin_ab",
+  "anti thyroglobulin antibodies": "thyroglobulin_ab",
+  "morning cortisol": "cortisol",
+  "dheas": "dhea_s",
+  "dhea sulphate": "dhea_s",
+  "dhea sulfate": "dhea_s",
+  "dehydroepiandrosterone sulphate": "dhea_s",
+  "dehydroepiandrosterone sulfate": "dhea_s",
+  "adrenocorticotropic hormone": "acth",
+  "testosterone": "testosterone_total",
+  "free testosterone": "testosterone_free",
+  "sex hormone binding globulin": "shbg",
+  "oestradiol": "estradiol",
+  "e2": "estradiol",
+  "follicle stimulating hormone": "fsh",
+  "luteinising hormone": "lh",
+  "luteinizing hormone": "lh",
+  # vitamins, minerals and iron
+  "vitamin d": "vitamin_d_25_oh",
+  "vit d": "vitamin_d_25_oh",
+  "25 hydroxyvitamin d": "vitamin_d_25_oh",
+  "25 hydroxy vitamin d": "vitamin_d_25_oh",
+  "25 oh vitamin d": "vitamin_d_25_oh",
+  "b12": "vitamin_b12",
+  "vit b12": "vitamin_b12",
+  "cobalamin": "vitamin_b12",
+  "folate": "folate_serum",
+  "folic acid": "folate_serum",
+  "b6": "vitamin_b6",
+  "vit b6": "vitamin_b6",
+  "pyridoxine": "vitamin_b6",
+  "pyridoxal 5 phosphate": "vitamin_b6",
+  "iron": "iron_serum",
+  "total iron binding capacity": "tibc",
+  "mma": "methylmalonic_acid",
+  "magnesium": "magnesium_serum",
+  "stfr": "soluble_transferrin_receptor",
+  # full blood count
+  "wbc": "wbc_count",
+  "white blood cells": "wbc_count",
+  "white blood cell count": "wbc_count",
+  "white cell count": "wbc_count",
+  "leukocytes": "wbc_count",
+  "total leucocyte count": "wbc_count",
+  "neutrophil count": "neutrophils",
+  "lymphocyte count": "lymphocytes",
+  "monocyte count": "monocytes",
+  "eosinophil count": "eosinophils",
+  "basophil count": "basophils",
+  "platelet count": "platelets",
+  "plt": "platelets",
+  "il 6": "hs_il6",
+  "interleukin 6": "hs_il6",
+  "rbc": "rbc_count",
+  "red blood cells": "rbc_count",
+  "red blood cell count": "rbc_count",
+  "red cell count": "rbc_count",
+  "erythrocytes": "rbc_count",
+  "haemoglobin": "hemoglobin",
+  "hb": "hemoglobin",
+  "hgb": "hemoglobin",
+  "haematocrit": "hematocrit",
+  "hct": "hematocrit",
+  "packed cell volume": "hematocrit",
+  "pcv": "hematocrit",
+  "mean corpuscular volume": "mcv",
+  "mean cell volume": "mcv",
+  "mean corpuscular hemoglobin": "mch",
+  "mean corpuscular haemoglobin": "mch",
+  "mean cell haemoglobin": "mch",
+  "mean corpuscular hemoglobin concentration": "mchc",
+  "mean corpuscular haemoglobin concentration": "mchc",
+  "mean cell haemoglobin concentration": "mchc",
+  "red cell distribution width": "rdw",
+  "rdw cv": "rdw",
+  "reticulocytes": "reticulocyte_count",
+  "retic count": "reticulocyte_count",
+  # bone, cancer markers and others
+  "pth": "parathyroid_hormone_pth",
+  "intact pth": "parathyroid_hormone_pth",
+  "calcium": "calcium_total",
+  "phosphorus": "phosphate",
+  "inorganic phosphate": "phosphate",
+  "psa": "psa_prostate_specific_antigen",
+  "total psa": "psa_prostate_specific_antigen",
+  "prostate specific antigen": "psa_prostate_specific_antigen",
+  "cancer antigen 125": "ca125",
+  "carcinoembryonic antigen": "cea",
+  "afp": "afp_alpha_fetoprotein",
+  "alpha fetoprotein": "afp_alpha_fetoprotein",
+  "igf1": "igf_1",
+  "somatomedin c": "igf_1",
+  "apoe": "apoe_genotype",
+  "lead": "lead_blood",
+  "mercury": "mercury_blood",
+  "aluminium": "aluminium_blood",
+  "aluminum": "aluminium_blood",
+}
@@ -1,7 +1,11 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
 from azure.core.credentials import AzureKeyCredential
 from azure.ai.documentintelligence.aio import DocumentIntelligenceClient
 from azure.ai.documentintelligence.models import DocumentField
 # from azure.ai.documentintelligence import DocumentIntelligenceClient
+from common.call_governor import OCR_GOVERNOR
 from common.config import settings, logger
 from pathlib import Path
 
@@ -16,11 +20,42 @@ if not (AZ_ENDPOINT and AZ_KEY):
     raise RuntimeError("Please set AZURE_AI_DOCUMENT_INTELLIGENCE_ENDPOINT and AZURE_AI_DOCUMENT_INTELLIGENCE_KEY")
 
 
-# ── Azure client 
-client = DocumentIntelligenceClient(
-    endpoint=AZ_ENDPOINT,
-    credential=AzureKeyCredential(AZ_KEY)
-)
+# ── Azure client (retries are left to OCR_GOVERNOR)
+# One long-lived client (and connection pool) is opened in the app lifespan;
+# outside the app each analysis opens its own.
+_shared_client: Optional[DocumentIntelligenceClient] = None
+
+
+def _new_client() -> DocumentIntelligenceClient:
+    return DocumentIntelligenceClient(endpoint=AZ_ENDPOINT, credential=AzureKeyCredential(AZ_KEY), retry_total=0)
+
+
+async def open_ocr_client() -> DocumentIntelligenceClient:
+    """Open the shared Document Intelligence client. Call from the lifespan."""
+    global _shared_client
+    client = _new_client()
+    await client.__aenter__()
+    _shared_client = client
+    logger.info("Document Intelligence client opened.")
+    return client
+
+
+async def close_ocr_client():
+    global _shared_client
+    client, _shared_client = _shared_client, None
+    if client is not None:
+        await client.close()
+        logger.info("Document Intelligence client closed.")
+
+
+@asynccontextmanager
+async def ocr_client() -> AsyncIterator[DocumentIntelligenceClient]:
+    """The shared client if the app opened one, otherwise a client for this call only."""
+    if _shared_client is not None:
+        yield _shared_client
+        return
+    async with _new_client() as client:
+        yield client
 
 
 def extract_value(field: DocumentField):
@@ -43,11 +78,15 @@ async def analyze_report(file_path: str):
     try:
         file_path = Path(file_path)
 
-        async with DocumentIntelligenceClient(endpoint=AZ_ENDPOINT, credential=AzureKeyCredential(AZ_KEY)) as client:
-            try:
+        async with ocr_client() as client:
+            async def analyze():
+                # Reopened on every attempt, so a retry sends the whole file again.
                 with open(file_path, "rb") as f:
                     poller = await client.begin_analyze_document(MODEL_ID, f)
-                    result = await poller.result()
+                    return await poller.result()
+
+            try:
+                result = await OCR_GOVERNOR.call(analyze)
             except Exception as e:
                 logger.error(f"Azure Document Intelligence error: {e}")
                 raise Exception(f"Azure Document Intelligence error: {e}")
@@ -0,0 +1,63 @@
+"""
+Compact, input-aware prompt inputs for the LLM calls.
+
+Prompts used to interpolate Python reprs of whole tables. These helpers build
+the inputs from what the report actually contains instead:
+
+- reference ranges only for the report's biomarkers, and only the patient's
+  sex where ranges are sex-specific
+- questionnaire answers and section classifications without empty values
+- compact JSON (no whitespace, non-ASCII kept as is)
+"""
+import json
+from typing import Any, Dict, Iterable, Optional
+
+from data_processing.biomarker_resolver import LLM_MIN_CONFIDENCE, resolve_name
+from data_processing.biomarkers_range import biomarker_with_name_and_range
+
+
+def compact_json(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def prune_empty(obj: Any) -> Any:
+    """Recursively drop None, empty strings and empty containers from dicts and lists."""
+    if isinstance(obj, dict):
+        pruned = {k: prune_empty(v) for k, v in obj.items()}
+        return {k: v for k, v in pruned.items() if v not in (None, "", [], {})}
+    if isinstance(obj, (list, tuple)):
+        pruned = [prune_empty(v) for v in obj]
+        return [v for v in pruned if v not in (None, "", [], {})]
+    return obj
+
+
+def reference_ranges_for(biomarkers: Iterable[str], sex: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Reference entries of the given catalog keys. With `sex` ("M"/"F"),
+    sex-specific entries are flattened to that sex's range and unit.
+    """
+    out = {}
+    for key in biomarkers:
+        ref = biomarker_with_name_and_range.get(key)
+        if ref is None or key in out:
+            continue
+        if sex in ("M", "F") and isinstance(ref.get(sex), dict):
+            out[key] = {"name": ref.get("name", key), **ref[sex]}
+        else:
+            out[key] = ref
+    return out
+
+
+def reference_ranges_for_lab_results(lab_results: Dict[str, Any], sex: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Reference entries for raw lab-report names: the catalog key each name
+    resolves to, or its candidates if the resolver is unsure. Names that match
+    nothing in the catalog contribute nothing.
+    """
+    keys = []
+    for name in lab_results:
+        res = resolve_name(name)
+        if res.key is None or res.confidence < LLM_MIN_CONFIDENCE:
+            continue
+        keys.extend((res.key,) if res.method == "exact" else res.candidates)
+    return reference_ranges_for(keys, sex)
@@ -1,14 +1,15 @@
 from __future__ import annotations
 from typing import Dict, Any, Optional, List
 import datetime as dt
-import json
 from typing import Optional
 
-from azure.ai.inference.aio import ChatCompletionsClient
 from azure.ai.inference.models import SystemMessage, UserMessage
-from azure.core.credentials import AzureKeyCredential
 
-from common.config import settings, logger
+from common.config import logger
+from common.llm_cache import cached_llm_response
+from common.llm_client import complete_chat, stream_chat
+from data_processing.prompt_builder import compact_json
+from data_processing.section_index import section_index_for
 
 Band = Optional[str]  # "good" | "normal" | "critical" | None
 
@@ -127,33 +128,6 @@ def build_category_index_from_lists(cat_to_tests):
     return bm2cat, cats
 
 
-def build_category_index(predefined_categories):
-    """
-    Flexible category index builder. Supports two shapes:
-
-    1) {category_key: {"title": "...", "tests": [biomarker,...]}, ...}
-    2) {category_key: [biomarker, biomarker, ...], ...}
-
-    Returns:
-      - bm2cat: biomarker -> category key
-      - cats:   category key -> {"title": display_title}
-    """
-    bm2cat = {}
-    cats = {}
-    for cat_key, val in predefined_categories.items():
-        # If given as {"title": "...", "tests": [...]}
-        if isinstance(val, dict) and "tests" in val:
-            title = val.get("title", cat_key)
-            tests = val.get("tests", [])
-        else:
-            # If given as a plain list: {cat_key: [test1, test2, ...]}
-            title = cat_key.replace("_", " ").title()
-            tests = val if isinstance(val, list) else []
-        cats[cat_key] = {"title": title}
-        for t in tests:
-            bm2cat[t] = cat_key
-    return bm2cat, cats
-
 def _normalize_buckets(b):
     """
     Ensure the input report dict has "good"/"normal"/"critical" keys.
@@ -213,8 +187,10 @@ async def compare_by_bands(
     new_b = _normalize_buckets(new_b)
 
     weights = per_biomarker_weights or {}
-    # Map biomarkers to categories and retrieve category metadata (titles).
-    bm2cat, cats_meta = build_category_index(predefined_ranges)
+    # Map biomarkers to categories and retrieve category metadata (titles, order)
+    # from the shared section index instead of rebuilding it per comparison.
+    index = section_index_for(predefined_ranges)
+    bm2cat, cats_meta = index.biomarker_to_section, index.sections
 
     # Determine the comparison domain (set of biomarkers considered for scoring).
     old_biomarkers = set().union(*[set(old_b.get(k, {}).keys()) for k in ("good","normal","critical")])
@@ -231,7 +207,7 @@ async def compare_by_bands(
         """
         if cat_key not in per_cat:
             per_cat[cat_key] = {
-                "title": cats_meta.get(cat_key, {}).get("title", cat_key),
+                "title": cats_meta[cat_key].title if cat_key in cats_meta else cat_key,
                 "improved": 0, "worsened": 0, "same": 0,
                 "net_score": 0.0, "weighted_net": 0.0,
                 "biomarkers": []  # list of dicts per biomarker transition
@@ -303,8 +279,8 @@ async def compare_by_bands(
     # --------------------------------------------
     # Per-category table (ordered by canonical set)
     # --------------------------------------------
-    # Use the incoming predefined_ranges keys to produce a stable category ordering.
-    category_order = [k for k in predefined_ranges.keys()]  # canonical order (your 16 categories)
+    # Use the section index order (the incoming predefined_ranges keys) for a stable category ordering.
+    category_order = list(cats_meta)  # canonical order (your 16 categories)
     if "unmapped" in per_cat and "unmapped" not in category_order:
         category_order.append("unmapped")
 
@@ -313,7 +289,7 @@ async def compare_by_bands(
     for k in category_order:
         if k not in per_cat:
             # Category existed in the schema but had no comparable biomarkers.
-            title = cats_meta.get(k, {}).get("title", k)
+            title = cats_meta[k].title
             categories.append({
                 "category": title, "key": k,
                 "improved": 0, "worsened": 0, "same": 0,
@@ -391,89 +367,96 @@ async def compare_by_bands(
     }
 
 
-# function to generate summary using azure inference
+# Bump whenever the comparison summary prompt changes; cached summaries from older prompts are then ignored.
+COMPARISON_SUMMARY_PROMPT_VERSION = "3"
+
+
+# function to generate summary using azure inference (cached by the comparison result)
 async def generate_comparison_summary_using_grok(result):
-    try:
-        system_prompt = """You are a meticulous medical summarizer for the Centum app.
-        - Use only the JSON provided.
-        - British English (e.g., prioritise, fibre).
-        - Be concise, reassuring, and actionable.
-        - Never invent values or units. If a unit is not present in the JSON, omit it.
-        - Base all statements on band changes: good, normal, critical.
-        - Emphasise meaningful transitions (critical→normal/good, normal→good, good→normal/critical).
-        - Treat “net_score” as a direction-of-travel signal, not a clinical diagnosis.
-        - If flags are empty, say so plainly.
-        - Close with practical next steps (sleep, lifestyle, diet, supplementation, clinical follow-ups) tailored to observed issues.
-        """
+    return await cached_llm_response(
+        "comparison_summary", COMPARISON_SUMMARY_PROMPT_VERSION, result,
+        lambda: _generate_comparison_summary_using_grok(result)
+    )
+
+
+def comparison_summary_messages(result):
+    """System and user messages asking for the markdown summary of a compare_by_bands result."""
+    system_prompt = """You are a meticulous medical summarizer for the Centum app.
+    - Use only the JSON provided.
+    - British English (e.g., prioritise, fibre).
+    - Be concise, reassuring, and actionable.
+    - Never invent values or units. If a unit is not present in the JSON, omit it.
+    - Base all statements on band changes: good, normal, critical.
+    - Emphasise meaningful transitions (critical→normal/good, normal→good, good→normal/critical).
+    - Treat “net_score” as a direction-of-travel signal, not a clinical diagnosis.
+    - If flags are empty, say so plainly.
+    - Close with practical next steps (sleep, lifestyle, diet, supplementation, clinical follow-ups) tailored to observed issues.
+    """
 
-        # Inject your Python `result` dict below (e.g., json.dumps(result, ensure_ascii=False))
-        old_prompt = f"""
-        You are given a comparison result from Centum's band-based engine.
-
-        STRUCTURE REQUIREMENTS
-        Return exactly this structure (markdown):
-        1) Overall
-        2) Highlights of improvement
-        3) Areas to watch
-        4) Flags
-        5) Personalised next steps anchored to your Centum Action Plan
-
-        WRITING RULES
-        - “Overall”: report old→new dates, number of categories improved / same / worsened, and overall net_score from the JSON.
-        - “Highlights of improvement”: use result.highlights.improvements (top categories by delta). For each highlighted category, list 2–5 key biomarker transitions that improved (e.g., critical→normal, normal→good). Show old_value→new_value (no units unless present in JSON fields).
-        - “Areas to watch”: include biomarkers that worsened band (good→normal or normal→critical) OR stayed in critical. Use short bullets: <Biomarker>: <from>→<to>, old_value→new_value, with one short reason (e.g., “still in critical band” or “regressed one band”).
-        - “Flags”: summarise result.flags.Positive and result.flags.Caution. If both lists are empty, write “No configured flags triggered.”
-        - “Personalised next steps”: pick only the sections relevant to what actually worsened or remained critical:
-        • Metabolic drift (e.g., fasting_glucose worse or HbA1c critical): sleep regularity, post-meal walks, fibre-first meals, refined-carb reduction.  
-        • Lipid drift (HDL down, TG up, ApoB high/normal): limit alcohol/sugars; emphasise olive oil, nuts, seeds, and fish; maintain activity.  
-        • Iron trend (ferritin down): iron-rich foods + vitamin C; avoid tea/coffee with iron-rich meals.  
-        • Vitamin D (high→normal or low): suggest clinician-guided dosing and re-check timing.  
-        • Heavy metals (lead/mercury high/critical): fish choice guidance; consider re-testing.  
-        • Thyroid antibodies (TPOAb/TgAb critical): recommend clinical follow-up (no diagnosis).  
-        Keep this section to 4–6 bullet lines total.
-
-        DATA (do not alter):
-        <result_json>
-        {{
-        {{
-        RESULT_JSON   # replace this marker with json.dumps(result, ensure_ascii=False)
-        }}
-        }}
-        </result_json>
-
-        WHAT TO EXTRACT
-        - Dates: result.dates.old, result.dates.new
-        - Category counts: result.overall.better_categories, same_categories, worse_categories
-        - Overall net: result.overall.net_score
-        - Category highlights: result.highlights.improvements (name + delta)
-        - Per-biomarker transitions: result.transitions[*] fields:
-        biomarker, category, from, to, old_value, new_value, trend
-        - Flags: result.flags.Positive, result.flags.Caution
-
-        OUTPUT STYLE
-        - Headings and short paragraphs; bullets where suitable.
-        - Numeric changes as “old→new”.
-        - No tables. No units unless present in the JSON (do not guess).
-        - Never provide clinical diagnoses; suggest discussing critical items with a clinician.
-        """
+    # Inject your Python `result` dict below (compact_json(result))
+    old_prompt = f"""
+    You are given a comparison result from Centum's band-based engine.
+
+    STRUCTURE REQUIREMENTS
+    Return exactly this structure (markdown):
+    1) Overall
+    2) Highlights of improvement
+    3) Areas to watch
+    4) Flags
+    5) Personalised next steps anchored to your Centum Action Plan
+
+    WRITING RULES
+    - “Overall”: report old→new dates, number of categories improved / same / worsened, and overall net_score from the JSON.
+    - “Highlights of improvement”: use result.highlights.improvements (top categories by delta). For each highlighted category, list 2–5 key biomarker transitions that improved (e.g., critical→normal, normal→good). Show old_value→new_value (no units unless present in JSON fields).
+    - “Areas to watch”: include biomarkers that worsened band (good→normal or normal→critical) OR stayed in critical. Use short bullets: <Biomarker>: <from>→<to>, old_value→new_value, with one short reason (e.g., “still in critical band” or “regressed one band”).
+    - “Flags”: summarise result.flags.Positive and result.flags.Caution. If both lists are empty, write “No configured flags triggered.”
+    - “Personalised next steps”: pick only the sections relevant to what actually worsened or remained critical:
+    • Metabolic drift (e.g., fasting_glucose worse or HbA1c critical): sleep regularity, post-meal walks, fibre-first meals, refined-carb reduction.  
+    • Lipid drift (HDL down, TG up, ApoB high/normal): limit alcohol/sugars; emphasise olive oil, nuts, seeds, and fish; maintain activity.  
+    • Iron trend (ferritin down): iron-rich foods + vitamin C; avoid tea/coffee with iron-rich meals.  
+    • Vitamin D (high→normal or low): suggest clinician-guided dosing and re-check timing.  
+    • Heavy metals (lead/mercury high/critical): fish choice guidance; consider re-testing.  
+    • Thyroid antibodies (TPOAb/TgAb critical): recommend clinical follow-up (no diagnosis).  
+    Keep this section to 4–6 bullet lines total.
+
+    DATA (do not alter):
+    <result_json>
+    {{
+    {{
+    RESULT_JSON   # replaced with compact_json(result)
+    }}
+    }}
+    </result_json>
+
+    WHAT TO EXTRACT
+    - Dates: result.dates.old, result.dates.new
+    - Category counts: result.overall.better_categories, same_categories, worse_categories
+    - Overall net: result.overall.net_score
+    - Category highlights: result.highlights.improvements (name + delta)
+    - Per-biomarker transitions: result.transitions[*] fields:
+    biomarker, category, from, to, old_value, new_value, trend
+    - Flags: result.flags.Positive, result.flags.Caution
+
+    OUTPUT STYLE
+    - Headings and short paragraphs; bullets where suitable.
+    - Numeric changes as “old→new”.
+    - No tables. No units unless present in the JSON (do not guess).
+    - Never provide clinical diagnoses; suggest discussing critical items with a clinician.
+    """
+    old_prompt_filled = old_prompt.replace(
+    "RESULT_JSON",
+    compact_json(result)
+    )
+    return [
+        SystemMessage(content=system_prompt),
+        UserMessage(content=old_prompt_filled)
+    ]
+
+
+async def _generate_comparison_summary_using_grok(result):
+    try:
         logger.info("Generating comparison summary using Grok...")
-        endpoint = settings.AZURE_GROK_ENDPOINT
-        model_name = settings.AZURE_GROK_DEPLOYMENT
-        key = settings.AZURE_GROK_API_KEY
-
-        old_prompt_filled = old_prompt.replace(
-        "RESULT_JSON",
-        json.dumps(result, ensure_ascii=False)
-        )
-
-        async with ChatCompletionsClient(endpoint, AzureKeyCredential(key),credential_scopes=["https://cognitiveservices.azure.com/.default"]) as client:
-            resp = await client.complete(
-            messages=[
-                SystemMessage(content=system_prompt),
-                UserMessage(content=old_prompt_filled)
-            ],
-            model=model_name,
-        )
+        resp = await complete_chat("comparison_summary", comparison_summary_messages(result))
         assistant_raw = resp.choices[0].message.content
 
         # summary_obj = json.loads(assistant_raw)
@@ -483,3 +466,12 @@ async def generate_comparison_summary_using_grok(result):
         logger.error(f"Error generating comparison summary using Grok: {e}")
         return None
 
+
+async def stream_comparison_summary_using_grok(result):
+    """
+    Stream the comparison summary as markdown deltas. Not cached here (the
+    caller caches the joined text); errors propagate to the caller.
+    """
+    logger.info("Streaming comparison summary using Grok...")
+    async for delta in stream_chat("comparison_summary", comparison_summary_messages(result)):
+        yield delta
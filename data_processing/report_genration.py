@@ -1,54 +1,83 @@
+import asyncio
+import hashlib
+import heapq
 import json
 import math
 import re
-import copy
-from typing import Any, Dict, List, Optional, Tuple, Union
-from azure.ai.inference.aio import ChatCompletionsClient
+from bisect import bisect_left
+from functools import lru_cache
+from itertools import chain, repeat
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Iterable, List, Mapping, NamedTuple, Optional, Tuple, Union
+import numpy as np
 from azure.ai.inference.models import SystemMessage, UserMessage
-from azure.core.credentials import AzureKeyCredential
 
-from data_processing.biomarkers_range import centum_predefined_biomarkers_name, centum_predefined_ranges, section_to_biomarkers
+from data_processing.biomarkers_range import biomarker_name_aliases, centum_predefined_ranges, section_to_biomarkers
+from data_processing.biomarker_resolver import LLM_MIN_CONFIDENCE, resolve_lab_results
+from data_processing.prompt_builder import compact_json, prune_empty
+from data_processing.rule_summary import rule_based_clinical_summary
+from data_processing.section_index import section_index_for
 from common.config import settings, logger
+from common.llm_cache import cached_llm_response
+from common.llm_json import complete_json
+from models.llm_output import BiomarkerNameMapping, ClinicalOverview, ClinicalSummary, SectionSummary
 
 
-async def biomarker_mapping_by_llm(lab_results):
-    logger.info("MApping Biomarker started")
+async def biomarker_mapping_by_llm(names: List[str], candidate_names: List[str]) -> Optional[Dict[str, str]]:
+    """
+    Map lab-report names the local resolver could not settle to catalog keys.
+    Only the names and their candidate keys are sent. Returns {name: key} for
+    the names the model mapped to one of `candidate_names`.
+    """
+    logger.info(f"Mapping {len(names)} biomarker names with the LLM")
     try:
         prompt=f"""You're expert in mapping names of biomarkers names to predefined names.
-            You have given a list of predefined biomarkers range names and a list of biomarkers(blood report) with their results.
-            change the blood report biomarker names to the predefined biomarker names.
-            Also change the "Units" or 'unit' etc., that is given in the blood report with 'units'.
-            And the "Result" or 'result' or score etc., that is given in the blood report with 'result'.
-            The predefined biomakrers names are: {centum_predefined_biomarkers_name}
-            The blood report is: {lab_results}
+            You have given a list of predefined biomarker names and a list of biomarker names from a blood report.
+            Map each blood report biomarker name to the predefined biomarker name for the same test.
+            The predefined biomarker names are: {compact_json(candidate_names)}
+            The blood report biomarker names are: {compact_json(names)}
 
         # OUTPUT
                 1) The output stricly must be JSON ouput with no extra commentaires or string.
-                2)The output JSON must be like 
-                {{'fasting_glucose': {{'result': '6.2', 'units': 'mmol/L'}}, 
-                'hba1c': {{'result': '6.0', 'units': '%'}}, ...}}
-                3) If the biomarker name is not present in the predefined biomarker names, then do not include that biomarker in the output JSON.
+                2) The output JSON must have every blood report biomarker name as a key, like
+                {{"Glucose (fasting) plasma": "fasting_glucose", "Urine creatinine": null}}
+                3) If the blood report biomarker is not the same test as any predefined biomarker name, its value must be null.
         """
-        endpoint = settings.AZURE_GROK_ENDPOINT
-        model_name = settings.AZURE_GROK_DEPLOYMENT
-        key = settings.AZURE_GROK_API_KEY
-        
-        async with ChatCompletionsClient(endpoint, AzureKeyCredential(key), credential_scopes=["https://cognitiveservices.azure.com/.default"]) as client:
-            resp = await client.complete(
-            messages=[
-                SystemMessage(content="You are a meticulous medical summarizer."),
-                UserMessage(content=prompt)
-            ],
-            model=model_name,
-        )
-        assistant_raw = resp.choices[0].message.content
-        biomarker_mapped_object = json.loads(assistant_raw)
-        return biomarker_mapped_object
+        biomarker_mapped_object = await complete_json("biomarker_mapping", [
+            SystemMessage(content="You are a meticulous medical summarizer."),
+            UserMessage(content=prompt)
+        ], BiomarkerNameMapping)
+        allowed = set(candidate_names)
+        return {name: key for name, key in biomarker_mapped_object.items() if name in names and key in allowed}
     except Exception as e:
         logger.error(f"Error in mapping biomarker {e}")
         return None
 
 
+async def map_biomarker_names(lab_results: Dict[str, Dict[str, str]], use_llm: bool = True) -> Dict[str, Dict[str, str]]:
+    """
+    Rename lab results to catalog keys with the local resolver. Names it only
+    matches fuzzily go to the LLM (with their candidate keys); names that stay
+    unresolved are kept as-is and are reported as unknown markers.
+    """
+    resolved, leftovers = resolve_lab_results(lab_results)
+    ambiguous = {name: res for name, (_, res) in leftovers.items()
+                 if res.method == "fuzzy" and res.confidence >= LLM_MIN_CONFIDENCE}
+    if use_llm and ambiguous and settings.BIOMARKER_NAME_LLM_FALLBACK:
+        candidates = sorted({key for res in ambiguous.values() for key in res.candidates})
+        mapped = await biomarker_mapping_by_llm(sorted(ambiguous), candidates) or {}
+        for name, key in mapped.items():
+            if key and name in leftovers and key not in resolved:
+                resolved[key] = leftovers.pop(name)[0]
+    if leftovers:
+        logger.info(f"Biomarker names resolved: {len(resolved)}, unresolved: {sorted(leftovers)}")
+
+    out = dict(resolved)
+    for name, (entry, _) in leftovers.items():
+        out.setdefault(name, entry)
+    return out
+
+
 Number = Union[int, float]
 # --- Ratio biomarkers that should ignore units entirely ---
 RATIO_KEYS_IGNORE_UNIT = {"hdl_large_ldl_medium", "omega_6_omega_3_ratio"}
@@ -103,12 +132,31 @@ DISPLAY_UNITS = {
     "genotype": "genotype",
 }
 
+# Unit and name canonicalization runs for every entry of every report, but over
+# a small, highly repetitive vocabulary, so results are memoized in bounded
+# LRU caches (see canonicalization_cache_info, served at
+# GET /admin/canonicalization-cache/stats).
+CANON_CACHE_SIZE = 4096
+
+# "×10^12"/"×1012" -> "x10^12", "×10^9"/"×109" -> "x10^9"
+_TIMES_POWER_RE = re.compile(r"×10\^12|×1012|×10\^9|×109")
+_TIMES_POWER = {"×10^12": "x10^12", "×1012": "x10^12", "×10^9": "x10^9", "×109": "x10^9"}
+# micro symbol and superscript digits
+_UNIT_CHAR_TABLE = str.maketrans({
+    "μ": "µ",
+    "¹": "1", "²": "2", "³": "3", "⁴": "4", "⁵": "5",
+    "⁶": "6", "⁷": "7", "⁸": "8", "⁹": "9", "⁰": "0",
+})
+
+
+@lru_cache(maxsize=CANON_CACHE_SIZE)
 def pretty_unit(u: Optional[str]) -> str:
     """Return a nicely-cased display unit (doesn't affect calculations)."""
     cu = canon_unit(u)
     return DISPLAY_UNITS.get(cu, u or "")
 
 
+@lru_cache(maxsize=CANON_CACHE_SIZE)
 def normalize_unit(u: Optional[str]) -> str:
     """
     Normalize the *spelling* of units but do not convert values.
@@ -119,17 +167,13 @@ def normalize_unit(u: Optional[str]) -> str:
     if u is None:
         return ""
     s = u.strip()
-    # unify micro symbols and special chars
-    s = s.replace("μ", "µ")
-    s = s.replace("×10^12", "x10^12").replace("×1012", "x10^12")
-    s = s.replace("×10^9", "x10^9").replace("×109", "x10^9")
-    s = s.replace("¹", "1").replace("²", "2").replace("³", "3").replace("⁴", "4") \
-         .replace("⁵", "5").replace("⁶", "6").replace("⁷", "7").replace("⁸", "8") \
-         .replace("⁹", "9").replace("⁰", "0")
+    # exponents first: "×10¹²" must not turn into "×1012" before this step
+    s = _TIMES_POWER_RE.sub(lambda m: _TIMES_POWER[m.group(0)], s)
+    # unify micro symbols and superscripts
+    s = s.translate(_UNIT_CHAR_TABLE)
     s = s.replace("m2", "m²")  # eGFR area unit
-    # canonical spacing/case
-    s = re.sub(r"\s+", "", s, flags=re.I)
-    return s
+    # canonical spacing
+    return "".join(s.split())
 
 # Units that are the same (aliases) — no numeric conversion is applied here.
 UNIT_ALIASES = {
@@ -182,6 +226,9 @@ UNIT_CONVERSIONS: Dict[Tuple[str, str], float] = {
 
     ("µg/l", "ng/ml"): 1.0,
     ("ng/ml", "µg/l"): 1.0,
+
+    # mass concentration, so mg/dL -> g/L -> mg/L resolves transitively
+    ("g/l", "mg/l"): 1000.0,
 }
 
 # Analyte-specific unit overrides (precedence over generic conversions).
@@ -237,39 +284,104 @@ ANALYTE_UNIT_OVERRIDES: Dict[str, List[Tuple[str, str, float]]] = {
     ],
 }
 
+EMPTY_UNIT_TOKENS = frozenset({"", "-", "—", "na", "n/a", "none"})
+
+
+@lru_cache(maxsize=CANON_CACHE_SIZE)
 def canon_unit(u: Optional[str]) -> str:
     """
     Return the canonical form of a unit string (no numeric conversion).
     Also treats common "no unit" tokens as empty.
     """
     nu = normalize_unit(u).lower()
-    if nu in {"", "-", "—", "na", "n/a", "none"}:
+    if nu in EMPTY_UNIT_TOKENS:
         return ""
     return UNIT_ALIASES.get(nu, nu)
 
+# -------------------------------------------------------------------
+# Conversion graph
+# -------------------------------------------------------------------
+# Units are nodes and conversion factors are edges. Each analyte's graph is its
+# overrides plus the generic table (overrides win on the same unit pair), and
+# every declared edge also gets a derived inverse edge (1 / factor). All
+# reachable (from, to) pairs are solved once at import, so try_convert is a
+# single dict lookup.
+
+class ConversionPath(NamedTuple):
+    factor: float
+    path: Tuple[str, ...]   # canonical units from source to target
+
+
+def _conversion_edges(overrides: List[Tuple[str, str, float]]) -> Dict[str, Dict[str, Tuple[float, bool]]]:
+    """Adjacency map unit -> {unit: (factor, derived)} for one analyte."""
+    declared: Dict[Tuple[str, str], float] = {}
+    for _from, _to, factor in overrides:
+        declared.setdefault((canon_unit(_from), canon_unit(_to)), factor)
+    for (_from, _to), factor in UNIT_CONVERSIONS.items():
+        declared.setdefault((canon_unit(_from), canon_unit(_to)), factor)
+
+    edges: Dict[str, Dict[str, Tuple[float, bool]]] = {}
+    for (f, t), factor in declared.items():
+        if f != t:
+            edges.setdefault(f, {})[t] = (factor, False)
+    for (f, t), factor in declared.items():
+        if f != t and factor and (t, f) not in declared:
+            edges.setdefault(t, {})[f] = (1.0 / factor, True)
+    return edges
+
+
+def _solve_conversions(edges: Dict[str, Dict[str, Tuple[float, bool]]]) -> Mapping[Tuple[str, str], ConversionPath]:
+    """
+    Best path for every reachable pair: fewest hops, then fewest derived
+    (inverse) edges. A declared direct edge is therefore always used as-is.
+    """
+    table: Dict[Tuple[str, str], ConversionPath] = {}
+    for source in edges:
+        best = {source: (0, 0)}
+        heap = [(0, 0, source, 1.0, (source,))]
+        while heap:
+            hops, derived, unit, factor, path = heapq.heappop(heap)
+            if best.get(unit, (hops, derived)) < (hops, derived):
+                continue
+            if unit != source:
+                table[(source, unit)] = ConversionPath(factor, path)
+            for nxt, (step, is_derived) in edges.get(unit, {}).items():
+                cost = (hops + 1, derived + is_derived)
+                if nxt not in best or cost < best[nxt]:
+                    best[nxt] = cost
+                    heapq.heappush(heap, (*cost, nxt, factor * step, path + (nxt,)))
+    return MappingProxyType(table)
+
+
+GENERIC_CONVERSIONS = _solve_conversions(_conversion_edges([]))
+ANALYTE_CONVERSIONS = MappingProxyType({
+    analyte: _solve_conversions(_conversion_edges(overrides))
+    for analyte, overrides in ANALYTE_UNIT_OVERRIDES.items()
+})
+
+
+def conversion_path(from_unit: str, to_unit: str, analyte_key: Optional[str] = None) -> Optional[ConversionPath]:
+    """Precomputed conversion (factor and unit path) between two units, if reachable."""
+    return ANALYTE_CONVERSIONS.get(analyte_key, GENERIC_CONVERSIONS).get((canon_unit(from_unit), canon_unit(to_unit)))
+
+
 def try_convert(value: Number, from_unit: str, to_unit: str, analyte_key: str) -> Tuple[Optional[Number], Optional[str]]:
     """
     Convert `value` from `from_unit` to `to_unit` for a given `analyte_key`.
 
     Strategy:
-    1) Try analyte-specific overrides first (handles ambiguous lab practices).
-    2) Fall back to generic `UNIT_CONVERSIONS`.
+    1) Look up the precomputed path in the analyte's conversion graph
+       (analyte-specific overrides take precedence over generic factors).
+    2) Fall back to the generic graph for analytes without overrides.
     3) If no path, return (None, "no_conversion:...").
     """
     f = canon_unit(from_unit)
     t = canon_unit(to_unit)
     if f == t:
         return value, None
-    # analyte-specific first
-    for k, overrides in ANALYTE_UNIT_OVERRIDES.items():
-        if k == analyte_key and overrides:
-            for _from, _to, factor in overrides:
-                if canon_unit(_from) == f and canon_unit(_to) == t:
-                    return value * factor, None
-    # generic
-    factor = UNIT_CONVERSIONS.get((f, t))
-    if factor is not None:
-        return value * factor, None
+    conv = ANALYTE_CONVERSIONS.get(analyte_key, GENERIC_CONVERSIONS).get((f, t))
+    if conv is not None:
+        return value * conv.factor, None
     return None, f"no_conversion:{from_unit}->{to_unit}"
 
 # -------------------------------------------------------------------
@@ -319,76 +431,6 @@ def _in_range(v: float, rng: Dict[str, Any]) -> bool:
                 return False
     return True
 
-def _choose_branch(spec: Dict[str, Any], sex: Optional[str], age: Optional[int]) -> Dict[str, Any]:
-    """
-    Select the sex/age-specific sub-branch of a biomarker spec if present.
-    - Sex selection: uses top-level "M"/"F" dicts.
-    - Age selection: supports bands "<N", "≤N", ">=N", "≥N" and "A-B" (inclusive).
-    If no branch applies, returns the original spec. Inherit parent "unit" if child lacks one.
-    """
-    spec = copy.deepcopy(spec)
-    parent_unit = spec.get("unit")
-
-    # 1) Sex-based
-    if sex and sex.upper() in spec and isinstance(spec[sex.upper()], dict):
-        child = copy.deepcopy(spec[sex.upper()])
-        if "unit" not in child and parent_unit:
-            child["unit"] = parent_unit
-        spec = child
-        parent_unit = spec.get("unit", parent_unit)
-
-    # 2) Age-based bands
-    if age is None:
-        return spec
-
-    candidates: List[Tuple[int, int, Dict[str, Any]]] = []  # (lo, hi, branch)
-    for k, v in list(spec.items()):
-        if not isinstance(v, dict):
-            continue
-        ks = str(k).strip()
-
-        # A-B (inclusive)
-        m = re.match(r"^(\d+)\s*-\s*(\d+)$", ks)
-        if m:
-            lo, hi = int(m.group(1)), int(m.group(2))
-            if lo <= age <= hi:
-                branch = copy.deepcopy(v)
-                if "unit" not in branch and parent_unit:
-                    branch["unit"] = parent_unit
-                candidates.append((lo, hi, branch))
-            continue
-
-        # <N or ≤N
-        m = re.match(r"^<\s*(\d+)$", ks)
-        if m and age < int(m.group(1)):
-            branch = copy.deepcopy(v)
-            if "unit" not in branch and parent_unit:
-                branch["unit"] = parent_unit
-            candidates.append((-10**9, int(m.group(1)) - 1, branch))
-            continue
-        m = re.match(r"^[≤]\s*(\d+)$", ks)
-        if m and age <= int(m.group(1)):
-            branch = copy.deepcopy(v)
-            if "unit" not in branch and parent_unit:
-                branch["unit"] = parent_unit
-            candidates.append((-10**9, int(m.group(1)), branch))
-            continue
-
-        # ≥N or >=N
-        m = re.match(r"^(≥|>=)\s*(\d+)$", ks)
-        if m and age >= int(m.group(2)):
-            branch = copy.deepcopy(v)
-            if "unit" not in branch and parent_unit:
-                branch["unit"] = parent_unit
-            candidates.append((int(m.group(2)), 10**9, branch))
-            continue
-
-    if candidates:
-        lo, hi, best = min(candidates, key=lambda t: (t[1] - t[0], -t[0]))
-        return best
-
-    return spec
-
 def _collect_ranges(d: Dict[str, Any]) -> Tuple[str, Any, Dict[str, Any]]:
     """
     Normalize a biomarker spec into:
@@ -462,27 +504,186 @@ def _classify_numeric(v: float, ranges: Dict[str, Any]) -> Optional[str]:
             continue
     return None
 
-def _classify_categorical(raw_value: str, cat_spec: Dict[str, Any]) -> Optional[str]:
+# -------------------------------------------------------------------
+# Compiled range index
+# -------------------------------------------------------------------
+# The range table is static, so every sex/age branch is resolved, its unit
+# canonicalized and its bands flattened once at import. Classifying an entry
+# is then a dict lookup plus a bisect over the branch's band edges, with no
+# spec copies or age-key regexes on the hot path.
+
+BAND_LABELS = ("optimal", "average", "poor")
+
+# Age-band keys as they appear in the range table: "A-B", "<N", "≤N", "≥N"/">=N".
+_AGE_RANGE_RE = re.compile(r"^(\d+)\s*-\s*(\d+)$")
+_AGE_LT_RE = re.compile(r"^<\s*(\d+)$")
+_AGE_LE_RE = re.compile(r"^[≤]\s*(\d+)$")
+_AGE_GE_RE = re.compile(r"^(≥|>=)\s*(\d+)$")
+_UNITLESS_NAME_RE = re.compile(r"(ratio|index|score)\b")
+
+CategoricalBands = Tuple[Tuple[str, FrozenSet[str], Tuple[str, ...]], ...]
+
+
+class CompiledBands(NamedTuple):
+    """A single resolved (biomarker, sex, age band) branch of the range table."""
+    expected_unit: str                  # unit as written in the spec
+    exp_unit: str                       # canon_unit(expected_unit)
+    categorical: Optional[CategoricalBands]
+    edges: Tuple[float, ...]            # sorted distinct band boundaries
+    labels: Tuple[Optional[str], ...]   # label per open segment / edge, see _band_label
+    nan_label: Optional[str]
+
+
+class AgeBand(NamedTuple):
+    lo: float
+    hi: float
+    hi_inclusive: bool                  # False only for "<N"
+    bands: CompiledBands
+
+
+class CompiledMarker(NamedTuple):
+    # sex ("M"/"F", or None for the sex-agnostic spec) -> (default bands, age bands best-first)
+    by_sex: Mapping[Optional[str], Tuple[CompiledBands, Tuple[AgeBand, ...]]]
+    unitless_name: bool
+
+
+def _compile_numeric(ranges: Dict[str, Any]) -> Tuple[Tuple[float, ...], Tuple[Optional[str], ...], Optional[str]]:
     """
-    Classify a categorical value (string) by case-insensitive match.
-    Exact match or substring containment is allowed (tolerant of minor wording).
+    Flatten numeric bands into sorted edges plus a label for every open segment
+    and every edge: [(-inf, e0), e0, (e0, e1), e1, ..., (en, +inf)].
+    Labels are taken from _classify_numeric itself, so priority and
+    inclusivity rules stay identical to the per-range evaluation.
     """
-    val = (raw_value or "").strip().lower()
-    for label in ("optimal", "average", "poor"):
-        spec_val = cat_spec.get(label)
-        if spec_val is None:
+    points = set()
+    for label in BAND_LABELS:
+        for r in _to_range_list(ranges.get(label)):
+            for bound in ("min", "max"):
+                if r.get(bound) is not None:
+                    points.add(float(r[bound]))
+    edges = tuple(sorted(points))
+
+    if not edges:
+        probes = [0.0]
+    else:
+        probes = [edges[0] - 1.0]
+        for i, e in enumerate(edges):
+            probes.append(e)
+            probes.append((e + edges[i + 1]) / 2.0 if i + 1 < len(edges) else e + 1.0)
+
+    labels = tuple(_classify_numeric(p, ranges) for p in probes)
+    return edges, labels, _classify_numeric(float("nan"), ranges)
+
+
+def _compile_bands(d: Dict[str, Any]) -> CompiledBands:
+    expected_unit, categorical, band_spec = _collect_ranges(d)
+    cat: Optional[CategoricalBands] = None
+    if categorical == "categorical":
+        compiled = []
+        for label in BAND_LABELS:
+            spec_val = band_spec.get(label)
+            if spec_val is None:
+                continue
+            options = tuple(str(s).strip().lower() for s in (spec_val if isinstance(spec_val, list) else [spec_val]))
+            compiled.append((label, frozenset(options), options))
+        cat = tuple(compiled)
+    edges, labels, nan_label = _compile_numeric(band_spec)
+    return CompiledBands(expected_unit, canon_unit(expected_unit), cat, edges, labels, nan_label)
+
+
+def _with_unit(branch: Dict[str, Any], parent_unit: Optional[str]) -> Dict[str, Any]:
+    """Shallow copy of a sub-branch that inherits the parent's unit if it has none."""
+    out = dict(branch)
+    if "unit" not in out and parent_unit:
+        out["unit"] = parent_unit
+    return out
+
+
+def _compile_age_bands(spec: Dict[str, Any]) -> Tuple[AgeBand, ...]:
+    """
+    Parse the age-band keys of a (sex-resolved) spec once.
+    Bands are ordered narrowest first (ties: higher lower bound first), so the
+    first band containing an age is the one the classifier should use.
+    """
+    parent_unit = spec.get("unit")
+    ranked = []
+    for k, v in spec.items():
+        if not isinstance(v, dict):
             continue
-        if isinstance(spec_val, list):
-            for s in spec_val:
-                ss = str(s).strip().lower()
-                if val == ss or ss in val or val in ss:
-                    return label
+        ks = str(k).strip()
+        m = _AGE_RANGE_RE.match(ks)
+        if m:
+            lo, hi = int(m.group(1)), int(m.group(2))
+            band = (lo, hi, True, lo, hi)
+        elif _AGE_LT_RE.match(ks):
+            n = int(_AGE_LT_RE.match(ks).group(1))
+            band = (float("-inf"), n, False, -10**9, n - 1)
+        elif _AGE_LE_RE.match(ks):
+            n = int(_AGE_LE_RE.match(ks).group(1))
+            band = (float("-inf"), n, True, -10**9, n)
+        elif _AGE_GE_RE.match(ks):
+            n = int(_AGE_GE_RE.match(ks).group(2))
+            band = (n, float("inf"), True, n, 10**9)
         else:
-            ss = str(spec_val).strip().lower()
-            if val == ss or ss in val or val in ss:
-                return label
+            continue
+        lo, hi, hi_inclusive, rank_lo, rank_hi = band
+        ranked.append(((rank_hi - rank_lo, -rank_lo), AgeBand(lo, hi, hi_inclusive, _compile_bands(_with_unit(v, parent_unit)))))
+    ranked.sort(key=lambda t: t[0])
+    return tuple(band for _, band in ranked)
+
+
+def _compile_marker(key: str, spec: Dict[str, Any]) -> CompiledMarker:
+    by_sex = {None: (_compile_bands(spec), _compile_age_bands(spec))}
+    for sex in ("M", "F"):
+        if isinstance(spec.get(sex), dict):
+            child = _with_unit(spec[sex], spec.get("unit"))
+            by_sex[sex] = (_compile_bands(child), _compile_age_bands(child))
+    return CompiledMarker(MappingProxyType(by_sex), bool(_UNITLESS_NAME_RE.search(key)))
+
+
+def build_range_index(predefined_ranges: Dict[str, Any]) -> Mapping[str, CompiledMarker]:
+    """Compile a range table into an immutable biomarker -> CompiledMarker index."""
+    return MappingProxyType({key: _compile_marker(key, spec) for key, spec in predefined_ranges.items()})
+
+
+def _resolve_bands(marker: CompiledMarker, sex: Optional[str], age: Optional[Number]) -> CompiledBands:
+    """
+    Select the sex/age-specific branch of a compiled marker.
+    - Sex selection: "M"/"F" sub-specs; anything else uses the sex-agnostic spec.
+    - Age selection: narrowest matching band; falls back to the sex-level spec.
+    """
+    default, age_bands = marker.by_sex.get(sex.upper() if sex else None) or marker.by_sex[None]
+    if age is not None:
+        for band in age_bands:
+            if band.lo <= age and (age <= band.hi if band.hi_inclusive else age < band.hi):
+                return band.bands
+    return default
+
+
+def _band_label(bands: CompiledBands, v: float) -> Optional[str]:
+    """Numeric classification against a compiled branch (equivalent to _classify_numeric)."""
+    if v != v:  # NaN
+        return bands.nan_label
+    i = bisect_left(bands.edges, v)
+    if i < len(bands.edges) and bands.edges[i] == v:
+        return bands.labels[2 * i + 1]
+    return bands.labels[2 * i]
+
+
+def _categorical_label(bands: CompiledBands, raw_value: str) -> Optional[str]:
+    """
+    Categorical classification against a compiled branch: case-insensitive
+    exact match, or containment either way (tolerant of minor wording).
+    """
+    val = (raw_value or "").strip().lower()
+    for label, exact, options in bands.categorical:
+        if val in exact or any(ss in val or val in ss for ss in options):
+            return label
     return None
 
+
+RANGE_INDEX = build_range_index(centum_predefined_ranges)
+RATIO_BANDS = {key: _compile_bands(spec) for key, spec in RATIO_NUMERIC_BANDS.items()}
+
 # -------------------------------------------------------------------
 # Name normalization / aliases
 # -------------------------------------------------------------------
@@ -497,17 +698,55 @@ NAME_ALIASES = {
     "non-hdl": "non_hdl_cholesterol",
 }
 
+# Runs of anything but [a-z0-9] (underscores included) collapse to one "_".
+_NAME_SEPARATOR_RE = re.compile(r"[^a-z0-9]+")
+
+
+@lru_cache(maxsize=CANON_CACHE_SIZE)
 def canon_name(name: str) -> str:
     """
     Canonicalize a biomarker name:
     - Lowercase, replace non [a-z0-9_] with underscores, collapse repeats,
       then apply NAME_ALIASES.
     """
-    k = name.strip().lower()
-    k = re.sub(r"[^a-z0-9_]+", "_", k)
-    k = re.sub(r"_+", "_", k).strip("_")
+    k = _NAME_SEPARATOR_RE.sub("_", name.strip().lower()).strip("_")
     return NAME_ALIASES.get(k, k)
 
+
+def canonicalization_cache_info() -> Dict[str, Dict[str, int]]:
+    """Hit/miss counters of the unit and name canonicalization caches."""
+    out = {}
+    for fn in (normalize_unit, canon_unit, pretty_unit, canon_name):
+        info = fn.cache_info()
+        out[fn.__name__] = {"hits": info.hits, "misses": info.misses, "size": info.currsize, "maxsize": info.maxsize}
+    return out
+
+# -------------------------------------------------------------------
+# Range table version
+# -------------------------------------------------------------------
+# Every report is stamped with the version of the tables it was classified
+# under. The version is a content hash, so it only changes when something that
+# can move a biomarker between buckets or sections changes: the ranges, the
+# section lists, and the name/unit tables used to read lab results.
+
+def range_table_version(predefined_ranges: Dict[str, Any], sections: Dict[str, List[str]]) -> str:
+    """Short SHA-256 of the classification tables (canonical JSON, key order independent)."""
+    tables = {
+        "ranges": predefined_ranges,
+        "sections": sections,
+        "ratio_bands": RATIO_NUMERIC_BANDS,
+        "name_aliases": NAME_ALIASES,
+        "biomarker_name_aliases": biomarker_name_aliases,
+        "unit_aliases": UNIT_ALIASES,
+        "unit_conversions": sorted([f, t, factor] for (f, t), factor in UNIT_CONVERSIONS.items()),
+        "analyte_overrides": {k: sorted(map(list, v)) for k, v in ANALYTE_UNIT_OVERRIDES.items()},
+    }
+    blob = json.dumps(tables, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+
+
+RANGE_TABLE_VERSION = range_table_version(centum_predefined_ranges, section_to_biomarkers)
+
 # -------------------------------------------------------------------
 # Main API
 # -------------------------------------------------------------------
@@ -543,110 +782,99 @@ async def classify_report(
       "meta": {"sex": sex, "age": age}
     }
     """
-    counts = {"optimal": 0, "normal": 0, "poor": 0, "invalid": 0}
-    invalid_breakdown = {
-        "unknown_marker": 0,
-        "unit_mismatch": 0,
-        "non_numeric_value": 0,
-        "no_band_match": 0,
-        "unclassified_categorical": 0,
-    }
+    index = RANGE_INDEX if predefined_ranges is centum_predefined_ranges else build_range_index(predefined_ranges)
+    pending = _prepare_entries(index, report, sex, age)
+    labels = [p.value if p.bands is None else _band_label(p.bands, p.value) for p in pending]
+    return _assemble_report(pending, labels)
 
-    sections = {
-        "optimal_biomarkers": {},
-        "normal_biomarkers": {},
-        "poor_biomarkers": {},
-    }
-    invalid_out: Dict[str, Dict[str, Any]] = {}
 
-    def _label_to_section(lbl: str) -> Optional[str]:
-        return {"optimal": "optimal_biomarkers",
-                "average": "normal_biomarkers",
-                "poor": "poor_biomarkers"}.get(lbl)
+class _PendingEntry(NamedTuple):
+    """
+    One report entry after name/unit normalization and conversion.
+    - bands set:  `value` is numeric and still has to be classified against `bands`.
+    - bands None: `value` is already the final label (None -> invalid).
+    """
+    key: str
+    bands: Optional[CompiledBands]
+    value: Any
+    payload: Optional[Dict[str, Any]]          # stored under the matched section
+    invalid_payload: Optional[Dict[str, Any]]  # stored under invalid_biomarkers on a miss
+    reason: str                                # invalid reason on a miss
 
-    def _mark_invalid(key: str, reason: str, payload: Dict[str, Any]):
-        counts["invalid"] += 1
-        if reason in invalid_breakdown:
-            invalid_breakdown[reason] += 1
-        else:
-            invalid_breakdown.setdefault(reason, 0)
-            invalid_breakdown[reason] += 1
-        invalid_out[key] = {"reason": reason, **payload}
 
+def _prepare_entries(
+    index: Mapping[str, CompiledMarker],
+    report: Dict[str, Dict[str, str]],
+    sex: Optional[str],
+    age: Optional[Number],
+) -> List[_PendingEntry]:
+    """
+    Resolve every entry of `report` up to the point where only the numeric
+    band lookup is left. Entries keep report order so that the scalar and the
+    batch classifiers assemble identical outputs.
+    """
+    out: List[_PendingEntry] = []
     for raw_key, entry in report.items():
         key = canon_name(raw_key)
         lab_val = _as_float(entry.get("result"))
         lab_unit = canon_unit(entry.get("units"))
 
         # Unknown marker
-        if key not in predefined_ranges:
-            _mark_invalid(key, "unknown_marker", {})
+        marker = index.get(key)
+        if marker is None:
+            out.append(_PendingEntry(key, None, None, None, {}, "unknown_marker"))
             continue
 
-        # Choose branch and collect ranges/unit
-        spec = _choose_branch(copy.deepcopy(predefined_ranges[key]), sex, age)
-        expected_unit, categorical, band_spec = _collect_ranges(spec)
+        # Resolve the sex/age branch from the compiled index
+        bands = _resolve_bands(marker, sex, age)
+        expected_unit = bands.expected_unit
         # ---- RATIO SHORT-CIRCUIT (ignore units for these keys) ----
-        if key in RATIO_KEYS_IGNORE_UNIT:
-            num = _as_float(entry.get("result"))
-            if num is not None:
-                # Prefer our numeric bands; if not present, fall back to whatever bands came from spec
-                ratio_ranges = RATIO_NUMERIC_BANDS.get(key) or band_spec or {}
-                label = _classify_numeric(num, ratio_ranges)
-                if label is not None:
-                    mapped = "normal" if label == "average" else label
-                    counts[mapped] += 1
-                    sec = _label_to_section(label)
-                    if sec:
-                        sections[sec][key] = {
-                            "value": round(num, 6),
-                            "unit": pretty_unit("ratio"),          # force "ratio" for display
-                            "expected_unit": pretty_unit("ratio"),  # and ignore whatever the input had
-                        }
-                else:
-                    _mark_invalid(key, "no_band_match", {
-                        "value": round(num, 6),
-                        "unit": pretty_unit(entry.get("units")),
-                        "expected_unit": pretty_unit("ratio"),
-                    })
-                continue  # IMPORTANT: skip the normal unit-conversion path entirely
+        if key in RATIO_KEYS_IGNORE_UNIT and lab_val is not None:
+            # Prefer our numeric bands; if not present, fall back to whatever bands came from spec
+            out.append(_PendingEntry(
+                key, RATIO_BANDS.get(key) or bands, lab_val,
+                {
+                    "value": round(lab_val, 6),
+                    "unit": pretty_unit("ratio"),          # force "ratio" for display
+                    "expected_unit": pretty_unit("ratio"),  # and ignore whatever the input had
+                },
+                {
+                    "value": round(lab_val, 6),
+                    "unit": pretty_unit(entry.get("units")),
+                    "expected_unit": pretty_unit("ratio"),
+                },
+                "no_band_match",
+            ))
+            continue  # IMPORTANT: skip the normal unit-conversion path entirely
         # ---- end RATIO SHORT-CIRCUIT ----
 
-        exp_unit = canon_unit(expected_unit)
+        exp_unit = bands.exp_unit
 
         # Categorical markers skip numeric conversion entirely
-        if categorical == "categorical":
-            label = _classify_categorical(str(entry.get("result")), band_spec)
-            if not label:
-                _mark_invalid(key, "unclassified_categorical", {
+        if bands.categorical is not None:
+            out.append(_PendingEntry(
+                key, None, _categorical_label(bands, str(entry.get("result"))),
+                {
+                    "value": entry.get("result"),
+                    "unit": pretty_unit(entry.get("units")),
+                    "expected_unit": pretty_unit(expected_unit),
+                },
+                {
                     "value": entry.get("result"),
                     "unit": entry.get("units"),
                     "expected_unit": expected_unit
-                })
-            else:
-                mapped = "normal" if label == "average" else label
-                counts[mapped] += 1
-                sec = _label_to_section(label)
-                if sec:
-                    # sections[sec][key] = {
-                    #     "value": entry.get("result"),
-                    #     "unit": entry.get("units"),
-                    #     "expected_unit": expected_unit
-                    # }
-                    sections[sec][key] = {
-                        "value": entry.get("result"),
-                        "unit": pretty_unit(entry.get("units")),
-                        "expected_unit": pretty_unit(expected_unit),
-                    }
+                },
+                "unclassified_categorical",
+            ))
             continue
 
         # Numeric markers
         if lab_val is None:
-            _mark_invalid(key, "non_numeric_value", {
+            out.append(_PendingEntry(key, None, None, None, {
                 "value": entry.get("result"),
                 "unit": entry.get("units"),
                 "expected_unit": expected_unit
-            })
+            }, "non_numeric_value"))
             continue
 
         # Unit conversion (with unitless support)
@@ -656,8 +884,7 @@ async def classify_report(
 
         # Consider this marker unitless if expected unit is in UNITLESS_EXPECTED
         # or name looks like a ratio/index/score
-        name_suggests_unitless = bool(re.search(r"(ratio|index|score)\b", key))
-        is_unitless = (exp_unit in UNITLESS_EXPECTED) or name_suggests_unitless
+        is_unitless = (exp_unit in UNITLESS_EXPECTED) or marker.unitless_name
 
         if is_unitless:
             # Do not convert; keep input unit (often blank/dash); optionally adopt exp_unit label
@@ -671,39 +898,61 @@ async def classify_report(
                         final_unit = exp_unit
                         unit_note = f"converted:{lab_unit}->{exp_unit}"
                     else:
-                        _mark_invalid(key, "unit_mismatch", {
+                        out.append(_PendingEntry(key, None, None, None, {
                             "value": lab_val,
                             "unit": entry.get("units"),
                             "expected_unit": expected_unit,
                             "detail": err
-                        })
+                        }, "unit_mismatch"))
                         continue
             # else: no expected unit provided; keep as-is
 
-        # Range classification
-        raw_label = _classify_numeric(final_val, band_spec)
-        if raw_label is None:
-            payload = {
-                "value": round(final_val, 6),
-                "unit": pretty_unit(final_unit or entry.get("units")),
-                "expected_unit": pretty_unit(expected_unit),
-            }
-            if unit_note:
-                payload["detail"] = unit_note
-            _mark_invalid(key, "no_band_match", payload)
-        else:
-            mapped = "normal" if raw_label == "average" else raw_label
-            counts[mapped] += 1
-            sec = _label_to_section(raw_label)
-            if sec:
-                obj = {
-                    "value": round(final_val, 6),
-                    "unit": pretty_unit(final_unit or entry.get("units")),
-                    "expected_unit": pretty_unit(expected_unit),
-                }
-                if unit_note:
-                    obj["detail"] = unit_note
-                sections[sec][key] = obj
+        # Range classification is deferred; the same payload is used for a match or a miss
+        payload = {
+            "value": round(final_val, 6),
+            "unit": pretty_unit(final_unit or entry.get("units")),
+            "expected_unit": pretty_unit(expected_unit),
+        }
+        if unit_note:
+            payload["detail"] = unit_note
+        out.append(_PendingEntry(key, bands, final_val, payload, payload, "no_band_match"))
+    return out
+
+
+_LABEL_TO_SECTION = {"optimal": "optimal_biomarkers",
+                     "average": "normal_biomarkers",
+                     "poor": "poor_biomarkers"}
+
+
+def _assemble_report(pending: List[_PendingEntry], labels: List[Optional[str]]) -> Optional[Dict[str, Any]]:
+    """Build the classify_report output from prepared entries and their band labels."""
+    counts = {"optimal": 0, "normal": 0, "poor": 0, "invalid": 0}
+    invalid_breakdown = {
+        "unknown_marker": 0,
+        "unit_mismatch": 0,
+        "non_numeric_value": 0,
+        "no_band_match": 0,
+        "unclassified_categorical": 0,
+    }
+
+    sections = {
+        "optimal_biomarkers": {},
+        "normal_biomarkers": {},
+        "poor_biomarkers": {},
+    }
+    invalid_out: Dict[str, Dict[str, Any]] = {}
+
+    for p, label in zip(pending, labels):
+        if label is None:
+            counts["invalid"] += 1
+            invalid_breakdown[p.reason] = invalid_breakdown.get(p.reason, 0) + 1
+            invalid_out[p.key] = {"reason": p.reason, **p.invalid_payload}
+            continue
+        mapped = "normal" if label == "average" else label
+        counts[mapped] += 1
+        sec = _LABEL_TO_SECTION.get(label)
+        if sec:
+            sections[sec][p.key] = p.payload
 
     # return {
     #     "summary": {**counts, "invalid_breakdown": invalid_breakdown},
@@ -726,8 +975,82 @@ async def classify_report(
     }
 
 
-# Generate Clinical Summary
+# -------------------------------------------------------------------
+# Batch API
+# -------------------------------------------------------------------
+# Label codes used by the vectorized lookup; index 0 means "no band matched".
+_LABEL_CODES: Tuple[Optional[str], ...] = (None,) + BAND_LABELS
+
+
+def _band_codes(bands: CompiledBands, values: np.ndarray) -> np.ndarray:
+    """Vectorized _band_label: label codes for many values against one branch."""
+    edges = np.asarray(bands.edges, dtype=np.float64)
+    slot_codes = np.asarray([_LABEL_CODES.index(lbl) for lbl in bands.labels], dtype=np.int8)
+    i = np.searchsorted(edges, values, side="left")
+    on_edge = np.zeros(values.shape, dtype=bool)
+    inside = i < edges.size
+    on_edge[inside] = edges[i[inside]] == values[inside]
+    codes = slot_codes[np.where(on_edge, 2 * i + 1, 2 * i)]
+    codes[np.isnan(values)] = _LABEL_CODES.index(bands.nan_label)
+    return codes
+
+
+async def classify_reports_batch(
+    predefined_ranges: Dict[str, Any],
+    reports: Iterable[Tuple[Dict[str, Dict[str, str]], Optional[str], Optional[int]]],
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    Classify many (lab_results, sex, age) tuples in one go.
+
+    Entries are normalized per report as in classify_report, then grouped by
+    resolved band branch and labelled with a single `np.searchsorted` per
+    branch instead of one band walk per entry. Returns one classify_report
+    result (or None) per input tuple, in input order.
+    """
+    index = RANGE_INDEX if predefined_ranges is centum_predefined_ranges else build_range_index(predefined_ranges)
+    prepared = [_prepare_entries(index, lab_results, sex, age) for lab_results, sex, age in reports]
+
+    # branch id -> (branch, [(report_pos, entry_pos)], [values])
+    groups: Dict[int, Tuple[CompiledBands, List[Tuple[int, int]], List[float]]] = {}
+    labels: List[List[Optional[str]]] = []
+    for r, pending in enumerate(prepared):
+        row: List[Optional[str]] = []
+        for e, p in enumerate(pending):
+            if p.bands is None:
+                row.append(p.value)
+                continue
+            row.append(None)
+            group = groups.get(id(p.bands))
+            if group is None:
+                group = groups[id(p.bands)] = (p.bands, [], [])
+            group[1].append((r, e))
+            group[2].append(p.value)
+        labels.append(row)
+
+    for bands, positions, values in groups.values():
+        codes = _band_codes(bands, np.asarray(values, dtype=np.float64))
+        for (r, e), code in zip(positions, codes.tolist()):
+            labels[r][e] = _LABEL_CODES[code]
+
+    return [_assemble_report(pending, row) for pending, row in zip(prepared, labels)]
+
+
+# Bump whenever the clinical summary prompt changes; cached summaries from older prompts are then ignored.
+CLINICAL_SUMMARY_PROMPT_VERSION = "2"
+
+
+# Generate Clinical Summary (cached by its inputs)
 async def generate_clinical_summary(gender, section_classification_result, questionnaire):
+    if settings.CLINICAL_SUMMARY_FANOUT:
+        return await generate_clinical_summary_fanout(gender, section_classification_result, questionnaire)
+    inputs = {"gender": gender, "sections": section_classification_result, "questionnaire": questionnaire}
+    return await cached_llm_response(
+        "clinical_summary", CLINICAL_SUMMARY_PROMPT_VERSION, inputs,
+        lambda: _generate_clinical_summary(gender, section_classification_result, questionnaire)
+    )
+
+
+async def _generate_clinical_summary(gender, section_classification_result, questionnaire):
     logger.info("generate clinical summary started")
     try:
         # criticl concers-> 
@@ -743,8 +1066,8 @@ async def generate_clinical_summary(gender, section_classification_result, quest
     #  INPUT
         ## User Information
             user gender : {gender}
-            Blood Report classify data : {section_classification_result}
-            Patient Questionaries : {questionnaire}
+            Blood Report classify data : {compact_json(prune_empty(section_classification_result))}
+            Patient Questionaries : {compact_json(prune_empty(questionnaire))}
 
     
     # OUTPUT
@@ -778,38 +1101,171 @@ async def generate_clinical_summary(gender, section_classification_result, quest
             }}
         3) If some section do not have any data then do not include that section in the output.
     """
-        endpoint = settings.AZURE_GROK_ENDPOINT
-        model_name = settings.AZURE_GROK_DEPLOYMENT
-        key = settings.AZURE_GROK_API_KEY
-        
-        async with ChatCompletionsClient(endpoint, AzureKeyCredential(key),credential_scopes=["https://cognitiveservices.azure.com/.default"]) as client:
-            resp = await client.complete(
-            messages=[
-                SystemMessage(content="You are a meticulous medical summarizer."),
-                UserMessage(content=prompt)
-            ],
-            model=model_name,
-        )
-        assistant_raw = resp.choices[0].message.content
-        biomarker_mapped_object = json.loads(assistant_raw)
-        return biomarker_mapped_object
+        return await complete_json("clinical_summary", [
+            SystemMessage(content="You are a meticulous medical summarizer."),
+            UserMessage(content=prompt)
+        ], ClinicalSummary)
     except Exception as e:
         logger.error(f"Error in generate clinical summary {e}")
 
 
+# -------------------------------------------------------------------
+# Fan-out clinical summary
+# -------------------------------------------------------------------
+# Instead of one completion producing every section summary plus the action
+# plan, each populated section and the overview (action plan, summary,
+# critical concerns) are asked for separately and concurrently, then merged
+# into the same shape. Each call is cached on its own, so a retry after a
+# partial failure only re-asks what is missing.
+
+CLINICAL_SECTION_PROMPT_VERSION = "1"
+CLINICAL_OVERVIEW_PROMPT_VERSION = "1"
+
+_SECTION_SUMMARY_EXAMPLE = """{"findings":"Fasting glucose, HbA1c and HOMA-IR are at the higher end of normal, indicating early insulin resistance. Leptin is within range.","interpretation":"You are not diabetic, but you are at increased risk for future diabetes."}"""
+
+_OVERVIEW_EXAMPLE = """{
+    "action_plan":{
+        "diet":{"do":["eat vegetables",...],"dont":["stop eating sugar",...],"summary":"Shift toward a Mediterranean-style pattern ...","why_this_matters_for_you":"Your panel shows elevated LDL, ApoB ...","recommended_foods":["Fatty fish (salmon, sardines) – 2–3 meals/week ...",...],"foods_to_limit":["Red & processed meats – cut to ≤1 serve/week ...",...]},
+        "exercise":{"do":[...],"dont":[...],"summary":"...","why_this_matters_for_you":"...","recommended_exercises":[...],"activities_to_limit":[...]},
+        "sleep":{"do":[...],"dont":[...],"summary":"...","why_this_matters_for_you":"...","recommended_sleep":[...],"sleep_hygiene_tips":[...]},
+        "supplement":{"do":[...],"dont":[...],"summary":"...","why_this_matters_for_you":"...","recommended_supplements":[...],"supplements_to_limit":[...]}
+    },
+    "summary":"Your overall blood report suggest that......",
+    "critical_concerns":["your blood sugar is very high consult doctor now......",...],
+    "message":"the range of this biomarker are confusing.."
+}"""
+
+
+def _populated_sections(section_classification_result):
+    return {
+        key: bands for key, bands in (section_classification_result or {}).items()
+        if isinstance(bands, dict) and any(bands.values())
+    }
+
+
+async def _section_summary_call(gender, section, bands, questionnaire):
+    prompt = f"""You're centum blood report summarizer AI.
+    Summarise one section of a blood report, "{section}". Its biomarkers are already classified into optimal, normal and poor.
+    findings: which biomarkers are optimal, normal and poor. interpretation: what this means for the patient, using the patient questionnaire where relevant.
+    user gender : {gender}
+    Section biomarkers : {compact_json(prune_empty(bands))}
+    Patient Questionaries : {compact_json(prune_empty(questionnaire))}
+    The output strictly must be a JSON object with exactly the keys findings and interpretation, with no extra commentary, e.g. {_SECTION_SUMMARY_EXAMPLE}
+    """
+    return await complete_json("clinical_section_summary", [
+        SystemMessage(content="You are a meticulous medical summarizer."),
+        UserMessage(content=prompt)
+    ], SectionSummary)
+
+
+async def _overview_call(gender, sections, questionnaire):
+    prompt = f"""You're centum blood report summarizer AI.
+    The patient's blood report biomarkers are classified into optimal, normal and poor per section of his/her health.
+    Read the patient questionnaire carefully. Give an action_plan with four values diet, exercise, sleep and supplement (do's and dont's),
+    a summary of his/her overall health, the critical_concerns the patient needs to look after (if any), and a message with any issue you faced.
+    user gender : {gender}
+    Blood Report classify data : {compact_json(prune_empty(sections))}
+    Patient Questionaries : {compact_json(prune_empty(questionnaire))}
+    The output strictly must be a JSON object with the keys action_plan, summary, critical_concerns and message, with no extra commentary, e.g.
+    {_OVERVIEW_EXAMPLE}
+    """
+    return await complete_json("clinical_action_plan", [
+        SystemMessage(content="You are a meticulous medical summarizer."),
+        UserMessage(content=prompt)
+    ], ClinicalOverview)
+
+
+async def generate_clinical_summary_fanout(gender, section_classification_result, questionnaire):
+    """
+    Clinical summary from one call per populated section plus one overview
+    call, run concurrently under CLINICAL_SUMMARY_FANOUT_CONCURRENCY with a
+    per-call timeout. Sections whose call fails are left out (and listed in
+    `message`); without the overview there is no usable summary and None is
+    returned, as with a failed single call.
+    """
+    logger.info("generate clinical summary (fan-out) started")
+    sections = _populated_sections(section_classification_result)
+    limit = asyncio.Semaphore(max(1, settings.CLINICAL_SUMMARY_FANOUT_CONCURRENCY))
+
+    async def bounded(label, kind, version, inputs, call):
+        async with limit:
+            try:
+                return await asyncio.wait_for(
+                    cached_llm_response(kind, version, inputs, call),
+                    timeout=settings.CLINICAL_SUMMARY_CALL_TIMEOUT_SECONDS,
+                )
+            except Exception as e:
+                logger.error(f"Clinical summary call for {label} failed: {e!r}")
+                return None
+
+    overview_task = bounded(
+        "action plan", "clinical_action_plan", CLINICAL_OVERVIEW_PROMPT_VERSION,
+        {"gender": gender, "sections": sections, "questionnaire": questionnaire},
+        lambda: _overview_call(gender, sections, questionnaire),
+    )
+    section_tasks = [
+        bounded(
+            section, "clinical_section_summary", CLINICAL_SECTION_PROMPT_VERSION,
+            {"gender": gender, "section": section, "bands": bands, "questionnaire": questionnaire},
+            lambda section=section, bands=bands: _section_summary_call(gender, section, bands, questionnaire),
+        )
+        for section, bands in sections.items()
+    ]
+    overview, *section_results = await asyncio.gather(overview_task, *section_tasks)
+    if not isinstance(overview, dict):
+        logger.error("Clinical summary fan-out failed: no action plan / overview")
+        return None
+
+    section_summary, failed = {}, []
+    for section, result in zip(sections, section_results):
+        if isinstance(result, dict):
+            section_summary[section] = result
+        else:
+            failed.append(section)
+
+    message = overview.get("message") or ""
+    if failed:
+        message = f"{message} Section summaries unavailable: {', '.join(failed)}.".strip()
+    return {
+        "section_summary": section_summary,
+        "action_plan": overview.get("action_plan", {}),
+        "critical_concerns": overview.get("critical_concerns", []),
+        "summary": overview.get("summary", ""),
+        "message": message,
+    }
+
+
 async def classify_by_section(sections_map, results, include_invalid=True, include_missing=False):
     """
     sections_map: dict like your `list` mapping section -> [biomarker keys]
     results: your `output` dict from the classifier
+
+    Uses the shared section index. A report covering much of the catalog is
+    laid out by walking each section's list once; a sparse one by sorting just
+    its own biomarkers' slots. Key views are used for membership, so nothing
+    is copied from the report.
     """
+    index = section_index_for(sections_map)
     # quick handles into the results
-    opt  = set(results.get("good",  {}).keys())
-    norm = set(results.get("normal",   {}).keys())
-    poor = set(results.get("critical",  {}).keys())
-    inv  = set(results.get("invalid_biomarkers",  {}).keys())
+    opt  = results.get("good",  {}).keys()
+    norm = results.get("normal",   {}).keys()
+    poor = results.get("critical",  {}).keys()
+    inv  = results.get("invalid_biomarkers",  {}).keys() if include_invalid else {}.keys()
+
+    def band_of(m):
+        if m in norm:
+            return "normal"
+        if m in opt:
+            return "optimal"
+        if m in poor:
+            return "poor"
+        if m in inv:
+            return "invalid"
+        return None
 
+    dense = (len(opt) + len(norm) + len(poor) + len(inv)) * 4 >= len(index.slot_owner)
     out = {}
-    for section, markers in sections_map.items():
+    for section, meta in index.sections.items():
         bucket = {
             "normal":  [],
             "optimal": [],
@@ -820,39 +1276,83 @@ async def classify_by_section(sections_map, results, include_invalid=True, inclu
         if include_missing:
             bucket["missing"] = []
 
-        for m in markers:
-            if m in norm:
-                bucket["normal"].append(m)
-            elif m in opt:
-                bucket["optimal"].append(m)
-            elif m in poor:
-                bucket["poor"].append(m)
-            elif m in inv and include_invalid:
-                bucket["invalid"].append(m)
-            elif include_missing:
-                bucket["missing"].append(m)
-
+        if dense:
+            for m in meta.biomarkers:
+                if m in norm:
+                    bucket["normal"].append(m)
+                elif m in opt:
+                    bucket["optimal"].append(m)
+                elif m in poor:
+                    bucket["poor"].append(m)
+                elif m in inv:
+                    bucket["invalid"].append(m)
+                elif include_missing:
+                    bucket["missing"].append(m)
+        elif include_missing:
+            bucket["missing"] = [m for m in meta.biomarkers if band_of(m) is None]
         out[section] = bucket
+
+    if not dense:
+        slots = set(chain.from_iterable(map(index.slots.get, chain(norm, opt, poor, inv), repeat(()))))
+        for slot in sorted(slots):
+            section, m = index.slot_owner[slot]
+            out[section][band_of(m)].append(m)
     return out
 
 
+def sex_code(gender: Optional[str]) -> Optional[str]:
+    """Map a stored user gender ("male"/"female") to the range table's "M"/"F" keys."""
+    gender = (gender or "").lower()
+    return "M" if gender == "male" else "F" if gender == "female" else None
+
+
 # Report Generation Pipeline
-async def report_generation_pipeline(gender, age, lab_results, questionaries):
+async def _clinical_summary_by_deadline(gender, section_classification_result, questionaries):
+    """
+    (summary, pending): the LLM summary if it arrives within
+    CLINICAL_SUMMARY_DEADLINE_SECONDS, otherwise (None, the still-running task).
+    """
+    summary_task = asyncio.ensure_future(generate_clinical_summary(gender, section_classification_result, questionaries))
     try:
-        gender = "M" if gender.lower() == "male" else "F" if gender.lower() == "female" else None
-        # llm_mapped_biomarker_obj = await biomarker_mapping_by_llm(lab_results)
+        return await asyncio.wait_for(asyncio.shield(summary_task), timeout=settings.CLINICAL_SUMMARY_DEADLINE_SECONDS), None
+    except asyncio.TimeoutError:
+        logger.warning(f"Clinical summary missed its {settings.CLINICAL_SUMMARY_DEADLINE_SECONDS}s deadline")
+        return None, summary_task
+
+
+async def report_generation_pipeline(gender, age, lab_results, questionaries, fallback=None):
+    """
+    Classify the lab results and summarise them. With the rule-based fallback
+    (CLINICAL_SUMMARY_FALLBACK, or `fallback`), an LLM summary that misses its
+    deadline or fails is replaced by rule_based_clinical_summary; the result
+    then has summary_source "rule_based" and, if the LLM call is still running,
+    its task as pending_summary.
+    """
+    fallback = settings.CLINICAL_SUMMARY_FALLBACK if fallback is None else fallback
+    try:
+        gender = sex_code(gender)
+        lab_results = await map_biomarker_names(lab_results)
 
         classification_result = await classify_report(centum_predefined_ranges, lab_results, sex=gender, age=int(age))
         if not classification_result:
             return None
         
         section_classification_result = await classify_by_section(section_to_biomarkers, classification_result, include_invalid=False, include_missing=False)
-        summry_obj = await generate_clinical_summary(gender, section_classification_result, questionaries)
+        summary_source, pending_summary = "llm", None
+        if fallback:
+            summry_obj, pending_summary = await _clinical_summary_by_deadline(gender, section_classification_result, questionaries)
+            if not summry_obj:
+                summry_obj = rule_based_clinical_summary(classification_result, section_classification_result, gender)
+                summary_source = "rule_based"
+        else:
+            summry_obj = await generate_clinical_summary(gender, section_classification_result, questionaries)
         
         if not summry_obj:
             return None
         
         return {
+            "summary_source" : summary_source,
+            "pending_summary" : pending_summary,
             "counts" : classification_result["counts"],
             "summary" : summry_obj["summary"],
             "critical" : classification_result["critical"],
@@ -0,0 +1,189 @@
+"""
+Deterministic clinical summary built from the classification alone.
+
+Used by report_generation_pipeline when the LLM summary misses its deadline
+or fails, so the report can still be made ready. It has the same shape as the
+LLM summary (section_summary, action_plan, critical_concerns, summary,
+message) and is replaced by the LLM narrative once that is available.
+
+Findings list each populated section's markers by band; critical concerns
+come from the markers in the critical bucket with their value and reference
+range; the action plan combines general advice with advice for the sections
+that have poor markers.
+"""
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional
+
+from data_processing.biomarkers_range import biomarker_with_description
+
+
+RULE_BASED_MESSAGE = (
+    "This summary was generated directly from your results. "
+    "A detailed personalised summary will replace it shortly."
+)
+
+CATEGORIES = ("diet", "exercise", "sleep", "supplement")
+
+# Per category: (do, dont) always given.
+_BASELINE: Mapping[str, tuple] = MappingProxyType({
+    "diet": ("Base meals on vegetables, legumes, whole grains and lean protein", "Rely on ultra-processed foods and sugary drinks"),
+    "exercise": ("Aim for at least 150 minutes of moderate activity a week", "Sit for more than an hour without a movement break"),
+    "sleep": ("Keep a regular sleep schedule with 7-9 hours a night", "Use screens in the hour before bed"),
+    "supplement": ("Discuss any supplement with your doctor before starting it", "Take high-dose supplements without a measured deficiency"),
+})
+
+# Section -> category -> extra "do" advice when the section has poor markers.
+_SECTION_ADVICE: Mapping[str, Mapping[str, str]] = MappingProxyType({
+    "metabolic_and_blood_sugar": MappingProxyType({
+        "diet": "Cut refined carbohydrates and added sugar; pair carbohydrates with protein or fibre",
+        "exercise": "Walk for 10-15 minutes after main meals to improve glucose control",
+        "sleep": "Protect sleep duration; short sleep worsens insulin sensitivity",
+    }),
+    "lipid_and_cardiovascular": MappingProxyType({
+        "diet": "Replace saturated fats with olive oil, nuts and oily fish; add soluble fibre such as oats",
+        "exercise": "Include regular aerobic exercise such as brisk walking, cycling or swimming",
+        "supplement": "Ask your doctor whether omega-3 is appropriate for you",
+    }),
+    "liver_and_detoxification": MappingProxyType({
+        "diet": "Limit alcohol and fructose-sweetened foods and drinks",
+        "exercise": "Combine aerobic and strength training to reduce liver fat",
+    }),
+    "kidney_and_electrolytes": MappingProxyType({
+        "diet": "Stay well hydrated and keep salt intake moderate",
+        "supplement": "Avoid high-dose supplements and regular NSAID use unless prescribed",
+    }),
+    "thyroid": MappingProxyType({
+        "diet": "Include iodine and selenium sources such as fish, eggs and dairy",
+        "sleep": "Note changes in energy and sleep to discuss with your doctor",
+    }),
+    "adernal_and_stress": MappingProxyType({
+        "sleep": "Wind down with a consistent evening routine to support stress hormones",
+        "exercise": "Add restorative activity such as yoga or walking on demanding days",
+    }),
+    "sex_hormones_and_fertility": MappingProxyType({
+        "exercise": "Include strength training two to three times a week",
+        "sleep": "Prioritise 7-9 hours of sleep, which supports hormone balance",
+    }),
+    "nutrient_status": MappingProxyType({
+        "diet": "Eat a varied diet rich in leafy greens, legumes, eggs and fish",
+        "supplement": "Correct measured deficiencies with your doctor's guidance and retest",
+    }),
+    "inflammation_and_immunity": MappingProxyType({
+        "diet": "Favour an anti-inflammatory pattern with vegetables, berries, oily fish and olive oil",
+        "sleep": "Keep sleep regular; poor sleep raises inflammatory markers",
+    }),
+    "blood_health_and_haematology": MappingProxyType({
+        "diet": "Include iron, folate and B12 sources such as lean meat, legumes and leafy greens",
+        "supplement": "Only take iron if a deficiency is confirmed",
+    }),
+    "bone_and_mineral_health": MappingProxyType({
+        "diet": "Get enough calcium from dairy or fortified alternatives",
+        "exercise": "Include weight-bearing and resistance exercise",
+        "supplement": "Ask your doctor about vitamin D if your level is low",
+    }),
+    "advance_metabolic_and_hormonal": MappingProxyType({
+        "diet": "Keep meals regular and balanced, limiting refined carbohydrates",
+    }),
+    "heavy_metals_and_environmental": MappingProxyType({
+        "diet": "Limit large predatory fish high in mercury",
+    }),
+    "fatty_acids": MappingProxyType({
+        "diet": "Eat oily fish two to three times a week",
+        "supplement": "Ask your doctor whether omega-3 is appropriate for you",
+    }),
+})
+
+
+def _title(key: str) -> str:
+    return key.replace("_", " ").capitalize()
+
+
+def _name(key: str) -> str:
+    return biomarker_with_description.get(key, {}).get("name", key.replace("_", " ").title())
+
+
+def _reference(key: str, sex: Optional[str]) -> str:
+    ref = biomarker_with_description.get(key, {})
+    if sex in ("M", "F") and isinstance(ref.get(sex), dict):
+        ref = ref[sex]
+    return ref.get("reference_range", "")
+
+
+def _names(keys: List[str]) -> str:
+    return ", ".join(_name(k) for k in keys)
+
+
+def _section_summary(section: str, bands: Dict[str, List[str]]) -> Dict[str, str]:
+    optimal, normal, poor = bands.get("optimal", []), bands.get("normal", []), bands.get("poor", [])
+    parts = []
+    if optimal:
+        parts.append(f"Optimal: {_names(optimal)}.")
+    if normal:
+        parts.append(f"Within normal range: {_names(normal)}.")
+    if poor:
+        parts.append(f"Outside the recommended range: {_names(poor)}.")
+    total = len(optimal) + len(normal) + len(poor)
+    if not poor:
+        interpretation = f"Your {_title(section).lower()} markers are in range."
+    elif len(poor) * 2 >= total:
+        interpretation = f"Several {_title(section).lower()} markers need attention; review them with your doctor."
+    else:
+        interpretation = f"Most {_title(section).lower()} markers are in range, with {len(poor)} to improve."
+    return {"findings": " ".join(parts), "interpretation": interpretation}
+
+
+def _critical_concerns(critical: Dict[str, Dict[str, Any]], sex: Optional[str]) -> List[str]:
+    concerns = []
+    for key, entry in critical.items():
+        value = entry.get("value")
+        unit = entry.get("expected_unit") or entry.get("unit") or ""
+        reference = _reference(key, sex)
+        measured = f"{value} {unit}".strip() if value is not None else "measured value"
+        detail = f"{measured}; reference {reference} {unit}".strip() if reference else measured
+        concerns.append(f"{_name(key)} is outside the recommended range ({detail}). Discuss this result with your doctor.")
+    return concerns
+
+
+def _action_plan(poor_sections: List[str]) -> Dict[str, Dict[str, Any]]:
+    plan = {}
+    for category in CATEGORIES:
+        do, dont = _BASELINE[category]
+        extra = [_SECTION_ADVICE[s][category] for s in poor_sections if category in _SECTION_ADVICE.get(s, {})]
+        focus = ", ".join(_title(s).lower() for s in poor_sections) or "your overall health"
+        plan[category] = {
+            "do": list(dict.fromkeys(extra + [do])),
+            "dont": [dont],
+            "summary": f"General {category} guidance focused on {focus}.",
+            "why_this_matters_for_you": (
+                f"Your results show markers to improve in {focus}." if poor_sections
+                else "Your results are in range; these habits help keep them there."
+            ),
+        }
+    return plan
+
+
+def rule_based_clinical_summary(
+    classification_result: Dict[str, Any],
+    section_classification_result: Dict[str, Dict[str, List[str]]],
+    sex: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Clinical summary in the LLM output shape, from classify_report / classify_by_section output."""
+    sections = {s: b for s, b in (section_classification_result or {}).items() if isinstance(b, dict) and any(b.values())}
+    poor_sections = [s for s, b in sections.items() if b.get("poor")]
+    counts = classification_result.get("counts", {})
+    critical = classification_result.get("critical", {})
+
+    summary = (
+        f"{counts.get('optimal', 0)} of your markers are optimal, {counts.get('normal', 0)} are within normal range "
+        f"and {counts.get('poor', 0)} are outside the recommended range."
+    )
+    if poor_sections:
+        summary += f" Areas to focus on: {', '.join(_title(s).lower() for s in poor_sections)}."
+
+    return {
+        "section_summary": {s: _section_summary(s, b) for s, b in sections.items()},
+        "action_plan": _action_plan(poor_sections),
+        "critical_concerns": _critical_concerns(critical, sex),
+        "summary": summary,
+        "message": RULE_BASED_MESSAGE,
+    }
@@ -0,0 +1,68 @@
+"""
+Biomarker -> section inverted index.
+
+Classification (classify_by_section) and comparison (compare_by_bands) both
+need to know which section(s) a biomarker belongs to, the section titles and
+the canonical section order. SECTION_INDEX compiles `section_to_biomarkers`
+once at import so both can work from the report's own biomarkers instead of
+walking every section's full marker list.
+"""
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, NamedTuple, Tuple
+
+from data_processing.biomarkers_range import section_to_biomarkers
+
+
+class SectionMeta(NamedTuple):
+    key: str
+    title: str
+    order: int                      # position in the section map
+    biomarkers: Tuple[str, ...]     # in listed order
+
+
+class SectionIndex(NamedTuple):
+    sections: Mapping[str, SectionMeta]             # in section order
+    # Every listing of a biomarker is a "slot", numbered in section order then
+    # listed order, so sorting slot numbers yields the canonical layout.
+    slots: Mapping[str, Tuple[int, ...]]            # biomarker -> its slot numbers
+    slot_owner: Tuple[Tuple[str, str], ...]         # slot number -> (section, biomarker)
+    biomarker_to_section: Mapping[str, str]         # biomarker -> section (last listing wins)
+
+
+def _section_spec(key: str, val: Any) -> Tuple[str, List[str]]:
+    """
+    Title and biomarkers of one section. Supports both shapes used so far:
+    {"title": ..., "tests": [...]} and a plain list of biomarker keys.
+    """
+    if isinstance(val, dict) and "tests" in val:
+        return val.get("title", key), list(val.get("tests", []))
+    return key.replace("_", " ").title(), list(val) if isinstance(val, (list, tuple)) else []
+
+
+def build_section_index(sections_map: Dict[str, Any]) -> SectionIndex:
+    """Compile a section map into an immutable SectionIndex."""
+    sections: Dict[str, SectionMeta] = {}
+    slots: Dict[str, List[int]] = {}
+    slot_owner: List[Tuple[str, str]] = []
+    biomarker_to_section: Dict[str, str] = {}
+    for order, (key, val) in enumerate(sections_map.items()):
+        title, biomarkers = _section_spec(key, val)
+        sections[key] = SectionMeta(key, title, order, tuple(biomarkers))
+        for biomarker in biomarkers:
+            slots.setdefault(biomarker, []).append(len(slot_owner))
+            slot_owner.append((key, biomarker))
+            biomarker_to_section[biomarker] = key
+    return SectionIndex(
+        sections=MappingProxyType(sections),
+        slots=MappingProxyType({b: tuple(ids) for b, ids in slots.items()}),
+        slot_owner=tuple(slot_owner),
+        biomarker_to_section=MappingProxyType(biomarker_to_section),
+    )
+
+
+SECTION_INDEX = build_section_index(section_to_biomarkers)
+
+
+def section_index_for(sections_map: Dict[str, Any]) -> SectionIndex:
+    """The shared index for `section_to_biomarkers`, a freshly built one otherwise."""
+    return SECTION_INDEX if sections_map is section_to_biomarkers else build_section_index(sections_map)
@@ -5,15 +5,15 @@ Version 2.0 - July 2025
 Supports All 16 Biomarker Categories & 100+ Tests
 """
 
-import json
 from typing import Dict, Any
 
-from azure.ai.inference.aio import ChatCompletionsClient
 from azure.ai.inference.models import SystemMessage, UserMessage
-from azure.core.credentials import AzureKeyCredential
 
-from data_processing.biomarkers_range import biomarker_with_name_and_range
-from common.config import settings, logger
+from data_processing.prompt_builder import compact_json, prune_empty, reference_ranges_for_lab_results
+from data_processing.report_genration import sex_code
+from common.config import logger
+from common.llm_json import complete_json
+from models.llm_output import GrokClinicalSummary
 
 
 async def generate_clinical_summary_grok(               # ← step 2a
@@ -38,12 +38,12 @@ async def generate_clinical_summary_grok(               # ← step 2a
             After that also provide me Critical Concers that the patient need to look after(if any).
 
         #  INPUT
-            ## Predefined biomarkers range : {biomarker_with_name_and_range}
+            ## Predefined biomarkers range : {compact_json(reference_ranges_for_lab_results(lab_results, sex_code(gender)))}
 
             ## User Information
                 user gender : {gender}
-                Blood Report : {lab_results}
-                Patient Questionaries : {questionnaire}
+                Blood Report : {compact_json(lab_results)}
+                Patient Questionaries : {compact_json(prune_empty(questionnaire))}
         
         # OUTPUT
             1) The output stricly must be JSON ouput with no extra commentaires or string.
@@ -73,21 +73,10 @@ async def generate_clinical_summary_grok(               # ← step 2a
             ## While generating answer make sure to generate the test name similar to predefiedn biomarkers range. for e.g., if the blood report contains 'FASTING GlUCOSE' it must be converted to 'fasting_glucose' as written in predefined biomarker ranges.
     """
         logger.info("Generating summary using Grok...")
-        endpoint = settings.AZURE_GROK_ENDPOINT
-        model_name = settings.AZURE_GROK_DEPLOYMENT
-        key = settings.AZURE_GROK_API_KEY
-    
-        async with ChatCompletionsClient(endpoint, AzureKeyCredential(key), credential_scopes=["https://cognitiveservices.azure.com/.default"]) as client:
-            resp = await client.complete(
-            messages=[
-                SystemMessage(content="You are a meticulous medical summarizer."),
-                UserMessage(content=prompt)
-            ],
-            model=model_name,
-        )
-        assistant_raw = resp.choices[0].message.content
-    
-        summary_obj = json.loads(assistant_raw)
+        summary_obj = await complete_json("clinical_summary_grok", [
+            SystemMessage(content="You are a meticulous medical summarizer."),
+            UserMessage(content=prompt)
+        ], GrokClinicalSummary)
         logger.info("Summary generated successfully.")
         return summary_obj
     except Exception as e:
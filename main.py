@@ -40,6 +40,13 @@ from common.rate_limiter import limiter
 from common.config import logger
 from slowapi.errors import RateLimitExceeded
 from common.security import EncryptedDatabase
+from common.llm_client import open_llm_client, close_llm_client
+from data_processing.ocr import open_ocr_client, close_ocr_client
+from common.blob_storage import open_blob_storage, close_blob_storage
+from common.llm_cache import CACHE_COLLECTION, install_llm_cache, uninstall_llm_cache
+from common.call_governor import LEASE_COLLECTION, install_call_leases, uninstall_call_leases
+from services.health_assessment_service import ensure_report_comparison_index
+from services.document_service import ensure_document_content_index, open_upload_recovery, close_upload_recovery
 
 
 @asynccontextmanager
@@ -49,8 +56,24 @@ async def lifespan(app: FastAPI):
     raw_db = mongo_client.get_default_database()
     app.state.db = EncryptedDatabase(raw_db, encrypted_collections=["users", "document_uploads", "user_reports"]) 
     # app.state.db = mongo_client.get_default_database()
+    app.state.llm_client = await open_llm_client()
+    app.state.ocr_client = await open_ocr_client()
+    app.state.blob_storage = await open_blob_storage()
+    await install_llm_cache(raw_db[CACHE_COLLECTION])
+    await ensure_report_comparison_index(raw_db["report_comparisons"])
+    await ensure_document_content_index(raw_db["documents"])
+    await open_upload_recovery(app.state.db)
+    if settings.OUTBOUND_LEASE_ENABLED:
+        await install_call_leases(raw_db[LEASE_COLLECTION])
 
     yield
+    await close_upload_recovery()
+    uninstall_call_leases()
+    uninstall_llm_cache()
+    logger.info("Closing LLM client pool...")
+    await close_llm_client()
+    await close_ocr_client()
+    await close_blob_storage()
     logger.info("Closing MongoDB connection...")
     mongo_client.close()
 
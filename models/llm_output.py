@@ -0,0 +1,89 @@
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, RootModel, field_validator
+
+
+# Schemas of the JSON the LLM calls return. Validation is lenient where the
+# model is commonly sloppy (a single string where a list is expected) and
+# keeps any extra keys it adds, so nothing the prompt asked for is lost.
+
+
+def _as_list(v):
+    if v is None:
+        return []
+    if isinstance(v, str):
+        return [v] if v.strip() else []
+    return v
+
+
+class ActionPlanCategory(BaseModel):
+    do: List[str]
+    dont: List[str]
+    summary: str
+    why_this_matters_for_you: str
+
+    class Config:
+        extra = "allow"
+
+    @field_validator("do", "dont", mode="before")
+    @classmethod
+    def coerce_list(cls, v):
+        return _as_list(v)
+
+
+class ActionPlan(BaseModel):
+    diet: ActionPlanCategory
+    exercise: ActionPlanCategory
+    sleep: ActionPlanCategory
+    supplement: ActionPlanCategory
+
+    class Config:
+        extra = "allow"
+
+
+class SectionSummary(BaseModel):
+    findings: str
+    interpretation: str
+
+    class Config:
+        extra = "allow"
+
+
+class ClinicalOverview(BaseModel):
+    action_plan: ActionPlan
+    summary: str
+    critical_concerns: List[str] = []
+    message: Optional[str] = ""
+
+    class Config:
+        extra = "allow"
+
+    @field_validator("critical_concerns", mode="before")
+    @classmethod
+    def coerce_concerns(cls, v):
+        return _as_list(v)
+
+
+class ClinicalSummary(ClinicalOverview):
+    section_summary: Dict[str, SectionSummary]
+
+
+class GrokClinicalSummary(BaseModel):
+    good: Dict[str, Any] = {}
+    normal: Dict[str, Any] = {}
+    critical: Dict[str, Any] = {}
+    invalid_biomarkers: Dict[str, Any] = {}
+    action_plan: Dict[str, Any]
+    summary: str
+    critical_concerns: List[str] = []
+
+    class Config:
+        extra = "allow"
+
+    @field_validator("critical_concerns", mode="before")
+    @classmethod
+    def coerce_concerns(cls, v):
+        return _as_list(v)
+
+
+class BiomarkerNameMapping(RootModel[Dict[str, Optional[str]]]):
+    pass
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, Query, BackgroundTasks
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from pydantic import BaseModel
 from common.db import get_db
-from services.admin.admin_console_service import admin_dashboard_console, get_all_users, get_list_of_user_reports, get_failed_reports_with_user_details, retry_user_report_generation, get_all_faqs, create_general_faq, update_general_faq, delete_general_faq, publish_general_faq, unpublish_general_faq, waitlist_data, get_waitlist_subscription_by_id, bulk_retry_user_report_generation
+from services.admin.admin_console_service import admin_dashboard_console, get_all_users, get_list_of_user_reports, get_failed_reports_with_user_details, retry_user_report_generation, get_all_faqs, create_general_faq, update_general_faq, delete_general_faq, publish_general_faq, unpublish_general_faq, waitlist_data, get_waitlist_subscription_by_id, bulk_retry_user_report_generation, start_report_reclassification, get_report_reclassification_status, start_band_vector_backfill, get_band_vector_backfill_status, get_llm_cache_stats, get_canonicalization_cache_stats, get_llm_usage_stats, get_outbound_call_stats, upgrade_rule_based_summaries, get_upload_dedup_stats
 from common.admin.admin_dependencies import get_current_admin_user
 from models.faqs import FAQCreate, FAQUpdate
 from typing import Optional, List
@@ -44,6 +44,69 @@ async def retry_report_generation(
 async def retry_report_generation(report_id: str, background_tasks: BackgroundTasks, db: AsyncIOMotorDatabase = Depends(get_db)):
     return await retry_user_report_generation(db, report_id, background_tasks)
 
+@router.post("/reclassify-reports")
+async def reclassify_reports(
+    background_tasks: BackgroundTasks,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    dry_run: bool = Query(False, description="Compute the band diff without writing to user_reports"),
+    resume: bool = Query(True, description="Continue an unfinished run from its checkpoint"),
+    batch_size: int = Query(200, ge=1, le=1000),
+):
+    return await start_report_reclassification(db, dry_run, resume, batch_size, background_tasks)
+
+
+@router.get("/reclassify-reports/status")
+async def reclassify_reports_status(db: AsyncIOMotorDatabase = Depends(get_db)):
+    return await get_report_reclassification_status(db)
+
+
+@router.post("/backfill-band-vectors")
+async def backfill_band_vectors(
+    background_tasks: BackgroundTasks,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    batch_size: int = Query(500, ge=1, le=2000),
+):
+    return await start_band_vector_backfill(db, batch_size, background_tasks)
+
+
+@router.post("/upgrade-summaries")
+async def upgrade_summaries(
+    background_tasks: BackgroundTasks,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    limit: int = Query(100, ge=1, le=1000, description="Oldest rule-based summaries to upgrade"),
+):
+    return await upgrade_rule_based_summaries(db, limit, background_tasks)
+
+
+@router.get("/backfill-band-vectors/status")
+async def backfill_band_vectors_status(db: AsyncIOMotorDatabase = Depends(get_db)):
+    return await get_band_vector_backfill_status(db)
+
+
+@router.get("/llm-cache/stats")
+async def llm_cache_stats():
+    return await get_llm_cache_stats()
+
+
+@router.get("/canonicalization-cache/stats")
+async def canonicalization_cache_stats():
+    return await get_canonicalization_cache_stats()
+
+
+@router.get("/llm-usage/stats")
+async def llm_usage_stats():
+    return await get_llm_usage_stats()
+
+
+@router.get("/outbound-calls/stats")
+async def outbound_call_stats():
+    return await get_outbound_call_stats()
+
+
+@router.get("/uploads/dedup-stats")
+async def upload_dedup_stats():
+    return await get_upload_dedup_stats()
+
 @router.get("/faq")
 async def read_all_faqs(
     # category: Optional[str] = Query(None, description="Filter FAQs by category"),
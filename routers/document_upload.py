@@ -1,10 +1,11 @@
 from importlib.metadata import files
-from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Form
+from fastapi import APIRouter, BackgroundTasks, File, UploadFile, HTTPException, Depends, Form, Query
 from typing import List
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from common.jwt_auth import get_current_user
 from models.document import DocumentMetadata, DocumentResponse
-from services.document_service import upload_documents, get_documents, get_secure_blob_file_url
+from services.document_service import upload_documents, upload_documents_async, get_documents, get_secure_blob_file_url
+from services.document_status_service import get_document_statuses, stream_document_statuses
 from common.db import get_db
 
 router = APIRouter(prefix="/documents", tags=["Documents"])
@@ -23,6 +24,41 @@ async def upload_document(
     return await upload_documents(user_id,db ,files=files, report_category=report_category, report_title=report_title, report_date=report_date, report_notes=report_notes)
 
 
+# Store the documents and return 202 with their ids; OCR runs in the background
+@router.post("/upload-async", status_code=202)
+async def upload_document_async(
+    background_tasks: BackgroundTasks,
+    user_id=Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    files: List[UploadFile] = File(...),
+    report_category: str = Form(...),
+    report_title: str = Form(...),
+    report_date: str = Form(...),
+    report_notes: str | None = Form(None),
+):
+    return await upload_documents_async(user_id, db, background_tasks, files=files, report_category=report_category, report_title=report_title, report_date=report_date, report_notes=report_notes)
+
+
+# Processing status of uploaded documents (pending / ready / failed)
+@router.get("/status")
+async def get_documents_status(
+    ids: List[str] = Query(...),
+    user_id=Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    return await get_document_statuses(db, user_id, ids)
+
+
+# Processing status of uploaded documents over Server-Sent Events, until none is pending
+@router.get("/status/stream")
+async def stream_documents_status(
+    ids: List[str] = Query(...),
+    user_id=Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    return await stream_document_statuses(db, user_id, ids)
+
+
 # Get the documents of user
 @router.get("/get-documents", response_model=List[DocumentResponse])
 async def get_user_documents(
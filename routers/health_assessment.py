@@ -1,12 +1,14 @@
-from typing import List
-from fastapi import APIRouter, Depends, BackgroundTasks
+from typing import List, Optional
+from fastapi import APIRouter, Depends, BackgroundTasks, Header
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
 from models.health_assessment import SaveStepRequest, CompareRequest, VO2MaxUpdate
 from common.jwt_auth import get_current_user
 from common.db import get_db
 from services.health_assessment_service import (create_report, save_health_assessment_step,
-         get_user_reports, get_user_report_details, get_health_assessment_form_step, dashboard_data, compare_two_reports, update_vo2_max_value)
+         get_user_reports, get_user_report_details, get_health_assessment_form_step, dashboard_data, compare_two_reports, update_vo2_max_value,
+         get_range_table_version)
+from services.comparison_stream_service import stream_compare_two_reports
 
 
 router = APIRouter(prefix="/health-assessment", tags=["Health Assessment"])
@@ -55,7 +57,19 @@ async def compare_user_reports(compare: CompareRequest, db: AsyncIOMotorDatabase
     return await compare_two_reports(db, user_id, compare.report_id_1, compare.report_id_2)
 
 
+# Server-Sent Events variant; GET so EventSource clients can (re)connect with Last-Event-ID
+@router.get("/compare-user-reports/stream")
+async def compare_user_reports_stream(report_id_1: str, report_id_2: str, db: AsyncIOMotorDatabase = Depends(get_db),
+    user_id: dict = Depends(get_current_user), last_event_id: Optional[str] = Header(None)):
+    return await stream_compare_two_reports(db, user_id, report_id_1, report_id_2, last_event_id)
+
+
 @router.patch("/vo2-max")
 async def update_vo2_max(vo2_max: VO2MaxUpdate, db: AsyncIOMotorDatabase = Depends(get_db),
     user_id: dict = Depends(get_current_user)):
     return await update_vo2_max_value(db, user_id, vo2_max.vo2_max)
+
+
+@router.get("/range-table-version")
+async def range_table_version(if_none_match: Optional[str] = Header(None)):
+    return await get_range_table_version(if_none_match)
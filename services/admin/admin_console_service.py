@@ -6,7 +6,16 @@ from common.config import logger
 from typing import List, Optional
 from bson import ObjectId
 from fastapi import BackgroundTasks
-from services.health_assessment_service import generate_and_upsert_clinical_summary
+from services.health_assessment_service import generate_and_upsert_clinical_summary, upgrade_report_summary
+from services.report_reclassification_service import (
+    JOB_COLLECTION, JOB_ID, claim_reclassification_job, run_reclassification_job
+)
+from services import band_vector_backfill_service
+from common.llm_cache import llm_cache_info
+from data_processing.report_genration import canonicalization_cache_info
+from common.llm_client import llm_usage_info
+from common.call_governor import outbound_call_info
+from services.document_service import upload_dedup_info
 # from models.faqs import FAQCreate, FAQInDB, FAQUpdate, FAQStatus
 from models.faqs import FAQCreate, FAQUpdate, FAQStatus
 from datetime import datetime, timezone
@@ -309,6 +318,30 @@ async def retry_user_report_generation(db: AsyncIOMotorDatabase, report_id: str,
         )
 
 
+# Upgrade rule-based report summaries to the LLM summary
+async def upgrade_rule_based_summaries(db: AsyncIOMotorDatabase, limit: int, background_tasks: BackgroundTasks):
+    try:
+        reports = await db.user_reports.find(
+            {"status": "ready", "summary_upgradable": True},
+            {"_id": 1, "user_id": 1},
+            sort=[("updated_at", 1)],
+            limit=limit
+        )
+        for report in reports:
+            background_tasks.add_task(upgrade_report_summary, db, report["user_id"], report["_id"])
+        logger.info(f"Summary upgrade queued for {len(reports)} reports.")
+        return JSONResponse(
+            content={"data": {"queued": len(reports)}, "message": "Summary upgrade started."},
+            status_code=status.HTTP_200_OK
+        )
+    except Exception as e:
+        logger.error(f"Error starting summary upgrade: {e}")
+        return JSONResponse(
+            content={"message": "Failed to start summary upgrade."},
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
 # Admin dashboard
 async def admin_dashboard_console(db: AsyncIOMotorDatabase):
     try:
@@ -791,4 +824,167 @@ async def bulk_retry_user_report_generation(db: AsyncIOMotorDatabase, report_ids
             "results": results
         },
         status_code=status.HTTP_200_OK
-    )
\ No newline at end of file
+    )
+
+
+# Recompute stored biomarker buckets after a range table change (no OCR / LLM)
+async def start_report_reclassification(db: AsyncIOMotorDatabase, dry_run: bool, resume: bool, batch_size: int, background_tasks: BackgroundTasks):
+    try:
+        state = await claim_reclassification_job(db, dry_run=dry_run, resume=resume)
+        if state is None:
+            return JSONResponse(
+                content={"message": "Report reclassification is already running."},
+                status_code=status.HTTP_409_CONFLICT
+            )
+
+        background_tasks.add_task(run_reclassification_job, db, state, batch_size)
+        return JSONResponse(
+            content={
+                "message": "Report reclassification started." if not state["processed"] else "Report reclassification resumed.",
+                "dry_run": dry_run,
+                "processed": state["processed"],
+            },
+            status_code=status.HTTP_202_ACCEPTED
+        )
+    except Exception as e:
+        logger.error(f"Error starting report reclassification: {e}")
+        return JSONResponse(
+            content={"message": "Failed to start report reclassification."},
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+async def get_report_reclassification_status(db: AsyncIOMotorDatabase):
+    try:
+        job = await db[JOB_COLLECTION].find_one({"_id": JOB_ID}, {"_id": 0})
+        if not job:
+            return JSONResponse(content={"message": "Report reclassification has not been run."}, status_code=status.HTTP_404_NOT_FOUND)
+
+        return JSONResponse(
+            content=jsonable_encoder({"data": job, "message": "Report reclassification status fetched successfully."}, custom_encoder={ObjectId: str}),
+            status_code=status.HTTP_200_OK
+        )
+    except Exception as e:
+        logger.error(f"Error fetching report reclassification status: {e}")
+        return JSONResponse(
+            content={"message": "Failed to fetch report reclassification status."},
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+# Encode the compact band vector on reports stored without one (or with an older layout)
+async def start_band_vector_backfill(db: AsyncIOMotorDatabase, batch_size: int, background_tasks: BackgroundTasks):
+    try:
+        state = await band_vector_backfill_service.claim_band_vector_backfill(db)
+        if state is None:
+            return JSONResponse(
+                content={"message": "Band vector backfill is already running."},
+                status_code=status.HTTP_409_CONFLICT
+            )
+
+        background_tasks.add_task(band_vector_backfill_service.run_band_vector_backfill, db, state, batch_size)
+        return JSONResponse(
+            content={"message": "Band vector backfill started.", "layout": state["layout"]},
+            status_code=status.HTTP_202_ACCEPTED
+        )
+    except Exception as e:
+        logger.error(f"Error starting band vector backfill: {e}")
+        return JSONResponse(
+            content={"message": "Failed to start band vector backfill."},
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+async def get_band_vector_backfill_status(db: AsyncIOMotorDatabase):
+    try:
+        job = await db[band_vector_backfill_service.JOB_COLLECTION].find_one(
+            {"_id": band_vector_backfill_service.JOB_ID}, {"_id": 0}
+        )
+        if not job:
+            return JSONResponse(content={"message": "Band vector backfill has not been run."}, status_code=status.HTTP_404_NOT_FOUND)
+
+        return JSONResponse(
+            content=jsonable_encoder({"data": job, "message": "Band vector backfill status fetched successfully."}, custom_encoder={ObjectId: str}),
+            status_code=status.HTTP_200_OK
+        )
+    except Exception as e:
+        logger.error(f"Error fetching band vector backfill status: {e}")
+        return JSONResponse(
+            content={"message": "Failed to fetch band vector backfill status."},
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+# Hit/miss counters of the LLM response cache (since process start)
+async def get_llm_cache_stats():
+    try:
+        return JSONResponse(
+            content={"data": llm_cache_info(), "message": "LLM cache stats fetched successfully."},
+            status_code=status.HTTP_200_OK
+        )
+    except Exception as e:
+        logger.error(f"Error fetching LLM cache stats: {e}")
+        return JSONResponse(
+            content={"message": "Failed to fetch LLM cache stats."},
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+# Hit/miss counters of the unit and biomarker name canonicalization caches (since process start)
+async def get_canonicalization_cache_stats():
+    try:
+        return JSONResponse(
+            content={"data": canonicalization_cache_info(), "message": "Canonicalization cache stats fetched successfully."},
+            status_code=status.HTTP_200_OK
+        )
+    except Exception as e:
+        logger.error(f"Error fetching canonicalization cache stats: {e}")
+        return JSONResponse(
+            content={"message": "Failed to fetch canonicalization cache stats."},
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+# Prompt/completion token counts and latency per LLM call kind (since process start)
+async def get_llm_usage_stats():
+    try:
+        return JSONResponse(
+            content={"data": llm_usage_info(), "message": "LLM usage stats fetched successfully."},
+            status_code=status.HTTP_200_OK
+        )
+    except Exception as e:
+        logger.error(f"Error fetching LLM usage stats: {e}")
+        return JSONResponse(
+            content={"message": "Failed to fetch LLM usage stats."},
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+# Queue depth, wait times, retries and throttles of the Grok / Document Intelligence governors
+async def get_outbound_call_stats():
+    try:
+        return JSONResponse(
+            content={"data": outbound_call_info(), "message": "Outbound call stats fetched successfully."},
+            status_code=status.HTTP_200_OK
+        )
+    except Exception as e:
+        logger.error(f"Error fetching outbound call stats: {e}")
+        return JSONResponse(
+            content={"message": "Failed to fetch outbound call stats."},
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+# Uploads answered from an earlier copy of the same file: bytes, OCR calls and blob writes saved
+async def get_upload_dedup_stats():
+    try:
+        return JSONResponse(
+            content={"data": upload_dedup_info(), "message": "Upload deduplication stats fetched successfully."},
+            status_code=status.HTTP_200_OK
+        )
+    except Exception as e:
+        logger.error(f"Error fetching upload deduplication stats: {e}")
+        return JSONResponse(
+            content={"message": "Failed to fetch upload deduplication stats."},
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
@@ -0,0 +1,54 @@
+"""
+Backfill of the compact band vector on stored reports.
+
+Encodes the stored good/normal/critical/invalid buckets of every ready
+user_reports document whose band_vector is missing or written with an older
+layout (see data_processing.band_vector). Nothing is reclassified. Encoded
+reports drop out of the query, so an interrupted run simply continues where it
+stopped when started again.
+"""
+from typing import Any, Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+from common.config import logger
+from data_processing.band_vector import BAND_FIELDS, BAND_LAYOUT, encode_band_vector
+from services.report_batch_job import claim_job, new_job_state, run_job
+
+
+JOB_COLLECTION = "band_vector_backfill_jobs"
+JOB_ID = "backfill_band_vectors"
+DEFAULT_BATCH_SIZE = 500
+
+REPORT_PROJECTION = {field: 1 for field in BAND_FIELDS}
+
+
+async def claim_band_vector_backfill(db: AsyncIOMotorDatabase) -> Optional[Dict[str, Any]]:
+    """Claim the job document and return the state to run with, or None if another run is in progress."""
+    return await claim_job(db, JOB_COLLECTION, JOB_ID, lambda previous, now: new_job_state(now, layout=BAND_LAYOUT.version))
+
+
+async def run_band_vector_backfill(db: AsyncIOMotorDatabase, state: Dict[str, Any], batch_size: int = DEFAULT_BATCH_SIZE):
+    """
+    Stream ready reports without a current band vector in `_id` order and write
+    the encoded vectors with one bulk_write per batch, checkpointing progress on
+    the job document after every batch.
+    """
+    reports_collection = db["user_reports"]
+
+    async def encode(docs: List[Dict[str, Any]]):
+        await reports_collection.bulk_write(
+            [UpdateOne({"_id": doc["_id"]}, {"$set": {"band_vector": encode_band_vector(doc)}}) for doc in docs],
+            ordered=False
+        )
+
+    logger.info(f"Band vector backfill started (layout={BAND_LAYOUT.version}, batch_size={batch_size})")
+    await run_job(
+        db, JOB_COLLECTION, JOB_ID, "Band vector backfill", state,
+        query={"status": "ready", "band_vector.layout": {"$ne": BAND_LAYOUT.version}},
+        projection=REPORT_PROJECTION,
+        batch_size=batch_size,
+        process_batch=encode,
+        progress=lambda st: f"Band vectors written for {st['processed']} reports ({st['reports_per_sec']} reports/s)",
+    )
@@ -0,0 +1,157 @@
+"""
+Comparison summaries streamed over Server-Sent Events.
+
+The summary for a report pair is generated by one producer task per process,
+independent of any single connection: it buffers the model's deltas, and every
+connection for the pair follows that buffer. A client that drops and
+reconnects with `Last-Event-ID` while the summary is still being written is
+replayed from where it left off; a client that disconnects for good does not
+stop the generation. When the text is complete it is persisted to
+report_comparisons and the LLM response cache, so requests after that are
+answered from storage with a single `summary` event.
+
+Events:
+    delta    {"text": ...}            id = delta number
+    summary  {"summary": ..., "cached": true}
+    done     {"summary": ...}         full text after the last delta
+    error    {"message": ...}
+"""
+import asyncio
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from fastapi import status
+from fastapi.responses import JSONResponse, StreamingResponse
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from common.config import logger
+from common.sse import SSE_HEADERS, STREAM_RETRY_MS, sse_event
+from common.llm_cache import get_cached_llm_response, store_llm_response
+from data_processing.report_compare import COMPARISON_SUMMARY_PROMPT_VERSION, stream_comparison_summary_using_grok
+from services.health_assessment_service import (
+    comparison_range_table_versions, find_stored_comparison, load_reports_for_comparison,
+    run_report_comparison, save_report_comparison,
+)
+
+
+class _SummaryStream:
+    """Deltas of one summary being generated, shared by every connection following it."""
+
+    def __init__(self):
+        self.deltas: List[str] = []
+        self.finished = False
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Condition()
+
+    async def publish(self, delta: str):
+        async with self._changed:
+            self.deltas.append(delta)
+            self._changed.notify_all()
+
+    async def finish(self, error: Optional[str] = None):
+        async with self._changed:
+            self.error = error
+            self.finished = True
+            self._changed.notify_all()
+
+    async def follow(self, start: int) -> AsyncIterator[Tuple[int, str]]:
+        """(delta number, delta) from `start` on, until the stream finishes."""
+        i = start
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: len(self.deltas) > i or self.finished)
+                pending, finished = self.deltas[i:], self.finished
+            for delta in pending:
+                yield i, delta
+                i += 1
+            if finished and i >= len(self.deltas):
+                return
+
+
+_streams: Dict[Tuple[str, ObjectId, ObjectId], _SummaryStream] = {}
+
+
+async def _single_summary(summary: str) -> AsyncIterator[str]:
+    yield sse_event("summary", {"summary": summary, "cached": True})
+    yield sse_event("done", {"summary": summary})
+
+
+async def _relay(stream: _SummaryStream, start: int) -> AsyncIterator[str]:
+    yield f"retry: {STREAM_RETRY_MS}\n\n"
+    async for i, delta in stream.follow(start):
+        yield sse_event("delta", {"text": delta}, i)
+    if stream.error:
+        yield sse_event("error", {"message": stream.error})
+    else:
+        yield sse_event("done", {"summary": "".join(stream.deltas)})
+
+
+async def _produce(key, stream: _SummaryStream, db: AsyncIOMotorDatabase, result: Dict, range_table_versions: List[Optional[str]]):
+    user_id, r1, r2 = key
+    try:
+        async for delta in stream_comparison_summary_using_grok(result):
+            await stream.publish(delta)
+        summary = "".join(stream.deltas)
+        if not summary:
+            raise ValueError("empty summary")
+        # Persist before finishing, so a reconnect after the end finds it stored.
+        await store_llm_response("comparison_summary", COMPARISON_SUMMARY_PROMPT_VERSION, result, summary)
+        await save_report_comparison(db, user_id, r1, r2, summary, range_table_versions)
+        logger.info("Reports compared successfully (streamed).")
+        await stream.finish()
+    except Exception as e:
+        logger.error(f"Error streaming comparison summary for reports {r1} and {r2}: {e}")
+        await stream.finish(error="Failed to generate comparison summary.")
+    finally:
+        _streams.pop(key, None)
+
+
+def _start_index(last_event_id: Optional[str]) -> int:
+    try:
+        return int(last_event_id) + 1 if last_event_id is not None else 0
+    except ValueError:
+        return 0
+
+
+# Compare two reports, streaming the summary as it is written
+async def stream_compare_two_reports(db: AsyncIOMotorDatabase, user_id: str, report_id_1: str, report_id_2: str,
+                                     last_event_id: Optional[str] = None):
+    try:
+        logger.info("Streaming comparison between two reports started...")
+
+        # Always sort the reports so order does not matter
+        r1, r2 = sorted([ObjectId(report_id_1), ObjectId(report_id_2)], key=lambda x: str(x))
+        key = (str(user_id), r1, r2)
+
+        # Reconnect to a summary still being written
+        stream = _streams.get(key)
+        if stream is not None:
+            return StreamingResponse(_relay(stream, _start_index(last_event_id)), media_type="text/event-stream", headers=SSE_HEADERS)
+
+        reports = await load_reports_for_comparison(db, user_id, r1, r2)
+        if not reports:
+            return JSONResponse(content={"message": "Reports not found."}, status_code=status.HTTP_404_NOT_FOUND)
+
+        range_table_versions = comparison_range_table_versions(reports, r1, r2)
+        stored_summary = await find_stored_comparison(db, user_id, r1, r2, range_table_versions)
+        if stored_summary is not None:
+            return StreamingResponse(_single_summary(stored_summary), media_type="text/event-stream", headers=SSE_HEADERS)
+
+        result = await run_report_comparison(reports)
+        cached_summary = await get_cached_llm_response("comparison_summary", COMPARISON_SUMMARY_PROMPT_VERSION, result)
+        if cached_summary:
+            await save_report_comparison(db, user_id, r1, r2, cached_summary, range_table_versions)
+            return StreamingResponse(_single_summary(cached_summary), media_type="text/event-stream", headers=SSE_HEADERS)
+
+        # Another request may have started the same summary while this one was reading.
+        stream = _streams.get(key)
+        if stream is None:
+            stream = _streams[key] = _SummaryStream()
+            stream.task = asyncio.create_task(_produce(key, stream, db, result, range_table_versions))
+        return StreamingResponse(_relay(stream, 0), media_type="text/event-stream", headers=SSE_HEADERS)
+
+    except Exception as e:
+        logger.error(f"Error streaming report comparison: {e}")
+        return JSONResponse(content={"message": "Failed to compare reports."},
+                            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
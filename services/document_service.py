@@ -274,21 +274,22 @@
 #         logger.error("Error in get_secure_blob_file_url: {e}")
 #         return JSONResponse(content={"message": "Error generating SAS token."}, status_code=500)
 
+import asyncio
+import hashlib
 import os
 import uuid
 import json
-from datetime import datetime, timezone, timedelta
-from typing import List
-from fastapi import UploadFile, HTTPException, File, status
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from fastapi import BackgroundTasks, UploadFile, HTTPException, File, status
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from models.document import DocumentMetadata
-from common.utils import upload_to_azure_blob
+from common.blob_storage import blob_storage
 from fastapi.responses import JSONResponse
 from bson import json_util, ObjectId
 from data_processing.ocr import analyze_report
+from services.document_status_service import notify_document_status
 from common.config import logger, settings
-from azure.storage.blob import generate_blob_sas, BlobSasPermissions
-from io import BytesIO
 from PyPDF2 import PdfReader
 
 
@@ -303,6 +304,9 @@ ALLOWED_CONTENT_TYPES = {
 MAX_FILE_SIZE_MB = 5  # 5MB limit
 MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024  # Convert MB to Bytes
 MAX_FILES_ALLOWED = 5  # Maximum files allowed
+UPLOAD_CHUNK_BYTES = 1024 * 1024  # Read size of the single pass over an upload
+PDF_MAGIC = b"%PDF-"
+PDF_HEADER_WINDOW = 1024  # The PDF header may follow up to this many bytes of leading junk
 
 
 # Helper function to validate file size
@@ -317,78 +321,133 @@ def format_file_size(size_in_bytes: int) -> str:
         return f"{size_in_bytes / (1024 ** 3):.2f} GB"
 
 
-async def upload_documents(
+# Uploads answered from an earlier copy of the same file, since the process started
+_dedup_stats = {"deduplicated_files": 0, "deduplicated_bytes": 0, "ocr_calls_avoided": 0, "blob_writes_avoided": 0}
+
+
+def _record_dedup(size: int):
+    _dedup_stats["deduplicated_files"] += 1
+    _dedup_stats["deduplicated_bytes"] += size
+    _dedup_stats["ocr_calls_avoided"] += 1
+    _dedup_stats["blob_writes_avoided"] += 1
+
+
+def upload_dedup_info() -> dict:
+    """Counters of the content-hash deduplication of uploads in this process."""
+    return dict(_dedup_stats)
+
+
+async def ensure_document_content_index(collection):
+    """Index behind the per-user content-hash lookup. Call from the lifespan."""
+    try:
+        await collection.create_index([("user_id", 1), ("content_sha256", 1)])
+    except Exception as e:
+        logger.warning(f"Could not ensure the documents content index: {e}")
+
+
+# Latest document of this user with the same content whose OCR succeeded. Only the user's own documents are considered.
+async def _find_processed_copy(db: AsyncIOMotorDatabase, user_id: str, content_sha256: str):
+    docs = await db.documents.find(
+        {"user_id": ObjectId(user_id), "content_sha256": content_sha256, "status": "ready", "lab_results": {"$exists": True}},
+        {"path": 1, "blob_name": 1, "lab_results": 1, "deduplicated_from": 1},
+    ).sort("_id", -1).limit(1).to_list(length=1)
+    return docs[0] if docs else None
+
+
+class _UploadRejected(Exception):
+    """A file of the upload failed validation; the message is returned to the client."""
+
+
+# Single pass over one uploaded file: enforces the size limit, hashes it, sniffs the PDF header
+# and writes it to local_path (the copy OCR reads). Returns (size, sha256 hex digest).
+async def _spool_upload(file: UploadFile, local_path: str):
+    digest = hashlib.sha256()
+    size = 0
+    head = b""
+    with open(local_path, "wb") as buffer:
+        while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+            size += len(chunk)
+            if size > MAX_FILE_SIZE_BYTES:
+                raise _UploadRejected(f"File exceeds max allowed size of {MAX_FILE_SIZE_MB} MB")
+            if len(head) < PDF_HEADER_WINDOW:
+                head += chunk[:PDF_HEADER_WINDOW - len(head)]
+                if len(head) == PDF_HEADER_WINDOW and PDF_MAGIC not in head:
+                    raise _UploadRejected(f"File '{file.filename}' appears to be corrupted or unreadable.")
+            digest.update(chunk)
+            buffer.write(chunk)
+    if size == 0:
+        raise _UploadRejected("Empty file is not allowed")
+    if PDF_MAGIC not in head:
+        raise _UploadRejected(f"File '{file.filename}' appears to be corrupted or unreadable.")
+    return size, digest.hexdigest()
+
+
+def _remove_files(paths: List[str]):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Could not remove local upload copy {path}: {e}")
+
+
+# Documents of an upload that did not complete are marked failed, so nothing waits on them
+async def _abandon_documents(db: AsyncIOMotorDatabase, document_ids: List[ObjectId], reason: str):
+    if not document_ids:
+        return
+    try:
+        await db.documents.update_many(
+            {"_id": {"$in": document_ids}, "status": "pending"},
+            {"$set": {"status": "failed", "message": reason, "updated_at": datetime.now(timezone.utc)}}
+        )
+    except Exception as e:
+        logger.error(f"Could not mark abandoned documents failed: {e}")
+
+
+# Validate and store the uploaded files: local copy for OCR, blob, and a pending documents entry each.
+# Returns (document_ids, local_paths, None), or (None, None, error response) for the first file that is
+# rejected. On any failure the local copies written so far are removed.
+async def _store_documents(
     user_id: str,
     db: AsyncIOMotorDatabase,
     report_category: str,
     report_title: str,
     report_date: str,
-    report_notes: str | None = None,
-    files: List[UploadFile] = File(...),
+    report_notes: str | None,
+    files: List[UploadFile],
 ):
-    try:
-        if len(files) > MAX_FILES_ALLOWED:
-            return JSONResponse(
-                content={"message": f"You can only upload up to {MAX_FILES_ALLOWED} files at a time"},
-                status_code=status.HTTP_400_BAD_REQUEST
-            )
+    if len(files) > MAX_FILES_ALLOWED:
+        return None, None, JSONResponse(
+            content={"message": f"You can only upload up to {MAX_FILES_ALLOWED} files at a time"},
+            status_code=status.HTTP_400_BAD_REQUEST
+        )
 
-        document_ids = []
+    document_ids = []
+    local_paths = []
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+    try:
         for file in files:
             if file.content_type not in ALLOWED_CONTENT_TYPES:
-                return JSONResponse(
-                    content={"message": "Invalid file type"},
-                    status_code=status.HTTP_400_BAD_REQUEST
-                )
-
-            # Read and validate file size
-            file.file.seek(0, os.SEEK_END)
-            file_size = file.file.tell()
-            file.file.seek(0)
-
-            if file_size == 0:
-                return JSONResponse(
-                    content={"message": "Empty file is not allowed"},
-                    status_code=status.HTTP_400_BAD_REQUEST
-                )
-            if file_size > MAX_FILE_SIZE_BYTES:
-                return JSONResponse(
-                    content={"message": f"File exceeds max allowed size of {MAX_FILE_SIZE_MB} MB"},
-                    status_code=status.HTTP_400_BAD_REQUEST
-                )
-
-            file_bytes = await file.read()
-            file_stream = BytesIO(file_bytes)
-            # check corrupted file 
-            # Optional: check corruption
-            try:
-                if file.content_type == "application/pdf":
-                    PdfReader(file_stream).pages[0]
-                file_stream.seek(0)
-            except Exception as e:
-                logger.error(f"Corrupted PDF: {file.filename} → {e}")
-                return JSONResponse(
-                    content={"message": f"File '{file.filename}' appears to be corrupted or unreadable."},
-                    status_code=status.HTTP_400_BAD_REQUEST
-                )
+                raise _UploadRejected("Invalid file type")
 
             # Generate unique filename
             extension = os.path.splitext(file.filename)[1]
             unique_filename = f"{uuid.uuid4()}{extension}"
-            container_name = settings.AZURE_STORAGE_CONTAINER_NAME
 
-            # 📂 Save local copy (temporary)
+            # 📂 Local copy (temporary) written while validating and hashing
             local_path = os.path.join(UPLOAD_DIR, unique_filename)
-            os.makedirs(UPLOAD_DIR, exist_ok=True)
-            blob_name = f"{user_id}/{unique_filename}"
+            local_paths.append(local_path)
+            file_size, content_sha256 = await _spool_upload(file, local_path)
 
-            with open(local_path, "wb") as buffer:
-                buffer.write(file_bytes)
-            file.file.seek(0)  # Reset pointer
-            
-            # Upload to Azure Blob
-            blob_url = await upload_to_azure_blob(file, container_name, blob_name)
+            # check corrupted file: the reader seeks in the local copy, only the trailer and first page are read
+            try:
+                with open(local_path, "rb") as local_file:
+                    PdfReader(local_file).pages[0]
+            except Exception as e:
+                logger.error(f"Corrupted PDF: {file.filename} → {e}")
+                raise _UploadRejected(f"File '{file.filename}' appears to be corrupted or unreadable.")
 
             # Create document metadata
             document_data = {
@@ -396,39 +455,88 @@ async def upload_documents(
                 
                 # File info
                 "file_name": file.filename,
-                "local_path": local_path,
-                "path": blob_url,
-                "blob_name": blob_name,
                 "size": format_file_size(file_size),
                 "content_type": file.content_type,
                 "extension": extension,
+                "content_sha256": content_sha256,
                 
                 # 🔥 Report metadata
                 "report_category": report_category,
                 "report_title": report_title,
                 "report_date": report_date,
                 "report_notes": report_notes,
-    
-    
-                "status": "pending",
+
+
                 "created_at": datetime.now(timezone.utc),
                 "updated_at": datetime.now(timezone.utc)
             }
 
+            # The same file already processed for this user: reuse its blob and lab results, no upload or OCR
+            original = await _find_processed_copy(db, user_id, content_sha256) if settings.UPLOAD_DEDUP_ENABLED else None
+            if original:
+                _remove_files([local_paths.pop()])
+                document_data.update({
+                    "path": original["path"],
+                    "blob_name": original["blob_name"],
+                    "lab_results": original["lab_results"],
+                    "status": "ready",
+                    "ocr_done": True,
+                    "deduplicated_from": original.get("deduplicated_from", original["_id"]),
+                })
+                _record_dedup(file_size)
+            else:
+                # Upload to blob storage, read from the local copy
+                blob_name = f"{user_id}/{unique_filename}"
+                with open(local_path, "rb") as local_file:
+                    async with blob_storage() as storage:
+                        blob_url = await storage.upload(blob_name, local_file, file.content_type, length=file_size)
+
+                document_data.update({
+                    "local_path": local_path,
+                    "path": blob_url,
+                    "blob_name": blob_name,
+                    "status": "pending",
+                })
+
             result = await db.documents.insert_one(document_data)
             document_ids.append(result.inserted_id)
 
-        # Process OCR (optional, as per your flow)
-        await ocr_documents(db, user_id, document_ids)
+    except _UploadRejected as e:
+        _remove_files(local_paths)
+        await _abandon_documents(db, document_ids, f"Upload rejected: {e}")
+        return None, None, JSONResponse(content={"message": str(e)}, status_code=status.HTTP_400_BAD_REQUEST)
+    except BaseException:
+        _remove_files(local_paths)
+        await _abandon_documents(db, document_ids, "Upload was not completed")
+        raise
+
+    return document_ids, local_paths, None
+
+
+async def upload_documents(
+    user_id: str,
+    db: AsyncIOMotorDatabase,
+    report_category: str,
+    report_title: str,
+    report_date: str,
+    report_notes: str | None = None,
+    files: List[UploadFile] = File(...),
+):
+    try:
+        document_ids, local_paths, error = await _store_documents(user_id, db, report_category, report_title, report_date, report_notes, files)
+        if error is not None:
+            return error
+
+        # Process OCR (optional, as per your flow); local copies are deleted whatever happens
+        try:
+            await ocr_documents(db, user_id, document_ids)
+        finally:
+            _remove_files(local_paths)
 
-        # Delete local copies after OCR
         docs = await db.documents.find({"user_id": ObjectId(user_id), "_id": {"$in": document_ids}}).to_list(length=None)
         respon_documents = []
         
         for doc in docs:
-            if "local_path" in doc and os.path.exists(doc["local_path"]):
-                os.remove(doc["local_path"])
-
             doc["id"] = str(doc["_id"])
             del doc["_id"]
             respon_documents.append(DocumentMetadata(**doc))
@@ -444,6 +552,128 @@ async def upload_documents(
         )
 
 
+# Store the documents and answer 202 straight away; OCR runs after the response.
+# Progress is on GET /documents/status (polling) and GET /documents/status/stream (SSE).
+# If the worker stops before OCR is done, the recovery sweep picks the documents up (recover_stale_uploads).
+async def upload_documents_async(
+    user_id: str,
+    db: AsyncIOMotorDatabase,
+    background_tasks: BackgroundTasks,
+    report_category: str,
+    report_title: str,
+    report_date: str,
+    report_notes: str | None = None,
+    files: List[UploadFile] = File(...),
+):
+    try:
+        document_ids, local_paths, error = await _store_documents(user_id, db, report_category, report_title, report_date, report_notes, files)
+        if error is not None:
+            return error
+
+        background_tasks.add_task(process_uploaded_documents, db, user_id, document_ids, local_paths)
+
+        return JSONResponse(
+            content={
+                "message": "Documents uploaded, processing started",
+                "data": {"document_ids": [str(doc_id) for doc_id in document_ids], "status": "pending"},
+            },
+            status_code=status.HTTP_202_ACCEPTED
+        )
+
+    except Exception as e:
+        logger.error(f"Error uploading documents:{e}")
+        return JSONResponse(
+            content={"message": "Error uploading documents"},
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+# Background worker of upload_documents_async: OCR the stored documents, then drop their local copies
+async def process_uploaded_documents(db: AsyncIOMotorDatabase, user_id: str, document_ids: List[ObjectId], local_paths: List[str]):
+    try:
+        await ocr_documents(db, user_id, document_ids)
+    except Exception as e:
+        logger.error(f"Error processing uploaded documents for user {user_id}: {e}")
+    finally:
+        _remove_files(local_paths)
+
+
+def _stale_spool_files(before: datetime, keep: set) -> List[str]:
+    paths = []
+    for entry in os.scandir(UPLOAD_DIR):
+        path = os.path.abspath(entry.path)
+        if entry.is_file() and path not in keep and entry.stat().st_mtime < before.timestamp():
+            paths.append(path)
+    return paths
+
+
+# Pending documents whose OCR was lost, e.g. the worker restarted after answering 202. A pending document
+# not claimed for DOCUMENT_PENDING_STALE_SECONDS is analysed again if its local copy is on this machine,
+# otherwise it is marked failed. Local copies left behind by such uploads are removed.
+async def recover_stale_uploads(db: AsyncIOMotorDatabase):
+    documents_collection = db.documents
+    now = datetime.now(timezone.utc)
+    stale_before = now - timedelta(seconds=settings.DOCUMENT_PENDING_STALE_SECONDS)
+    stale_docs = await documents_collection.find(
+        {"status": "pending", "updated_at": {"$lt": stale_before}}
+    ).to_list(length=None)
+
+    requeued, failed = [], 0
+    for doc in stale_docs:
+        if doc.get("local_path") and os.path.exists(doc["local_path"]):
+            requeued.append(doc)
+            continue
+        # Same optimistic lock as the OCR claim, so a document another worker just took is left alone
+        result = await documents_collection.update_one(
+            {"_id": doc["_id"], "status": "pending", "updated_at": doc.get("updated_at")},
+            {"$set": {"status": "failed", "message": "Processing was interrupted, please upload the file again.", "updated_at": now}}
+        )
+        if result.modified_count:
+            failed += 1
+            notify_document_status(str(doc["user_id"]))
+
+    _remove_files(_stale_spool_files(stale_before, {os.path.abspath(doc["local_path"]) for doc in requeued}))
+    if not requeued and not failed:
+        return
+    logger.warning(f"Recovering stale uploads: {len(requeued)} re-queued, {failed} marked failed")
+
+    limit = asyncio.Semaphore(max(1, settings.OCR_BATCH_CONCURRENCY))
+    claimed = await asyncio.gather(*(ocr_document(documents_collection, str(doc["user_id"]), doc, limit) for doc in requeued))
+    # A document another worker claimed first keeps its local copy until that worker is done with it
+    _remove_files([doc["local_path"] for doc, ran in zip(requeued, claimed) if ran])
+
+
+async def _recover_periodically(db: AsyncIOMotorDatabase):
+    while True:
+        try:
+            await recover_stale_uploads(db)
+        except Exception as e:
+            logger.error(f"Error recovering stale uploads: {e}")
+        await asyncio.sleep(settings.DOCUMENT_RECOVERY_INTERVAL_SECONDS)
+
+
+_recovery_task: Optional[asyncio.Task] = None
+
+
+async def open_upload_recovery(db: AsyncIOMotorDatabase):
+    """Start the recovery sweep of this worker: now, then every DOCUMENT_RECOVERY_INTERVAL_SECONDS. Call from the lifespan."""
+    global _recovery_task
+    _recovery_task = asyncio.create_task(_recover_periodically(db))
+    logger.info("Upload recovery started.")
+
+
+async def close_upload_recovery():
+    global _recovery_task
+    task, _recovery_task = _recovery_task, None
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        logger.info("Upload recovery stopped.")
+
+
 # Get the documents of user
 async def get_documents(db: AsyncIOMotorDatabase, user_id: str):
     documents = await db.documents.find(
@@ -474,46 +704,9 @@ async def ocr_documents(db: AsyncIOMotorDatabase, user_id: str, document_ids: Li
         if not pending_documents:
             return {"message": "No pending documents to process."}
 
-        for doc in pending_documents:
-            doc_id = doc["_id"]
-            file_path = doc["local_path"]
-            
-            try:
-                # Step 1: Analyze document
-                extracted_data = await analyze_report(file_path)
-                # print("Extracted data:", extracted_data)
-                if not extracted_data:
-                    await documents_collection.update_one(
-                        {"_id": doc_id},
-                        {"$set": {"status": "failed", "message": "Document Extracted data is empty."}}
-                    )
-                    logger.error("Lab results is empty from document.")
-                    # raise Exception("Document Extracted data is empty.")
-                    continue
-
-                # Store patient_info and lab_results in user_reports (without summary)
-                await documents_collection.find_one_and_update(
-                    {
-                        "_id": doc_id,
-                        "user_id": ObjectId(user_id),
-                    },
-                    {
-                        "$set": {
-                            "lab_results": extracted_data,
-                            "status": "ready",
-                            "ocr_done": True,
-                            "updated_at": datetime.now(timezone.utc)
-                        }
-                    },
-                )
-                
-            except Exception as e:
-                print('error', e)
-                await documents_collection.update_one(
-                    {"_id": doc_id},
-                    {"$set": {"status": "failed", "message": str(e)}}
-                )
-                logger.error("Error extracted document: {e}")
+        # Documents are analysed concurrently (bounded); each one's status is written as soon as it finishes.
+        limit = asyncio.Semaphore(max(1, settings.OCR_BATCH_CONCURRENCY))
+        await asyncio.gather(*(ocr_document(documents_collection, user_id, doc, limit) for doc in pending_documents))
         logger.info("OCR completed")
         return {"message": "User documents analyzed and extracted data stored in user report."}
     except Exception as e:
@@ -521,6 +714,60 @@ async def ocr_documents(db: AsyncIOMotorDatabase, user_id: str, document_ids: Li
         return {"message": "Error in ocr_documents: ", "error": str(e)}
 
 
+# Take a pending document for OCR: optimistic lock on the updated_at it was read with, so only one
+# worker analyses it. Returns False if another worker claimed it since.
+async def _claim_document(documents_collection, doc: dict) -> bool:
+    result = await documents_collection.update_one(
+        {"_id": doc["_id"], "status": "pending", "updated_at": doc.get("updated_at")},
+        {"$set": {"updated_at": datetime.now(timezone.utc)}}
+    )
+    return result.modified_count == 1
+
+
+# Ocr one document and store its status and lab results. Returns False if the document was claimed by another worker.
+async def ocr_document(documents_collection, user_id: str, doc: dict, limit: asyncio.Semaphore) -> bool:
+    doc_id = doc["_id"]
+    file_path = doc["local_path"]
+    try:
+        # Step 1: Analyze document
+        async with limit:
+            if not await _claim_document(documents_collection, doc):
+                return False
+            extracted_data = await analyze_report(file_path)
+        if not extracted_data:
+            await documents_collection.update_one(
+                {"_id": doc_id},
+                {"$set": {"status": "failed", "message": "Document Extracted data is empty."}}
+            )
+            logger.error("Lab results is empty from document.")
+            return True
+
+        # Store patient_info and lab_results in user_reports (without summary)
+        await documents_collection.find_one_and_update(
+            {
+                "_id": doc_id,
+                "user_id": ObjectId(user_id),
+            },
+            {
+                "$set": {
+                    "lab_results": extracted_data,
+                    "status": "ready",
+                    "ocr_done": True,
+                    "updated_at": datetime.now(timezone.utc)
+                }
+            },
+        )
+    except Exception as e:
+        await documents_collection.update_one(
+            {"_id": doc_id},
+            {"$set": {"status": "failed", "message": str(e)}}
+        )
+        logger.error(f"Error extracted document {doc_id}: {e}")
+    finally:
+        notify_document_status(user_id)
+    return True
+
+
 async def get_secure_blob_file_url(blob_name: str, user_id: str, db: AsyncIOMotorDatabase):
     # Validate that this blob belongs to the user in your MongoDB
     try:
@@ -528,16 +775,8 @@ async def get_secure_blob_file_url(blob_name: str, user_id: str, db: AsyncIOMoto
         if not doc:
             return JSONResponse(content={"message": "You do not have access to this file."}, status_code=403)
 
-        sas_token = generate_blob_sas(
-            account_name=settings.AZURE_STORAGE_ACCOUNT_NAME,
-            container_name=settings.AZURE_STORAGE_CONTAINER_NAME,
-            blob_name=blob_name,
-            account_key=settings.AZURE_STORAGE_ACCOUNT_KEY,
-            permission=BlobSasPermissions(read=True),
-            expiry=datetime.now(timezone.utc) + timedelta(minutes=10)  # valid for 10 min
-        )
-        # print("SAS token generated: ", sas_token)
-        url = f"{settings.AZURE_STORAGE_ACCOUNT_URL}/{settings.AZURE_STORAGE_CONTAINER_NAME}/{blob_name}?{sas_token}"
+        async with blob_storage() as storage:
+            url = storage.read_url(blob_name, expiry_minutes=10)  # valid for 10 min
         return JSONResponse(content={"url": url}, status_code=200)
     except Exception as e:
         logger.error("Error in get_secure_blob_file_url: {e}")
@@ -0,0 +1,132 @@
+"""
+Processing status of uploaded documents, for the asynchronous upload.
+
+The `status` field of a documents entry is the state machine: `pending` when
+the file is stored, then `ready` (lab_results extracted) or `failed` (with
+`message`). Clients either poll GET /documents/status or follow
+GET /documents/status/stream (Server-Sent Events).
+
+The stream re-reads the statuses whenever OCR in this process finishes a
+document of the user, and at least every DOCUMENT_STATUS_POLL_SECONDS, so a
+document processed by another worker is picked up too.
+
+Events:
+    status   {"id": ..., "file_name": ..., "status": ..., "message": ...}   on every change
+    done     {"documents": [...]}   once no document is pending
+    error    {"message": ...}
+"""
+import asyncio
+import time
+from typing import AsyncIterator, Dict, List, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import status
+from fastapi.responses import JSONResponse, StreamingResponse
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from common.config import logger, settings
+from common.sse import SSE_HEADERS, STREAM_RETRY_MS, sse_event
+
+
+TERMINAL_STATUSES = ("ready", "failed")
+
+_changed: Dict[str, asyncio.Event] = {}
+
+
+def notify_document_status(user_id: str):
+    """Wake the status streams of `user_id`; called after a document's status is written."""
+    event = _changed.pop(str(user_id), None)
+    if event is not None:
+        event.set()
+
+
+async def _wait_for_change(event: asyncio.Event, timeout: float):
+    try:
+        await asyncio.wait_for(event.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+
+
+def _object_ids(ids: List[str]) -> Optional[List[ObjectId]]:
+    try:
+        return [ObjectId(i) for i in dict.fromkeys(ids)]
+    except (InvalidId, TypeError):
+        return None
+
+
+async def _read_statuses(db: AsyncIOMotorDatabase, user_id: str, document_ids: List[ObjectId]) -> List[Dict[str, str]]:
+    docs = await db.documents.find(
+        {"_id": {"$in": document_ids}, "user_id": ObjectId(user_id)},
+        {"file_name": 1, "status": 1, "message": 1},
+    ).to_list(length=None)
+    return [
+        {"id": str(doc["_id"]), "file_name": doc.get("file_name", ""), "status": doc.get("status", "pending"), "message": doc.get("message", "")}
+        for doc in docs
+    ]
+
+
+def _invalid_ids_response() -> JSONResponse:
+    return JSONResponse(content={"message": "Invalid document id."}, status_code=status.HTTP_400_BAD_REQUEST)
+
+
+# Current status of the given documents of the user
+async def get_document_statuses(db: AsyncIOMotorDatabase, user_id: str, ids: List[str]):
+    try:
+        document_ids = _object_ids(ids)
+        if not document_ids:
+            return _invalid_ids_response()
+        documents = await _read_statuses(db, user_id, document_ids)
+        if not documents:
+            return JSONResponse(content={"message": "Documents not found", "data": []}, status_code=status.HTTP_404_NOT_FOUND)
+        return JSONResponse(
+            content={
+                "message": "Document status fetched successfully",
+                "data": documents,
+                "completed": all(d["status"] in TERMINAL_STATUSES for d in documents),
+            },
+            status_code=status.HTTP_200_OK
+        )
+    except Exception as e:
+        logger.error(f"Error fetching document status: {e}")
+        return JSONResponse(content={"message": "Error fetching document status"}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+async def _follow(db: AsyncIOMotorDatabase, user_id: str, document_ids: List[ObjectId]) -> AsyncIterator[str]:
+    yield f"retry: {STREAM_RETRY_MS}\n\n"
+    deadline = time.monotonic() + settings.DOCUMENT_STATUS_STREAM_TIMEOUT_SECONDS
+    sent: Dict[str, str] = {}
+    try:
+        while True:
+            # Taken before reading, so a change written meanwhile is not missed.
+            changed = _changed.setdefault(str(user_id), asyncio.Event())
+            documents = await _read_statuses(db, user_id, document_ids)
+            for doc in documents:
+                if sent.get(doc["id"]) != doc["status"]:
+                    sent[doc["id"]] = doc["status"]
+                    yield sse_event("status", doc)
+            if all(d["status"] in TERMINAL_STATUSES for d in documents):
+                yield sse_event("done", {"documents": documents})
+                return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                yield sse_event("error", {"message": "Documents are still being processed."})
+                return
+            await _wait_for_change(changed, min(settings.DOCUMENT_STATUS_POLL_SECONDS, remaining))
+    except Exception as e:
+        logger.error(f"Error streaming document status: {e}")
+        yield sse_event("error", {"message": "Error fetching document status"})
+
+
+# Status of the given documents of the user, pushed as it changes
+async def stream_document_statuses(db: AsyncIOMotorDatabase, user_id: str, ids: List[str]):
+    try:
+        document_ids = _object_ids(ids)
+        if not document_ids:
+            return _invalid_ids_response()
+        if not await db.documents.count_documents({"_id": {"$in": document_ids}, "user_id": ObjectId(user_id)}):
+            return JSONResponse(content={"message": "Documents not found", "data": []}, status_code=status.HTTP_404_NOT_FOUND)
+        return StreamingResponse(_follow(db, user_id, document_ids), media_type="text/event-stream", headers=SSE_HEADERS)
+    except Exception as e:
+        logger.error(f"Error streaming document status: {e}")
+        return JSONResponse(content={"message": "Error fetching document status"}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
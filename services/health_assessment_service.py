@@ -1,8 +1,9 @@
+import asyncio
 from bson import ObjectId
 from datetime import datetime, timezone
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi import HTTPException, status, BackgroundTasks
 from common.email_renderer import render_email_template
 from common.email_utils import custom_send_email
@@ -13,9 +14,10 @@ from models.health_assessment import (
         HealthFormStep1Model, HealthFormStep2Model, HealthFormStep3Model, HealthFormStep4Model, UserEmailDTO
     )
 from common.config import logger
+from data_processing.band_vector import decode_band_vector, encode_band_vector
 from data_processing.biomarkers_range import biomarker_with_description, section_to_biomarkers
 from data_processing.calculate_age import calculate_biological_age
-from data_processing.report_genration import report_generation_pipeline
+from data_processing.report_genration import report_generation_pipeline, RANGE_TABLE_VERSION
 from data_processing.report_compare import compare_by_bands, generate_comparison_summary_using_grok
 
 
@@ -406,9 +408,12 @@ async def generate_and_upsert_clinical_summary(db: AsyncIOMotorDatabase, user_id
     questionnaire = await get_questionnaire(db, user_id)
     test_results_for_llm = await get_biomarkers_for_test(combined_lab_results)  
 
+    pending_summary = None
     try:
         # summary_obj = await generate_clinical_summary_grok(gender, test_results_for_llm, questionnaire)
         summary_obj = await report_generation_pipeline(gender, age, test_results_for_llm, questionnaire)
+        if summary_obj:
+            pending_summary = summary_obj.get("pending_summary")
         if not summary_obj:
             await reports_collection.update_one(
             {"_id": report_id},
@@ -433,6 +438,14 @@ async def generate_and_upsert_clinical_summary(db: AsyncIOMotorDatabase, user_id
             {"$set": {"status": "processed", "summary_done": True}}
         )
         logger.info(f"Summary generated and upserted successfully for report {report_id} for user {user_id}")
+
+        if settings.PRECOMPUTE_PREVIOUS_COMPARISON:
+            await precompute_previous_comparison(db, user_id, report_id)
+
+        # The report is ready with the rule-based summary; swap in the LLM one when its call finishes.
+        if pending_summary is not None:
+            pending, pending_summary = pending_summary, None
+            await upgrade_report_summary(db, user_id, report_id, pending)
         return {"message": "Summary generated and upserted successfully."}
 
     except Exception as e:
@@ -443,6 +456,65 @@ async def generate_and_upsert_clinical_summary(db: AsyncIOMotorDatabase, user_id
             {"$set": {"status": "failed", "message": "Failed to generate summary."}}
         )
         return 
+    finally:
+        # Not handed to upgrade_report_summary: stop the LLM call instead of leaving it unawaited.
+        if pending_summary is not None:
+            _discard_pending_summary(pending_summary)
+
+
+def _discard_pending_summary(task: asyncio.Future):
+    if not task.done():
+        task.cancel()
+    elif not task.cancelled():
+        task.exception()    # retrieved, so it is not reported as never retrieved
+
+
+async def upgrade_report_summary(db: AsyncIOMotorDatabase, user_id: str, report_id: ObjectId, pending_summary=None) -> bool:
+    """
+    Replace a report's rule-based summary with the LLM one: the result of the
+    still-running `pending_summary` call, or else a fresh pipeline run without
+    fallback on the stored lab results. Only reports still marked
+    summary_upgradable are touched. Returns True if the report was upgraded.
+    """
+    reports_collection = db["user_reports"]
+    report_id = ObjectId(report_id)
+    try:
+        if pending_summary is not None:
+            summary_obj = await pending_summary
+        else:
+            report = await reports_collection.find_one({"_id": report_id, "summary_upgradable": True})
+            if not report:
+                return False
+            user_info = await db["users"].find_one({"_id": ObjectId(user_id)}, {"gender": 1, "chronological_age": 1})
+            questionnaire = await get_questionnaire(db, user_id)
+            lab_results = await get_biomarkers_for_test(report.get("combined_lab_results", {}))
+            summary_obj = await report_generation_pipeline(
+                user_info.get("gender", ""), user_info.get("chronological_age", 0), lab_results, questionnaire, fallback=False
+            )
+        if not summary_obj:
+            logger.error(f"LLM summary for report {report_id} still unavailable; keeping the rule-based summary")
+            return False
+
+        result = await reports_collection.update_one(
+            {"_id": report_id, "summary_upgradable": True},
+            {"$set": {
+                "summary": summary_obj.get("summary", ""),
+                "section_summary": summary_obj.get("section_summary", {}),
+                "lifestyle_recommendations": summary_obj.get("action_plan", {}),
+                "critical_concerns": summary_obj.get("critical_concerns", []),
+                "summary_source": "llm",
+                "summary_upgradable": False,
+                "updated_at": datetime.now(timezone.utc)
+            }}
+        )
+        if result.modified_count == 0:
+            logger.info(f"Report {report_id} no longer has an upgradable summary (regenerated or deleted); LLM summary not applied.")
+            return False
+        logger.info(f"Rule-based summary of report {report_id} upgraded to the LLM summary.")
+        return True
+    except Exception as e:
+        logger.error(f"Error upgrading summary of report {report_id}: {e}")
+        return False
 
 
 async def map_biomarkers_with_ranges(
@@ -497,26 +569,37 @@ async def map_biomarkers_with_ranges(
         return {}
 
 
+async def build_biomarker_fields(classification: Dict[str, Any], gender: str) -> Dict[str, Any]:
+    """
+    Build the biomarker bucket fields stored on a user_reports document from a
+    classify_report-shaped result. Shared by report generation and reclassification.
+    """
+    good_biomarkers = await map_biomarkers_with_ranges(classification.get("good", {}), gender)
+    normal_biomarkers = await map_biomarkers_with_ranges(classification.get("normal", {}), gender)
+    critical_biomarkers = await map_biomarkers_with_ranges(classification.get("critical", {}), gender)
+    invalid_biomarkers = await map_biomarkers_with_ranges(classification.get("invalid_biomarkers", {}), gender, invalid=True)
+    return {
+        "good_biomarkers": good_biomarkers,
+        "normal_biomarkers": normal_biomarkers,
+        "critical_biomarkers": critical_biomarkers,
+        "invalid_biomarkers": invalid_biomarkers,
+        "health_score": len(good_biomarkers),
+        "biomarker_counts": classification.get("counts", {}),
+    }
+
+
 async def upsert_report_details(reports_collection, report_id, user_id, combined_lab_results, summary_obj, gender, age, report_date) -> bool:
     """
     Upsert report details in the DB. Returns True if successful, False otherwise.
     Handles errors gracefully.
     """
     try:
-        counts = summary_obj.get("counts", {})
         summary = summary_obj.get("summary", "")
-        good_biomarkers = summary_obj.get("good", {})
-        normal_biomarkers = summary_obj.get("normal", {})
-        critical_biomarkers = summary_obj.get("critical", {})
-        invalid_biomarkers = summary_obj.get("invalid_biomarkers", {})
         lifestyle_recommendations = summary_obj.get("action_plan", {})
         critical_concerns = summary_obj.get("critical_concerns", {})
         section_summary = summary_obj.get("section_summary", {})
 
-        good_biomarkers = await map_biomarkers_with_ranges(good_biomarkers, gender)
-        normal_biomarkers = await map_biomarkers_with_ranges(normal_biomarkers, gender)
-        critical_biomarkers = await map_biomarkers_with_ranges(critical_biomarkers, gender)
-        invalid_biomarkers = await map_biomarkers_with_ranges(invalid_biomarkers, gender, invalid=True)
+        biomarker_fields = await build_biomarker_fields(summary_obj, gender)
         
         await reports_collection.find_one_and_update(
             {
@@ -529,14 +612,13 @@ async def upsert_report_details(reports_collection, report_id, user_id, combined
                     "combined_lab_results": combined_lab_results,
                     "summary": summary,
                     "section_summary": section_summary,
-                    "good_biomarkers": good_biomarkers,
-                    "normal_biomarkers": normal_biomarkers,
-                    "critical_biomarkers": critical_biomarkers,
-                    "invalid_biomarkers": invalid_biomarkers,
+                    **biomarker_fields,
+                    "band_vector": encode_band_vector(biomarker_fields),
+                    "range_table_version": RANGE_TABLE_VERSION,
                     "lifestyle_recommendations": lifestyle_recommendations,
-                    "health_score": len(good_biomarkers),
                     "critical_concerns": critical_concerns,
-                    "biomarker_counts": counts,
+                    "summary_source": summary_obj.get("summary_source", "llm"),
+                    "summary_upgradable": summary_obj.get("summary_source") == "rule_based",
                     "gender": gender,
                     "age": age,
                     "report_date": report_date,
@@ -624,6 +706,7 @@ async def get_user_report_details(db: AsyncIOMotorDatabase, user_id: str, report
                 "critical_concerns": 1,
                 "summary": 1,
                 "section_summary": 1,
+                "range_table_version": 1,
                 "processed_at": {
                     "$dateToString": {
                         "format": "%b %d, %Y",
@@ -704,6 +787,145 @@ async def dashboard_data(db: AsyncIOMotorDatabase, user_id: str):
         return JSONResponse(content={"message": "Failed to fetch user report details."}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+# Reports of one user to compare: bands, dates, gender and range table stamp
+async def load_reports_for_comparison(db: AsyncIOMotorDatabase, user_id: str, r1: ObjectId, r2: ObjectId) -> Optional[List[Dict[str, Any]]]:
+    """The two reports (compact band vectors decoded into buckets), or None if either is missing."""
+    reports = await db.user_reports.find(
+        {"_id": {"$in": [r1, r2]}, "user_id": ObjectId(user_id)},
+        {
+            "band_vector": 1,
+            "updated_at": 1,
+            "gender": 1,
+            "report_date": 1,
+            "range_table_version": 1
+        }
+    )
+    if not reports or len(reports) != 2:
+        return None
+
+    # Reports without a vector in the current layout (not backfilled yet) fall back to the buckets
+    stale_ids = []
+    for report in reports:
+        buckets = decode_band_vector(report.pop("band_vector", None))
+        if buckets is None:
+            stale_ids.append(report["_id"])
+        else:
+            report.update(buckets)
+    if stale_ids:
+        verbose = await db.user_reports.find(
+            {"_id": {"$in": stale_ids}},
+            {"good_biomarkers": 1, "normal_biomarkers": 1, "critical_biomarkers": 1}
+        )
+        verbose_by_id = {doc.pop("_id"): doc for doc in verbose}
+        for report in reports:
+            report.update(verbose_by_id.get(report["_id"], {}))
+    return reports
+
+
+def comparison_range_table_versions(reports: List[Dict[str, Any]], r1: ObjectId, r2: ObjectId) -> List[Optional[str]]:
+    """Range table versions the two reports were classified under, in r1/r2 order."""
+    versions_by_id = {report["_id"]: report.get("range_table_version") for report in reports}
+    return [versions_by_id.get(r1), versions_by_id.get(r2)]
+
+
+async def find_stored_comparison(db: AsyncIOMotorDatabase, user_id: str, r1: ObjectId, r2: ObjectId,
+                                 range_table_versions: List[Optional[str]]) -> Optional[str]:
+    """
+    The stored summary for the pair, unless either report has been reclassified
+    since (comparisons stored before versioning carry no stamp and are reused as before).
+    """
+    compare_report = await db.report_comparisons.find_one({
+        "user_id": ObjectId(user_id),
+        "report_id_1": r1,
+        "report_id_2": r2
+    })
+    if compare_report and compare_report.get("range_table_versions", range_table_versions) == range_table_versions:
+        return compare_report.get("summary")
+    return None
+
+
+async def run_report_comparison(reports: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # Unpack the reports
+    report_1, report_2 = reports[0], reports[1]
+
+    report1_date = report_1.get("report_date") \
+        if report_1.get("report_date") \
+        else report_1.get("updated_at").strftime("%Y-%m-%d")
+    report2_date = report_2.get("report_date") \
+        if report_2.get("report_date") \
+        else report_2.get("updated_at").strftime("%Y-%m-%d")
+
+    return await compare_by_bands(
+        section_to_biomarkers,     # your 16-category dict
+        report_old=report_1,
+        report_new=report_2,
+        date_old=report1_date,
+        date_new=report2_date,
+        sex=report_1.get("gender", ""),
+        consider_only_old_present=True,
+    )
+
+
+async def save_report_comparison(db: AsyncIOMotorDatabase, user_id: str, r1: ObjectId, r2: ObjectId,
+                                 summary: str, range_table_versions: List[Optional[str]]):
+    # Store comparison in DB (always stored sorted); replaces a stale one
+    await db.report_comparisons.update_one(
+        {"user_id": ObjectId(user_id), "report_id_1": r1, "report_id_2": r2},
+        {"$set": {
+            "summary": summary,
+            "range_table_versions": range_table_versions,
+            "created_at": datetime.now(timezone.utc)
+        }},
+        upsert=True
+    )
+
+
+async def ensure_report_comparison_index(collection):
+    """Index behind the stored-comparison lookup. Call from the lifespan."""
+    try:
+        await collection.create_index([("user_id", 1), ("report_id_1", 1), ("report_id_2", 1)])
+    except Exception as e:
+        logger.warning(f"Could not ensure the report_comparisons index: {e}")
+
+
+async def precompute_previous_comparison(db: AsyncIOMotorDatabase, user_id: str, report_id: ObjectId) -> bool:
+    """
+    Compare a report that just became ready with the user's previous ready
+    report and store the summary, so the usual newest-vs-previous request is a
+    stored read. Returns True if a comparison was generated.
+    """
+    report_id = ObjectId(report_id)
+    try:
+        previous = await db.user_reports.find(
+            {"user_id": ObjectId(user_id), "status": "ready", "_id": {"$lt": report_id}},
+            {"_id": 1},
+            sort=[("_id", -1)],
+            limit=1
+        )
+        if not previous:
+            return False
+
+        r1, r2 = sorted([previous[0]["_id"], report_id], key=lambda x: str(x))
+        reports = await load_reports_for_comparison(db, user_id, r1, r2)
+        if not reports:
+            return False
+        range_table_versions = comparison_range_table_versions(reports, r1, r2)
+        if await find_stored_comparison(db, user_id, r1, r2, range_table_versions) is not None:
+            return False
+
+        result = await run_report_comparison(reports)
+        summary = await generate_comparison_summary_using_grok(result)
+        if not summary:
+            logger.error(f"Failed to precompute comparison of reports {r1} and {r2}.")
+            return False
+        await save_report_comparison(db, user_id, r1, r2, summary, range_table_versions)
+        logger.info(f"Comparison of reports {r1} and {r2} precomputed.")
+        return True
+    except Exception as e:
+        logger.error(f"Error precomputing comparison for report {report_id}: {e}")
+        return False
+
+
 # Compare two reports only
 async def compare_two_reports(db: AsyncIOMotorDatabase, user_id: str, report_id_1: str, report_id_2: str):
     try:
@@ -712,55 +934,20 @@ async def compare_two_reports(db: AsyncIOMotorDatabase, user_id: str, report_id_
         # Always sort the reports so order does not matter
         r1, r2 = sorted([ObjectId(report_id_1), ObjectId(report_id_2)], key=lambda x: str(x))
 
-        # Fetch the two reports
-        reports = await db.user_reports.find(
-            {"_id": {"$in": [r1, r2]}, "user_id": ObjectId(user_id)},
-            {
-                "good_biomarkers": 1,
-                "normal_biomarkers": 1,
-                "critical_biomarkers": 1,
-                "updated_at": 1,
-                "gender": 1,
-                "report_date": 1
-            }
-        )
-
-        if not reports or len(reports) != 2:
+        reports = await load_reports_for_comparison(db, user_id, r1, r2)
+        if not reports:
             return JSONResponse(content={"message": "Reports not found."}, status_code=status.HTTP_404_NOT_FOUND)
 
-        # Check if comparison already exists (order independent now)
-        compare_report = await db.report_comparisons.find_one({
-            "user_id": ObjectId(user_id),
-            "report_id_1": r1,
-            "report_id_2": r2
-        })
-
-        if compare_report:
+        range_table_versions = comparison_range_table_versions(reports, r1, r2)
+        stored_summary = await find_stored_comparison(db, user_id, r1, r2, range_table_versions)
+        if stored_summary is not None:
             return JSONResponse(
-                content={"message": "Reports already compared.", "summary": compare_report.get("summary")},
+                content={"message": "Reports already compared.", "summary": stored_summary},
                 status_code=status.HTTP_200_OK
             )
 
-        # Unpack the reports
-        report_1, report_2 = reports[0], reports[1]
-
-        report1_date = report_1.get("report_date") \
-            if report_1.get("report_date") \
-            else report_1.get("updated_at").strftime("%Y-%m-%d")
-        report2_date = report_2.get("report_date") \
-            if report_2.get("report_date") \
-            else report_2.get("updated_at").strftime("%Y-%m-%d")
-
         # Run comparison
-        result = await compare_by_bands(
-            section_to_biomarkers,     # your 16-category dict
-            report_old=report_1,
-            report_new=report_2,
-            date_old=report1_date,
-            date_new=report2_date,
-            sex=report_1.get("gender", ""),
-            consider_only_old_present=True,
-        )
+        result = await run_report_comparison(reports)
 
         # Generate summary (Azure)
         summary = await generate_comparison_summary_using_grok(result)
@@ -769,14 +956,7 @@ async def compare_two_reports(db: AsyncIOMotorDatabase, user_id: str, report_id_
             return JSONResponse(content={"message": "Failed to generate comparison summary."},
                                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        # Store comparison in DB (always stored sorted)
-        await db.report_comparisons.insert_one({
-            "user_id": ObjectId(user_id),
-            "report_id_1": r1,
-            "report_id_2": r2,
-            "summary": summary,
-            "created_at": datetime.now(timezone.utc)
-        })
+        await save_report_comparison(db, user_id, r1, r2, summary, range_table_versions)
 
         logger.info("Reports compared successfully.")
         return JSONResponse(content={"message": "Reports compared successfully.", "summary": summary},
@@ -788,6 +968,22 @@ async def compare_two_reports(db: AsyncIOMotorDatabase, user_id: str, report_id_
                             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+# Active range table version (clients and workers compare it to the stamp on reports).
+# A client sending the current ETag in If-None-Match gets 304 with no body.
+async def get_range_table_version(if_none_match: Optional[str] = None):
+    etag = f'"{RANGE_TABLE_VERSION}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match:
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        if etag in tags or "*" in tags:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return JSONResponse(
+        content={"message": "Range table version fetched successfully.", "data": {"range_table_version": RANGE_TABLE_VERSION}},
+        headers=headers,
+        status_code=status.HTTP_200_OK
+    )
+
+
 # Update vo2 max if not added
 async def update_vo2_max_value(db: AsyncIOMotorDatabase, user_id: str, vo2_max: float):
     try:
@@ -0,0 +1,128 @@
+"""
+Claim / checkpoint / resume loop shared by the batch jobs over user_reports
+(report reclassification, band vector backfill).
+
+A job is one document, in a jobs collection of its own. Claiming it is an optimistic lock on
+its `updated_at`, so only one caller starts a run; a "running" job that has
+not checkpointed for JOB_STALE_AFTER may be taken over. A run streams the
+matching reports in `_id` order, hands each batch to the job, and checkpoints
+`last_id`, `processed` and throughput on the job document after every batch,
+so it can resume after the last completed batch.
+"""
+import time
+from datetime import datetime, timezone, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
+
+from common.config import logger
+
+
+JOB_STALE_AFTER = timedelta(minutes=10)  # a "running" job without progress for this long may be taken over
+
+
+def new_job_state(now: datetime, **fields: Any) -> Dict[str, Any]:
+    """State of a fresh run: the common progress fields plus the job's own."""
+    return {
+        "status": "running",
+        "last_id": None,
+        "processed": 0,
+        "reports_per_sec": 0.0,
+        "message": "",
+        "started_at": now,
+        "finished_at": None,
+        "updated_at": now,
+        **fields,
+    }
+
+
+async def claim_job(
+    db: AsyncIOMotorDatabase,
+    collection: str,
+    job_id: str,
+    build_state: Callable[[Optional[Dict[str, Any]], datetime], Dict[str, Any]],
+) -> Optional[Dict[str, Any]]:
+    """
+    Claim the job document `job_id` in `collection` and return the state to run
+    with, or None if another run is in progress. `build_state(previous, now)` returns the state of the new
+    run, given the job document as it was (None the first time), so a job can
+    carry over a checkpoint.
+    """
+    jobs = db[collection]
+    now = datetime.now(timezone.utc)
+    previous = await jobs.find_one({"_id": job_id})
+
+    if previous and previous.get("status") == "running":
+        last_progress = previous.get("updated_at")
+        if last_progress and last_progress.replace(tzinfo=timezone.utc) > now - JOB_STALE_AFTER:
+            return None
+
+    state = build_state(previous, now)
+    if previous is None:
+        try:
+            await jobs.insert_one({"_id": job_id, **state})
+        except DuplicateKeyError:
+            return None
+    else:
+        # Optimistic lock: only one caller can move the document on from the state it read.
+        result = await jobs.update_one({"_id": job_id, "updated_at": previous.get("updated_at")}, {"$set": state})
+        if result.modified_count == 0:
+            return None
+    return state
+
+
+async def run_job(
+    db: AsyncIOMotorDatabase,
+    collection: str,
+    job_id: str,
+    name: str,
+    state: Dict[str, Any],
+    query: Dict[str, Any],
+    projection: Dict[str, Any],
+    batch_size: int,
+    process_batch: Callable[[List[Dict[str, Any]]], Awaitable[None]],
+    progress: Callable[[Dict[str, Any]], str],
+):
+    """
+    Run a claimed job: read the user_reports matching `query` after the
+    checkpoint in batches of `batch_size`, `await process_batch(docs)` for each,
+    and checkpoint `state` after it. `progress(state)` is logged per batch.
+    Marks the job completed, or failed with the error message.
+    """
+    jobs = db[collection]
+    reports_collection = db["user_reports"]
+    last_id = state["last_id"]
+    run_processed = 0
+    started = time.perf_counter()
+
+    try:
+        while True:
+            batch_query = dict(query)
+            if last_id is not None:
+                batch_query["_id"] = {"$gt": last_id}
+            docs = await reports_collection.find(batch_query, projection, sort=[("_id", 1)], limit=batch_size)
+            if not docs:
+                break
+
+            await process_batch(docs)
+
+            last_id = docs[-1]["_id"]
+            run_processed += len(docs)
+            state["processed"] += len(docs)
+            state["last_id"] = last_id
+            state["reports_per_sec"] = round(run_processed / max(time.perf_counter() - started, 1e-9), 1)
+            state["updated_at"] = datetime.now(timezone.utc)
+            await jobs.update_one({"_id": job_id}, {"$set": state})
+            logger.info(progress(state))
+
+        state["status"] = "completed"
+        state["finished_at"] = state["updated_at"] = datetime.now(timezone.utc)
+        await jobs.update_one({"_id": job_id}, {"$set": state})
+        logger.info(f"{name} completed: {state['processed']} reports processed")
+    except Exception as e:
+        logger.error(f"Error in {name.lower()} after {last_id}: {e}")
+        await jobs.update_one(
+            {"_id": job_id},
+            {"$set": {"status": "failed", "message": str(e), "updated_at": datetime.now(timezone.utc)}}
+        )
@@ -0,0 +1,158 @@
+"""
+Bulk reclassification of stored reports.
+
+When `centum_predefined_ranges` changes, the good/normal/critical buckets stored
+on every ready user_reports document go stale. This job recomputes them from the
+stored `combined_lab_results` with the local name resolver and the range
+classifier only (no OCR, no LLM), streaming the collection in `_id` order so it
+can checkpoint and resume.
+Reports already stamped with the active RANGE_TABLE_VERSION are not read at all.
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+from common.config import logger
+from data_processing.band_vector import encode_band_vector
+from data_processing.biomarkers_range import centum_predefined_ranges
+from data_processing.report_genration import RANGE_TABLE_VERSION, classify_reports_batch, map_biomarker_names, sex_code
+from services.health_assessment_service import build_biomarker_fields, get_biomarkers_for_test
+from services.report_batch_job import claim_job, new_job_state, run_job
+
+
+JOB_COLLECTION = "report_reclassification_jobs"
+JOB_ID = "reclassify_reports"
+DEFAULT_BATCH_SIZE = 200
+DIFF_SAMPLE_LIMIT = 100                 # changed reports kept on the job document in dry-run mode
+
+BUCKETS = ("good", "normal", "critical", "invalid")
+REPORT_PROJECTION = {
+    "user_id": 1,
+    "combined_lab_results": 1,
+    "gender": 1,
+    "age": 1,
+    "good_biomarkers": 1,
+    "normal_biomarkers": 1,
+    "critical_biomarkers": 1,
+    "invalid_biomarkers": 1,
+    "health_score": 1,
+    "biomarker_counts": 1,
+    "range_table_version": 1,
+}
+
+
+def _band_map(doc: Dict[str, Any]) -> Dict[str, str]:
+    """biomarker -> bucket name for a user_reports document (or build_biomarker_fields output)."""
+    out = {}
+    for bucket in BUCKETS:
+        for biomarker in (doc.get(f"{bucket}_biomarkers") or {}):
+            out[biomarker] = bucket
+    return out
+
+
+def _diff_bands(old: Dict[str, Any], new: Dict[str, Any]) -> List[Dict[str, Optional[str]]]:
+    old_bands, new_bands = _band_map(old), _band_map(new)
+    return [
+        {"biomarker": b, "from": old_bands.get(b), "to": new_bands.get(b)}
+        for b in sorted(old_bands.keys() | new_bands.keys())
+        if old_bands.get(b) != new_bands.get(b)
+    ]
+
+
+async def claim_reclassification_job(db: AsyncIOMotorDatabase, dry_run: bool, resume: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Claim the job document and return the state to run with, or None if another
+    run is in progress. An unfinished run with the same mode is resumed from its
+    checkpoint unless `resume` is False.
+    """
+    def build_state(previous: Optional[Dict[str, Any]], now: datetime) -> Dict[str, Any]:
+        state = new_job_state(
+            now,
+            dry_run=dry_run,
+            range_table_version=RANGE_TABLE_VERSION,
+            changed=0,
+            unchanged=0,
+            skipped=0,
+            transitions={},
+            diff_sample=[],
+        )
+        if (resume and previous and previous.get("status") != "completed" and previous.get("dry_run") == dry_run
+                and previous.get("range_table_version") == RANGE_TABLE_VERSION):
+            for key in ("last_id", "processed", "changed", "unchanged", "skipped", "transitions", "diff_sample", "started_at"):
+                state[key] = previous.get(key, state[key])
+            logger.info(f"Resuming report reclassification after {state['last_id']} ({state['processed']} processed)")
+        return state
+
+    return await claim_job(db, JOB_COLLECTION, JOB_ID, build_state)
+
+
+async def run_reclassification_job(db: AsyncIOMotorDatabase, state: Dict[str, Any], batch_size: int = DEFAULT_BATCH_SIZE):
+    """
+    Stream ready reports not yet stamped with the active range table version in
+    `_id` order, reclassify each batch and write changed buckets back (or just
+    the version stamp, if nothing changed) with one bulk_write per batch. The
+    band vector is rewritten with the buckets. Progress and throughput are
+    checkpointed on the job document after every batch.
+    In dry-run mode nothing is written to user_reports; band transitions are
+    tallied and a sample of per-report diffs is kept on the job document instead.
+    """
+    reports_collection = db["user_reports"]
+    dry_run = state["dry_run"]
+
+    async def reclassify(docs: List[Dict[str, Any]]):
+        batch = []
+        for doc in docs:
+            lab_results = await get_biomarkers_for_test(doc.get("combined_lab_results") or {})
+            lab_results = await map_biomarker_names(lab_results, use_llm=False)
+            batch.append((lab_results, sex_code(doc.get("gender")), int(doc.get("age") or 0)))
+        results = await classify_reports_batch(centum_predefined_ranges, batch)
+
+        now = datetime.now(timezone.utc)
+        operations = []
+        stamp = {"range_table_version": RANGE_TABLE_VERSION, "reclassified_at": now}
+        for doc, result in zip(docs, results):
+            fields = None if result is None else await build_biomarker_fields(result, doc.get("gender", ""))
+            if fields is None or all(doc.get(k) == v for k, v in fields.items()):
+                state["skipped" if fields is None else "unchanged"] += 1
+                if not dry_run:
+                    update = stamp if fields is None else {**stamp, "band_vector": encode_band_vector(fields)}
+                    operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": update}))
+                continue
+
+            state["changed"] += 1
+            changes = _diff_bands(doc, fields)
+            for change in changes:
+                transition = f"{change['from']}->{change['to']}"
+                state["transitions"][transition] = state["transitions"].get(transition, 0) + 1
+            if dry_run:
+                if len(state["diff_sample"]) < DIFF_SAMPLE_LIMIT:
+                    state["diff_sample"].append({
+                        "report_id": str(doc["_id"]),
+                        "changes": changes,
+                        "health_score": {"old": doc.get("health_score"), "new": fields["health_score"]},
+                    })
+            else:
+                operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": {**fields, "band_vector": encode_band_vector(fields), **stamp}}))
+
+        if operations:
+            await reports_collection.bulk_write(operations, ordered=False)
+
+    logger.info(f"Report reclassification started (dry_run={dry_run}, batch_size={batch_size})")
+    await run_job(
+        db, JOB_COLLECTION, JOB_ID, "Report reclassification", state,
+        query={
+            "status": "ready",
+            "combined_lab_results": {"$exists": True},
+            "range_table_version": {"$ne": RANGE_TABLE_VERSION},
+        },
+        projection=REPORT_PROJECTION,
+        batch_size=batch_size,
+        process_batch=reclassify,
+        progress=lambda st: (
+            f"Reclassified {st['processed']} reports "
+            f"(changed={st['changed']}, unchanged={st['unchanged']}, skipped={st['skipped']}, "
+            f"{st['reports_per_sec']} reports/s)"
+        ),
+    )
@@ -0,0 +1,46 @@
+import pytest
+
+from data_processing.biomarker_resolver import resolve_lab_results, resolve_name
+
+
+@pytest.mark.parametrize("name, wrong_key", [
+    ("Cholesterol/HDL ratio", "hdl_cholesterol"),
+    ("HDL Cholesterol Ratio", "hdl_cholesterol"),
+    ("Cholesterol/HDL", "hdl_cholesterol"),
+    ("Vitamin D 1,25", "vitamin_d_25_oh"),
+    ("Urine creatinine", "creatinine"),
+])
+def test_qualified_name_is_not_the_plain_marker(name, wrong_key):
+    res = resolve_name(name)
+    assert wrong_key not in res.candidates
+    resolved, leftovers = resolve_lab_results({name: {"value": "1"}})
+    assert resolved == {}
+    assert name in leftovers
+
+
+@pytest.mark.parametrize("name, key", [
+    ("Fasting Glucose (plasma)", "fasting_glucose"),
+    ("Vitamin D 25-OH", "vitamin_d_25_oh"),
+    ("Omega-6/Omega-3 ratio", "omega_6_omega_3_ratio"),
+    ("Free T4", "free_t4"),
+])
+def test_exact_name_resolves_locally(name, key):
+    assert resolve_name(name).method == "exact"
+    resolved, leftovers = resolve_lab_results({name: {"value": "1"}})
+    assert resolved == {key: {"value": "1"}}
+    assert leftovers == {}
+
+
+def test_fuzzy_match_is_left_for_the_llm():
+    res = resolve_name("Haemoglobn A1c")
+    assert res.method == "fuzzy"
+    assert "hba1c" in res.candidates
+    resolved, leftovers = resolve_lab_results({"Haemoglobn A1c": {"value": "5.4"}})
+    assert resolved == {}
+    assert leftovers["Haemoglobn A1c"][1] == res
+
+
+def test_second_name_for_the_same_key_is_a_leftover():
+    resolved, leftovers = resolve_lab_results({"HbA1c": {"value": "5.4"}, "Hemoglobin A1c": {"value": "6.1"}})
+    assert resolved == {"hba1c": {"value": "5.4"}}
+    assert leftovers["Hemoglobin A1c"][0] == {"value": "6.1"}
@@ -0,0 +1,25 @@
+import asyncio
+
+from common.call_governor import CallGovernor
+
+
+def test_cancelled_call_frees_its_slot():
+    async def run():
+        governor = CallGovernor("test", rate_per_second=1000.0, burst=1000, max_in_flight=2, global_max_in_flight=2)
+
+        async def slow():
+            await asyncio.sleep(10)
+
+        async def fast():
+            return "ok"
+
+        for _ in range(2):
+            try:
+                await asyncio.wait_for(governor.call(slow), 0.05)
+            except asyncio.TimeoutError:
+                pass
+
+        assert governor.info()["in_flight"] == 0
+        return await asyncio.wait_for(governor.call(fast), 1.0)
+
+    assert asyncio.run(run()) == "ok"
@@ -0,0 +1,63 @@
+import asyncio
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+from azure.ai.inference.models import UserMessage
+from pydantic import BaseModel
+
+from common import llm_json
+from common.llm_json import LLMOutputError, complete_json, parse_llm_json
+
+
+@pytest.mark.parametrize("reply, value", [
+    ('```json\n{"a": 1, "b": [1, 2]}\n```', {"a": 1, "b": [1, 2]}),
+    ('Here it is:\n```\n[1, 2]\n```\nHope this helps.', [1, 2]),
+    ('The result is {"a": 1} as requested.', {"a": 1}),
+    ('{"a": [1, 2,], "b": {"c": 3,},}', {"a": [1, 2], "b": {"c": 3}}),
+    ('{"a": {"b": [1, 2', {"a": {"b": [1, 2]}}),
+    ('{"a": "cut off mid-str', {"a": "cut off mid-str"}),
+    ('{"a": 1, "b": 2,', {"a": 1, "b": 2}),
+    ("{'a': 'it\\'s', 'b': true, 'c': null}", {"a": "it's", "b": True, "c": None}),
+    ('{"note": "don\'t stop"}', {"note": "don't stop"}),
+])
+def test_parse_llm_json(reply, value):
+    assert parse_llm_json(reply) == value
+
+
+@pytest.mark.parametrize("reply", [None, "", "   ", "no json here", "{'a': }"])
+def test_parse_llm_json_rejects(reply):
+    with pytest.raises(LLMOutputError):
+        parse_llm_json(reply)
+
+
+class _Step(BaseModel):
+    action: str
+    minutes: int
+
+
+class _Plan(BaseModel):
+    steps: List[_Step]
+    summary: str
+
+
+class _Reply(BaseModel):
+    plan: _Plan
+
+
+def test_bad_list_item_is_asked_for_with_its_whole_list(monkeypatch):
+    replies = iter([
+        '{"plan": {"steps": [{"action": "walk", "minutes": 30}, {"action": "sleep", "minutes": "long"}], "summary": "s"}}',
+        '{"plan": {"steps": [{"action": "walk", "minutes": 30}, {"action": "sleep", "minutes": 480}]}}',
+    ])
+    asked = []
+
+    async def complete_chat(kind, messages, **kwargs):
+        asked.append(messages[-1].content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=next(replies)))])
+
+    monkeypatch.setattr(llm_json, "complete_chat", complete_chat)
+    value = asyncio.run(complete_json("test", [UserMessage(content="q")], _Reply))
+
+    assert value == {"plan": {"steps": [{"action": "walk", "minutes": 30}, {"action": "sleep", "minutes": 480}], "summary": "s"}}
+    assert '{"plan": {"steps": null}}' in asked[1]